@@ -1,86 +1,142 @@
-from flask import Flask, render_template, request, send_file, jsonify, Response
-from docx import Document
-from io import BytesIO
+from flask import Flask, render_template, request, jsonify, Response
 import re
 import time
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
 import zipfile
 from lxml import etree
-import tempfile
 import os
-import shutil
 from werkzeug.utils import secure_filename
+from werkzeug.serving import is_running_from_reloader
 import json
-import queue
-import threading
+import multiprocessing
+from job_channels import JobChannelRegistry
+from worker_pool import DocumentWorkerPool, PoolFullError
+from result_cache import ResultCache, pipeline_fingerprint
+from upload_spool import SpoolingRequest, UploadRejected, claim_spool
+from downloads import send_download
+from artifact_store import ArtifactStore
+from async_sse import AsyncSSEServer, sse_base_url
+from docx_pipeline import extract_valid_question_type, process_docx_file
+from odt_pipeline import ODT_COMPRESS_LEVEL, ODT_SERIALIZE_STEP, buffered_member_writer
+from question_types import QUESTION_TYPE_VENDOR
+from zip_guard import ZIP_LIMITS, ZipLimitError, ZipLimits
+from zip_repack import repack_zip
 
 app = Flask(__name__)
+# Uploads are written straight to spool files while they arrive
+app.request_class = SpoolingRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_SPOOL_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'spool')
+# Processed files, one folder per job: disk budget, unused-for TTL, and the
+# age after which temp files of an earlier run count as orphans
+app.config['ARTIFACT_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+app.config['ARTIFACT_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 2GB
+app.config['ARTIFACT_TTL'] = 24 * 60 * 60  # seconds
+app.config['ORPHAN_MIN_AGE'] = 60 * 60  # seconds
+# Status streams on an asyncio server instead of Flask threads: its port
+# (None = off) and, behind a proxy, the public URL that reaches it
+app.config['ASYNC_SSE_HOST'] = '0.0.0.0'
+app.config['ASYNC_SSE_PORT'] = None
+app.config['SSE_BASE_URL'] = None
+# nginx internal location mapped to ARTIFACT_FOLDER (X-Accel-Redirect downloads);
+# for Apache/lighttpd X-Sendfile set USE_X_SENDFILE = True instead
+app.config['DOWNLOAD_ACCEL_REDIRECT'] = None
+# Deflate level of the rewritten content.xml (1 = fastest ... 9 = smallest)
+app.config['ODT_COMPRESS_LEVEL'] = ODT_COMPRESS_LEVEL
+# Worker processes for document jobs (None = one per CPU core) and how many
+# more jobs may wait in the queue before uploads get 503
+app.config['WORKER_PROCESSES'] = None
+app.config['MAX_PENDING_JOBS'] = 8
+app.config['BUSY_RETRY_AFTER'] = 10  # seconds
+# Processed results of previously seen inputs
+app.config['RESULT_CACHE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+app.config['RESULT_CACHE_MAX_BYTES'] = 1024 * 1024 * 1024  # 1GB
+# Zip bomb protection: limits on the sizes declared in an upload's central
+# directory, checked before anything is decompressed (and again in the worker)
+app.config['ZIP_LIMITS'] = ZipLimits(
+    max_members=10000,
+    max_member_size=512 * 1024 * 1024,  # 512MB uncompressed per member
+    max_total_size=2 * 1024 * 1024 * 1024,  # 2GB uncompressed in all
+    max_ratio=100  # uncompressed/compressed, members over 1MB
+)
 
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Queue for real-time status updates
-status_queue = queue.Queue()
-
-# Pre-compile regex patterns for better performance
-QUESTION_PATTERN = re.compile(r"^\s*Question\s*:?\s*\d*\s*$")
-QUESTION_NUMBER_PATTERN = re.compile(r"Question\s*:\s*\d+")
-QUESTION_TYPE_PATTERN = re.compile(r"(Question\s*:\s*\d+)\s+(HOTSPOT|SIMULATION|DRAG DROP)(.*)")
-OPTION_PATTERN = re.compile(r"^\s*([A-J])\s*\.\s*(.+)$")
-MAP_TAG_PATTERN = re.compile(r"<map>.*?</map>", flags=re.DOTALL)
-
-# Valid question types for both ODT and DOCX files
-VALID_QUESTION_TYPES = [
-    'DRAGDROP',
-    'DRAG DROP',
-    'DROPDOWN',
-    'HOTSPOT',
-    'FILLINTHEBLANK',
-    'SIMULATION',
-    'POSITIONEDDRAGDROP',
-    'POSITIONEDDROPDOWN'
+os.makedirs(app.config['UPLOAD_SPOOL_FOLDER'], exist_ok=True)
+
+# Per-job channels for real-time status updates
+status_channels = JobChannelRegistry()
+# Serves the same channels on an event loop (started in __main__, or by
+# the WSGI server's post-fork hook: async_sse.start(host, port))
+async_sse = AsyncSSEServer(status_channels, '/status-stream/', {'type': 'heartbeat'})
+
+# Processes that run the document jobs
+worker_pool = DocumentWorkerPool(status_channels, app.config['WORKER_PROCESSES'], app.config['MAX_PENDING_JOBS'])
+
+# Files whose code decides the processed output (cache fingerprint)
+PIPELINE_SOURCE_FILES = [
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docx_pipeline.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'odt_pipeline.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_repack.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'paragraph_index.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.json'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.json')
 ]
+result_cache = ResultCache(
+    app.config['RESULT_CACHE_FOLDER'],
+    app.config['RESULT_CACHE_MAX_BYTES'],
+    pipeline_fingerprint(*PIPELINE_SOURCE_FILES, settings=[QUESTION_TYPE_VENDOR])
+)
+
+# Per-job processed files
+artifact_store = ArtifactStore(
+    app.config['ARTIFACT_FOLDER'],
+    app.config['ARTIFACT_MAX_BYTES'],
+    app.config['ARTIFACT_TTL']
+)
+
+# Leftovers of jobs that died with an earlier run (web process only; the
+# worker processes import this module too)
+if multiprocessing.parent_process() is None:
+    artifact_store.reclaim_orphans([
+        os.path.join(app.config['UPLOAD_SPOOL_FOLDER'], '*'),
+        os.path.join(app.config['RESULT_CACHE_FOLDER'], '*.tmp'),
+        # Uploads of failed jobs and outputs from before per-job folders
+        os.path.join(app.config['UPLOAD_FOLDER'], 'temp_*'),
+        os.path.join(app.config['UPLOAD_FOLDER'], 'processed_*'),
+        os.path.join(app.config['UPLOAD_FOLDER'], '.processed_*.etag')
+    ], app.config['ORPHAN_MIN_AGE'])
+    artifact_store.evict()
 
 
 # ==================== ODT FUNCTIONS ====================
 
-def extract_valid_question_type(text):
-    """
-    Text se valid question type extract karta hai.
-    Agar valid type nahi mila to None return karta hai.
-    """
-    text_upper = text.upper()
-    
-    for q_type in VALID_QUESTION_TYPES:
-        if q_type in text_upper:
-            return q_type
-    
-    return None
-
-
-def fix_odt_question_numbers(input_file, output_file):
+def fix_odt_question_numbers(input_file, output_file, compresslevel=ODT_COMPRESS_LEVEL, serialize_stats=None,
+                             zip_limits=ZIP_LIMITS):
     """
     ODT file mein duplicate question numbers ko fix karta hai
     aur unhe proper ascending order mein arrange karta hai.
     Valid question types ko preserve karta hai.
     Format: Question: 1, Question: 2, etc. (not Question No: 01)
     Removes bracket text like [People], [Process] etc.
+    Modified content.xml compact XML ki shakal mein seedha output zip mein
+    likha jata hai (koi extract/rezip nahi); serialize_stats dict di ho to
+    us mein time, xml_bytes aur bytes_out aa jate hain
+    content.xml decompress hone se pehle central directory ke sizes/ratio
+    zip_limits (ZipLimits) par check hote hain
     """
-    temp_dir = tempfile.mkdtemp()
+    try:
+        zip_ref = zip_limits.open(input_file)
+    except (zipfile.BadZipFile, ZipLimitError) as e:
+        raise Exception(f"ODT processing failed: {str(e)}")
     
     try:
-        # ODT file ko extract karein (ODT ek ZIP file hai)
-        with zipfile.ZipFile(input_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # content.xml file ko read karein
-        content_file = os.path.join(temp_dir, 'content.xml')
-        
-        # XML parse karein
-        tree = etree.parse(content_file)
+        # content.xml seedha zip member se parse karein
+        with zip_ref.open('content.xml') as content_file:
+            tree = etree.parse(content_file)
         root = tree.getroot()
         
         # Namespace define karein
@@ -121,16 +177,20 @@ def fix_odt_question_numbers(input_file, output_file):
                 
                 question_counter += 1
         
-        # Modified XML save karein
-        tree.write(content_file, xml_declaration=True, encoding='UTF-8', pretty_print=True)
+        # Naya ODT: sirf content.xml dobara likha jata hai, baqi members as-is
+        def write_xml(output):
+            tree.write(output, xml_declaration=True, encoding='UTF-8')
         
-        # Naye ODT file mein zip karein
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
-            for foldername, subfolders, filenames in os.walk(temp_dir):
-                for filename in filenames:
-                    file_path = os.path.join(foldername, filename)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zip_ref.write(file_path, arcname)
+        write_content, counter = buffered_member_writer(write_xml)
+        start_time = time.time()
+        repack_zip(zip_ref, output_file, {'content.xml': write_content}, compresslevel)
+        
+        if serialize_stats is not None:
+            serialize_stats.update({
+                'time': time.time() - start_time,
+                'xml_bytes': counter.bytes_written,
+                'bytes_out': os.path.getsize(output_file)
+            })
         
         return question_counter - 1
     
@@ -138,312 +198,185 @@ def fix_odt_question_numbers(input_file, output_file):
         raise Exception(f"ODT processing failed: {str(e)}")
     
     finally:
-        # Temporary directory clean up
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        zip_ref.close()
+
+
+# ==================== BACKGROUND JOB ====================
 
+def artifact_url(job_id, filename):
+    """Download URL of a job's processed file"""
+    return f"/download/{job_id}/{filename}"
 
-# ==================== DOCX FUNCTIONS ====================
 
-def fix_docx_question_numbers_and_brackets(doc):
+def process_document_job(temp_file_path, filename, file_extension, job_id, cache_key, send_status_update):
     """
-    DOCX file mein:
-    1. Question numbers ko fix karta hai (ascending order: 1, 2, 3...)
-    2. Bracket text [People], [Process] etc. ko remove karta hai
-    3. Valid question types ko preserve karta hai
+    Background processing function (runs in a worker process)
+    Processed file seedha job ke artifact folder mein likha jata hai aur
+    result cache mein bhi rakh diya jata hai
     """
-    question_counter = 1
+    start_total_time = time.time()
+    output_folder = artifact_store.job_folder(job_id)
     
-    # Pattern for both "Question No:" and "Question:"
-    pattern = re.compile(r'^Question\s*(No)?:\s*\d+', re.IGNORECASE)
-    
-    for para in doc.paragraphs:
-        para_text = para.text.strip()
+    try:
+        # Send initial status
+        send_status_update({
+            'type': 'start',
+            'message': 'Processing started...'
+        })
         
-        if pattern.match(para_text):
-            # Extract question type agar hai to
-            question_type = extract_valid_question_type(para_text)
+        # ==================== ODT FILE PROCESSING ====================
+        if file_extension == 'odt':
+            # Send status update
+            send_status_update({
+                'type': 'status',
+                'name': 'Fix Question Numbering (ODT)',
+                'status': 'in_progress',
+                'time': '0.00s'
+            })
             
-            # Clear paragraph and set new text
-            para.clear()
+            # Process ODT file straight into the job's folder
+            output_filename = f"processed_{filename}"
+            output_path = os.path.join(output_folder, output_filename)
+            start_time = time.time()
+            serialize_stats = {}
+            questions_fixed = fix_odt_question_numbers(
+                temp_file_path, output_path, app.config['ODT_COMPRESS_LEVEL'], serialize_stats,
+                app.config['ZIP_LIMITS']
+            )
             
-            # Set new text with proper numbering (without brackets)
-            if question_type:
-                para.add_run(f"Question: {question_counter} {question_type}")
-            else:
-                para.add_run(f"Question: {question_counter}")
+            send_status_update({
+                'type': 'status',
+                'name': 'Fix Question Numbering (ODT)',
+                'status': 'completed',
+                'time': f"{(time.time() - start_time - serialize_stats['time']):.2f}s"
+            })
+            send_status_update({
+                'type': 'status',
+                'name': ODT_SERIALIZE_STEP,
+                'status': 'completed',
+                'time': f"{serialize_stats['time']:.2f}s",
+                'xml_bytes': serialize_stats['xml_bytes'],
+                'bytes_out': serialize_stats['bytes_out']
+            })
             
-            question_counter += 1
-    
-    return doc
-
-
-def ensure_spacing_before_question_tags(doc):
-    """
-    Ensures there's proper spacing before QUESTION NO: tags to catch all questions.
-    This prevents questions from being missed when they appear directly after text.
-    """
-    for para in doc.paragraphs:
-        # Check if paragraph contains QUESTION NO: but doesn't start with it
-        if "QUESTION NO:" in para.text and not para.text.strip().startswith("QUESTION NO:"):
-            # Split the text at QUESTION NO:
-            parts = para.text.split("QUESTION NO:")
-            if len(parts) > 1:
-                # Clear the paragraph
-                para.clear()
-                
-                # Add the text before QUESTION NO: (if any)
-                if parts[0].strip():
-                    para.add_run(parts[0].rstrip())
-                    para.add_run().add_break()
-                    para.add_run().add_break()  # Add extra line for spacing
-                
-                # Add QUESTION NO: and the rest
-                para.add_run("QUESTION NO:" + "QUESTION NO:".join(parts[1:]))
-    return doc
-
-
-def combined_text_operations(doc):
-    """
-    Optimized: Combine multiple simple text operations in one pass
-    - Replace QUESTION NO: with Question:
-    - Remove Explanation: tags
-    - Replace References with Reference
-    - Remove <map> tags
-    """
-    for para in doc.paragraphs:
-        text = para.text
-        if not text:
-            continue
+            # Clean up temp file
+            os.unlink(temp_file_path)
             
-        modified = False
-        
-        # QUESTION NO: to Question:
-        if "QUESTION NO:" in text:
-            text = text.replace("QUESTION NO:", "Question:")
-            modified = True
-        
-        # Remove Explanation tags
-        if "Explanation:" in text:
-            text = text.replace("Explanation:", "")
-            modified = True
-        
-        # References to Reference
-        if "References" in text:
-            text = text.replace("References", "Reference")
-            modified = True
-        
-        # Remove map tags
-        if "<map>" in text and "</map>" in text:
-            text = MAP_TAG_PATTERN.sub("", text).strip()
-            modified = True
-        
-        if modified:
-            para.text = text
-    
-    return doc
-
-
-def shift_question_types_to_next_line(doc):
-    """Move question types (SIMULATION, DRAG DROP, HOTSPOT) to next line"""
-    for para in doc.paragraphs:
-        if any(keyword in para.text for keyword in ["SIMULATION", "DRAG DROP", "HOTSPOT"]):
-            match = re.search(r"(Question\s*:?)\s*(\d+)\s+(SIMULATION|DRAG DROP|HOTSPOT)", para.text)
-            if match:
-                question_part = f"{match.group(1).strip()} {match.group(2).strip()}"
-                para.clear()
-                para.alignment = None
-                para.paragraph_format.left_indent = None
-                para.paragraph_format.right_indent = None
-                para.paragraph_format.first_line_indent = None
-                run1 = para.add_run(question_part)
-                para.add_run().add_break()
-                run2 = para.add_run(match.group(3))
-                run1.font.size = None
-                run2.font.size = None
-    return doc
-
-
-def normalize_option_spacing(doc):
-    """Ensure option lines like "A.     text" become "A. text" with one space"""
-    for para in doc.paragraphs:
-        txt = para.text
-        if not txt:
-            continue
-        # Replace non-breaking spaces and tabs with regular spaces
-        cleaned = txt.replace('\u00A0', ' ').replace('\t', ' ')
-        match = OPTION_PATTERN.match(cleaned)
-        if match:
-            letter = match.group(1)
-            value = match.group(2).strip()
-            para.text = f"{letter}. {value}"
-    return doc
-
-
-def add_explanation_tags_if_text_present(doc):
-    """
-    Optimized: Add Explanation: tags where needed after Answer: tags.
-    Single pass with better logic and reduced DOM manipulations.
-    """
-    paragraphs = list(doc.paragraphs)  # Convert to list once for better indexing
-    i = 0
-    
-    while i < len(paragraphs):
-        para = paragraphs[i]
-        text = para.text.strip()
-        
-        if text.startswith("Answer:"):
-            explanation_lines = []
-            j = i + 1
+            result_cache.store(cache_key, output_path, {'questions_fixed': questions_fixed})
+            artifact_store.evict(keep=job_id)
             
-            # Collect explanation lines
-            while j < len(paragraphs):
-                next_text = paragraphs[j].text.strip()
-                
-                # Stop conditions - check if we've reached next section
-                if (next_text.startswith("Reference:") or 
-                    next_text.startswith("Question:") or 
-                    next_text.startswith("Topic") or
-                    QUESTION_PATTERN.match(next_text)):
-                    break
-                
-                # Clean text and collect if non-empty
-                cleaned_text = MAP_TAG_PATTERN.sub("", next_text).strip()
-                if cleaned_text:
-                    explanation_lines.append(cleaned_text)
-                
-                j += 1
+            total_time = time.time() - start_total_time
             
-            # Only process if we found explanation text
-            if explanation_lines:
-                # Clear paragraphs between Answer and next section
-                for k in range(i + 1, j):
-                    paragraphs[k].clear()
-                
-                # Add "Explanation:" label
-                if i + 1 < len(paragraphs):
-                    paragraphs[i + 1].text = "Explanation:"
-                
-                # Add explanation content
-                for idx, line in enumerate(explanation_lines):
-                    target_idx = i + 2 + idx
-                    if target_idx < len(paragraphs):
-                        paragraphs[target_idx].text = line
-                    else:
-                        # Only create new paragraphs if absolutely needed
-                        p = paragraphs[-1]._element
-                        new_para = OxmlElement("w:p")
-                        run = OxmlElement("w:r")
-                        text_elem = OxmlElement("w:t")
-                        text_elem.text = line
-                        run.append(text_elem)
-                        new_para.append(run)
-                        p.addnext(new_para)
-                        # Refresh paragraph list
-                        paragraphs = list(doc.paragraphs)
-                
-                i = j
-            else:
-                i += 1
-        else:
-            i += 1
-    
-    return doc
-
-
-def add_line_spacing_after_question_answer(doc):
-    """
-    Optimized: Add line spacing after Question: and Answer: tags.
-    Process insertions in reverse to maintain indices.
-    """
-    paragraphs = list(doc.paragraphs)
-    insertions = []  # Track where to insert empty paragraphs: (index, type, match_data)
-    
-    # First pass: identify where insertions are needed
-    for i, para in enumerate(paragraphs):
-        para_text = para.text.strip()
-        
-        # Check for Answer: tags
-        if para_text.startswith("Answer:"):
-            insertions.append((i, 'answer', None))
-        
-        # Check for Question: X pattern
-        elif QUESTION_NUMBER_PATTERN.match(para_text):
-            match = QUESTION_TYPE_PATTERN.search(para_text)
-            if match:
-                insertions.append((i, 'question_with_type', match))
-            else:
-                insertions.append((i, 'question', None))
-    
-    # Second pass: process insertions in reverse order to maintain correct indices
-    for i, insert_type, match in reversed(insertions):
-        para = paragraphs[i]
-        p = para._element
-        
-        if insert_type == 'answer' or insert_type == 'question':
-            # Simple case: just add empty paragraph after
-            empty_para = OxmlElement("w:p")
-            p.addnext(empty_para)
+            send_status_update({
+                'type': 'complete',
+                'filename': output_filename,
+                'download_url': artifact_url(job_id, output_filename),
+                'total_time': f"{total_time:.2f}",
+                'questions_fixed': questions_fixed
+            })
         
-        elif insert_type == 'question_with_type':
-            # Complex case: split question and type
-            question_part = match.group(1)
-            question_type = match.group(2)
-            remaining_text = match.group(3).strip()
+        # ==================== DOCX FILE PROCESSING ====================
+        elif file_extension == 'docx':
+            # Process DOCX file straight into the job's folder
+            output_filename = f"processed_{filename}"
+            output_path = os.path.join(output_folder, output_filename)
+            process_docx_file(temp_file_path, output_path, send_status_update, zip_limits=app.config['ZIP_LIMITS'])
             
-            # Clear and rebuild the paragraph
-            para.clear()
-            para.add_run(question_part)
+            result_cache.store(cache_key, output_path, {})
+            artifact_store.evict(keep=job_id)
             
-            # Add empty paragraph
-            empty_para = OxmlElement("w:p")
-            p.addnext(empty_para)
+            total_time = time.time() - start_total_time
             
-            # Add question type paragraph
-            type_para = OxmlElement("w:p")
-            run = OxmlElement("w:r")
-            text = OxmlElement("w:t")
-            text.text = question_type + (" " + remaining_text if remaining_text else "")
-            run.append(text)
-            type_para.append(run)
-            empty_para.addnext(type_para)
+            # Clean up temp file
+            os.unlink(temp_file_path)
+            
+            send_status_update({
+                'type': 'complete',
+                'filename': output_filename,
+                'download_url': artifact_url(job_id, output_filename),
+                'total_time': f"{total_time:.2f}"
+            })
     
-    return doc
+    except Exception as e:
+        send_status_update({
+            'type': 'error',
+            'message': str(e)
+        })
+        # Clean up temp file on error
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
 
 
 # ==================== FLASK ROUTES ====================
 
-def send_status_update(update_data):
-    """Send status update to the queue for SSE"""
-    status_queue.put(json.dumps(update_data))
-
-
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', sse_base_url=sse_base_url(request, app.config['SSE_BASE_URL'], async_sse))
 
 
-@app.route('/status-stream')
-def status_stream():
-    """Server-Sent Events endpoint for real-time updates"""
+@app.route('/status-stream/<job_id>')
+def status_stream(job_id):
+    """Server-Sent Events endpoint for real-time updates of one job"""
+    channel = status_channels.get(job_id)
+    if channel is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    
     def generate():
-        while True:
-            try:
-                # Get update from queue (timeout to check if still connected)
-                update = status_queue.get(timeout=30)
-                yield f"data: {update}\n\n"
-            except queue.Empty:
+        # Stops after the job's complete/error event
+        for update in channel.subscribe(timeout=30):
+            if update is None:
                 # Send heartbeat to keep connection alive
                 yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
+            else:
+                yield f"data: {json.dumps(update)}\n\n"
     
     return Response(generate(), mimetype='text/event-stream')
 
 
+def send_cached_result(channel, cache_key, filename):
+    """
+    Cache hit par processed file job ke artifact folder mein copy karke
+    seedha 'complete' event bhej deta hai. Returns: True on a hit
+    """
+    start_total_time = time.time()
+    output_filename = f"processed_{filename}"
+    output_path = os.path.join(artifact_store.job_folder(channel.job_id), output_filename)
+    
+    result = result_cache.lookup(cache_key, output_path)
+    if result is None:
+        return False
+    artifact_store.evict(keep=channel.job_id)
+    
+    channel.publish({
+        'type': 'complete',
+        'filename': output_filename,
+        'download_url': artifact_url(channel.job_id, output_filename),
+        'total_time': f"{(time.time() - start_total_time):.2f}",
+        **result,
+        'cached': True
+    })
+    return True
+
+
+def server_busy_response():
+    """503 with Retry-After when the worker pool can't take more jobs"""
+    response = jsonify({'error': 'Server is busy processing other files, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(app.config['BUSY_RETRY_AFTER'])
+    return response
+
+
 @app.route('/process', methods=['POST'])
 def process_document():
-    if 'file' not in request.files:
+    try:
+        files = request.files
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if 'file' not in files:
         return jsonify({'error': 'No file uploaded'}), 400
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
@@ -454,236 +387,51 @@ def process_document():
     if file_extension not in ['docx', 'odt']:
         return jsonify({'error': 'Only DOCX and ODT files are supported'}), 400
     
-    # Save file temporarily
-    temp_file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{filename}")
-    file.save(temp_file_path)
+    # The upload is already on disk (spooled and hashed while it arrived)
+    try:
+        spool = claim_spool(file)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
+    temp_file_path = spool.path
     
-    # Start processing in background thread
-    def process_in_background():
-        start_total_time = time.time()
-        
-        try:
-            # Clear the queue
-            while not status_queue.empty():
-                try:
-                    status_queue.get_nowait()
-                except queue.Empty:
-                    break
-            
-            # Send initial status
-            send_status_update({
-                'type': 'start',
-                'message': 'Processing started...'
-            })
-            
-            # ==================== ODT FILE PROCESSING ====================
-            if file_extension == 'odt':
-                # Send status update
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Fix Question Numbering (ODT)',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                
-                # Create temp output file
-                temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.odt')
-                temp_output.close()
-                
-                # Process ODT file
-                start_time = time.time()
-                questions_fixed = fix_odt_question_numbers(temp_file_path, temp_output.name)
-                
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Fix Question Numbering (ODT)',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Read processed file
-                with open(temp_output.name, 'rb') as f:
-                    output_data = f.read()
-                
-                # Clean up temp files
-                os.unlink(temp_file_path)
-                os.unlink(temp_output.name)
-                
-                total_time = time.time() - start_total_time
-                
-                # Save to uploads folder
-                output_filename = f"processed_{filename}"
-                output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                with open(output_path, 'wb') as f:
-                    f.write(output_data)
-                
-                send_status_update({
-                    'type': 'complete',
-                    'filename': output_filename,
-                    'total_time': f"{total_time:.2f}",
-                    'questions_fixed': questions_fixed
-                })
-            
-            # ==================== DOCX FILE PROCESSING ====================
-            elif file_extension == 'docx':
-                doc = Document(temp_file_path)
-                
-                # Step 0: Fix Question Numbers and Remove Brackets
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Fix Question Numbers & Remove Brackets',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = fix_docx_question_numbers_and_brackets(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Fix Question Numbers & Remove Brackets',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 1: Ensure proper spacing
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Ensure Spacing Before Questions',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = ensure_spacing_before_question_tags(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Ensure Spacing Before Questions',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 2: Combined text operations
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Combined Text Operations',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = combined_text_operations(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Combined Text Operations',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 3: Question Types to Next Line
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Question Types to Next Line',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = shift_question_types_to_next_line(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Question Types to Next Line',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 4: Normalize Option Spacing
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Normalize Option Spacing',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = normalize_option_spacing(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Normalize Option Spacing',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 5: Add Explanation Tags
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Add Explanation Tags',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = add_explanation_tags_if_text_present(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Add Explanation Tags',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Step 6: Add Line Spacing
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Add Line Spacing',
-                    'status': 'in_progress',
-                    'time': '0.00s'
-                })
-                start_time = time.time()
-                doc = add_line_spacing_after_question_answer(doc)
-                send_status_update({
-                    'type': 'status',
-                    'name': 'Add Line Spacing',
-                    'status': 'completed',
-                    'time': f"{(time.time() - start_time):.2f}s"
-                })
-                
-                # Save the document
-                output = BytesIO()
-                doc.save(output)
-                output.seek(0)
-                
-                total_time = time.time() - start_total_time
-                
-                # Save to uploads folder
-                output_filename = f"processed_{filename}"
-                output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                with open(output_path, 'wb') as f:
-                    f.write(output.read())
-                
-                # Clean up temp file
-                os.unlink(temp_file_path)
-                
-                send_status_update({
-                    'type': 'complete',
-                    'filename': output_filename,
-                    'total_time': f"{total_time:.2f}"
-                })
-        
-        except Exception as e:
-            send_status_update({
-                'type': 'error',
-                'message': str(e)
-            })
-            # Clean up temp file on error
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+    channel = status_channels.create()
     
-    # Start background thread
-    thread = threading.Thread(target=process_in_background)
-    thread.daemon = True
-    thread.start()
+    # Same file processed before? Serve it without queueing a job
+    cache_key = result_cache.key_for_digest(spool.sha256)
+    if send_cached_result(channel, cache_key, filename):
+        os.unlink(temp_file_path)
+        return jsonify({'success': True, 'message': 'Processing started', 'job_id': channel.job_id})
     
-    return jsonify({'success': True, 'message': 'Processing started'})
+    # Queue the job on the worker pool
+    try:
+        worker_pool.submit(channel.job_id, process_document_job, temp_file_path, filename, file_extension, channel.job_id, cache_key)
+    except PoolFullError:
+        os.unlink(temp_file_path)
+        return server_busy_response()
+    
+    return jsonify({'success': True, 'message': 'Processing started', 'job_id': channel.job_id})
+
+
+@app.route('/stats')
+def stats():
+    """Worker pool queue depth/utilization, result cache counters and artifact disk usage"""
+    return jsonify({
+        **worker_pool.stats(),
+        'result_cache': result_cache.stats(),
+        'artifacts': artifact_store.stats(),
+        'async_sse': async_sse.stats()
+    })
 
 
-@app.route('/download/<filename>')
-def download_file(filename):
+@app.route('/download/<job_id>/<filename>')
+def download_file(job_id, filename):
+    """Download processed file (ETag/304, Range, sendfile or X-Accel-Redirect)"""
+    if artifact_store.job_folder(job_id, create=False) is None:
+        return jsonify({'error': 'Unknown job'}), 404
     try:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        return send_file(file_path, as_attachment=True)
+        response = send_download(app.config['ARTIFACT_FOLDER'], f"{job_id}/{filename}")
+        artifact_store.touch(job_id)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
@@ -711,4 +459,7 @@ def download_file(filename):
 #         return jsonify({'error': str(e)}), 404
 
 if __name__ == '__main__':
+    # Only the reloader's child process serves requests (and has the channels)
+    if app.config['ASYNC_SSE_PORT'] and is_running_from_reloader():
+        async_sse.start(app.config['ASYNC_SSE_HOST'], app.config['ASYNC_SSE_PORT'])
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,869 +1,701 @@
-from flask import Flask, render_template, request, send_file, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response
 from io import BytesIO
-import re
 import time
 import zipfile
-from lxml import etree
 import tempfile
 import os
 import shutil
 from werkzeug.utils import secure_filename
+from werkzeug.serving import is_running_from_reloader
 import json
-import queue
+import multiprocessing
 import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+from job_channels import JobChannelRegistry
+from worker_pool import DocumentWorkerPool, PoolFullError
+from result_cache import ResultCache, pipeline_fingerprint
+from block_cache import BlockCache
+from upload_spool import SpoolingRequest, UploadRejected, claim_spool
+from downloads import send_download
+from artifact_store import ArtifactStore
+from async_sse import AsyncSSEServer, sse_base_url
+from chunked_upload import ChunkedUploads, ChunkedUploadError
+from odt_pipeline import (ODT_COMPRESS_LEVEL, ODT_SHARD_THRESHOLD, ODT_STREAMING_THRESHOLD, analyze_odt_file,
+                          process_odt_file)
+from docx_pipeline import process_docx_file
+from question_types import QUESTION_TYPE_VENDOR
+from zip_guard import ZipLimits
 
 app = Flask(__name__)
+# Uploads are written straight to spool files while they arrive
+app.request_class = SpoolingRequest
 app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024  # 200MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_SPOOL_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'spool')
+# Chunked/resumable uploads: sessions folder, chunk size and how long an
+# unfinished session may wait for its remaining chunks
+app.config['CHUNKED_UPLOAD_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'chunked')
+app.config['CHUNK_SIZE'] = 4 * 1024 * 1024  # 4MB
+app.config['CHUNKED_SESSION_TTL'] = 24 * 60 * 60  # seconds
+# Processed files, one folder per job: disk budget, unused-for TTL, and the
+# age after which temp files of an earlier run count as orphans
+app.config['ARTIFACT_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+app.config['ARTIFACT_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 2GB
+app.config['ARTIFACT_TTL'] = 24 * 60 * 60  # seconds
+app.config['ORPHAN_MIN_AGE'] = 60 * 60  # seconds
+# Status streams on an asyncio server instead of Flask threads: its port
+# (None = off) and, behind a proxy, the public URL that reaches it
+app.config['ASYNC_SSE_HOST'] = '0.0.0.0'
+app.config['ASYNC_SSE_PORT'] = None
+app.config['SSE_BASE_URL'] = None
+# nginx internal location mapped to ARTIFACT_FOLDER (X-Accel-Redirect downloads);
+# for Apache/lighttpd X-Sendfile set USE_X_SENDFILE = True instead
+app.config['DOWNLOAD_ACCEL_REDIRECT'] = None
+# content.xml (uncompressed) size above which ODT streaming mode is used
+app.config['ODT_STREAMING_THRESHOLD'] = ODT_STREAMING_THRESHOLD
+# Single uploads whose content.xml is bigger than ODT_SHARD_THRESHOLD are
+# split into shards processed by this many processes (1 = off). Every
+# worker job starts its own shard processes, outside the worker pool's
+# admission control, so keep WORKER_PROCESSES * ODT_SHARD_PROCESSES within
+# the CPU count. Sharded mode keeps the document in memory like small ones.
+app.config['ODT_SHARD_PROCESSES'] = 1
+app.config['ODT_SHARD_THRESHOLD'] = ODT_SHARD_THRESHOLD
+# Deflate level of the rewritten content.xml (1 = fastest ... 9 = smallest)
+app.config['ODT_COMPRESS_LEVEL'] = ODT_COMPRESS_LEVEL
+# Worker processes for document jobs (None = one per CPU core) and how many
+# more jobs may wait in the queue before uploads get 503
+app.config['WORKER_PROCESSES'] = None
+app.config['MAX_PENDING_JOBS'] = 8
+app.config['BUSY_RETRY_AFTER'] = 10  # seconds
+# Processed results of previously seen inputs
+app.config['RESULT_CACHE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+app.config['RESULT_CACHE_MAX_BYTES'] = 1024 * 1024 * 1024  # 1GB
+# Processed question blocks of ODT uploads: an edited file only reprocesses
+# its changed blocks (None = off, e.g. os.path.join(RESULT_CACHE_FOLDER,
+# 'blocks.sqlite3')). A cold run costs more than a plain one, and uploads
+# above ODT_STREAMING_THRESHOLD still stream without the cache.
+app.config['BLOCK_CACHE_PATH'] = None
+app.config['BLOCK_CACHE_MAX_BYTES'] = 512 * 1024 * 1024  # 512MB
+# Most files accepted in one /batch archive
+app.config['BATCH_MAX_FILES'] = 1000
+# Zip bomb protection: limits on the sizes declared in an upload's central
+# directory, checked before anything is decompressed (and again in the worker)
+app.config['ZIP_LIMITS'] = ZipLimits(
+    max_members=10000,
+    max_member_size=512 * 1024 * 1024,  # 512MB uncompressed per member
+    max_total_size=2 * 1024 * 1024 * 1024,  # 2GB uncompressed in all
+    max_ratio=100  # uncompressed/compressed, members over 1MB
+)
 
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['UPLOAD_SPOOL_FOLDER'], exist_ok=True)
  
-# Queue for real-time status updates
-status_queue = queue.Queue()
-
-# Pre-compile regex patterns for better performance
-QUESTION_PATTERN = re.compile(r"^\s*Question\s*:?\s*\d*\s*$")
-QUESTION_NUMBER_PATTERN = re.compile(r"Question\s*:\s*\d+")
-QUESTION_TYPE_PATTERN = re.compile(r"(Question\s*:\s*\d+)\s+(HOTSPOT|SIMULATION|DRAG DROP)(.*)")
-OPTION_PATTERN = re.compile(r"^\s*([A-J])\s*\.\s*(.+)$")
-MAP_TAG_PATTERN = re.compile(r"<map>.*?</map>", flags=re.DOTALL)
-
-# Valid question types
-VALID_QUESTION_TYPES = [
-    'DRAGDROP',
-    'DRAG DROP',
-    'DROPDOWN',
-    'HOTSPOT',
-    'FILLINTHEBLANK',
-    'SIMULATION',
-    'POSITIONEDDRAGDROP',
-    'POSITIONEDDROPDOWN'
+# Per-job channels for real-time status updates
+status_channels = JobChannelRegistry()
+# Serves the same channels on an event loop (started in __main__, or by
+# the WSGI server's post-fork hook: async_sse.start(host, port))
+async_sse = AsyncSSEServer(status_channels, '/status/', {'type': 'keepalive'})
+
+# Processes that run the document jobs
+worker_pool = DocumentWorkerPool(status_channels, app.config['WORKER_PROCESSES'], app.config['MAX_PENDING_JOBS'])
+
+# Files whose code decides the processed output (cache fingerprint)
+PIPELINE_SOURCE_FILES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'odt_pipeline.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_repack.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docx_pipeline.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'paragraph_index.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.json'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.json')
 ]
-
-# ODT Namespaces
-ODT_NAMESPACES = {
-    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
-    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
-}
-
-
-# ==================== ODT VALIDATION ====================
-
-def validate_odt_file(file_path):
+pipeline_version = pipeline_fingerprint(*PIPELINE_SOURCE_FILES, settings=[QUESTION_TYPE_VENDOR])
+result_cache = ResultCache(
+    app.config['RESULT_CACHE_FOLDER'],
+    app.config['RESULT_CACHE_MAX_BYTES'],
+    pipeline_version
+)
+block_cache = None
+if app.config['BLOCK_CACHE_PATH']:
+    block_cache = BlockCache(
+        app.config['BLOCK_CACHE_PATH'],
+        app.config['BLOCK_CACHE_MAX_BYTES'],
+        pipeline_version
+    )
+
+# Resumable upload sessions
+chunked_uploads = ChunkedUploads(
+    app.config['CHUNKED_UPLOAD_FOLDER'],
+    app.config['CHUNK_SIZE'],
+    app.config['MAX_CONTENT_LENGTH'],
+    app.config['CHUNKED_SESSION_TTL'],
+    app.config['ZIP_LIMITS']
+)
+
+# Per-job processed files
+artifact_store = ArtifactStore(
+    app.config['ARTIFACT_FOLDER'],
+    app.config['ARTIFACT_MAX_BYTES'],
+    app.config['ARTIFACT_TTL']
+)
+
+# Leftovers of jobs that died with an earlier run (web process only; the
+# worker processes import this module too)
+if multiprocessing.parent_process() is None:
+    artifact_store.reclaim_orphans([
+        os.path.join(app.config['UPLOAD_SPOOL_FOLDER'], '*'),
+        os.path.join(app.config['RESULT_CACHE_FOLDER'], '*.tmp'),
+        # Outputs of the single-folder layout (before per-job folders)
+        os.path.join(app.config['UPLOAD_FOLDER'], 'processed_*'),
+        os.path.join(app.config['UPLOAD_FOLDER'], '.processed_*.etag')
+    ], app.config['ORPHAN_MIN_AGE'])
+    artifact_store.evict()
+    chunked_uploads.expire()
+
+# ==================== BATCH PROCESSING ====================
+
+def process_batch_member(input_path, member_name, output_path, cache_key, send_status_update):
     """
-    Validates if file is a proper ODT file
-    Returns: (is_valid, issues_list)
+    Batch ki ek file process karta hai (runs in a worker process)
+    Per-step events nahi bhejta - sirf 'file' progress events
+    Returns: manifest entry (dict)
     """
-    issues = []
-    
-    # Check 1: File exists
-    if not os.path.exists(file_path):
-        issues.append("File does not exist")
-        return False, issues
+    start_time = time.time()
+    send_status_update({
+        'type': 'file',
+        'name': member_name,
+        'status': 'in_progress',
+        'time': '0.00s'
+    })
     
-    # Check 2: File size > 0
-    file_size = os.path.getsize(file_path)
-    if file_size == 0:
-        issues.append("File is empty (0 bytes)")
-        return False, issues
+    def ignore_step_update(update):
+        pass
     
-    # Check 3: Is it a valid ZIP file?
-    if not zipfile.is_zipfile(file_path):
-        issues.append("File is not a valid ZIP archive (ODT files must be ZIP format)")
-        return False, issues
-    
-    # Check 4: Read magic bytes
     try:
-        with open(file_path, "rb") as f:
-            magic = f.read(4)
-            # ZIP files start with PK (0x504B)
-            if magic[:2] != b'PK':
-                issues.append(f"Invalid file signature: {magic.hex()} (expected: 504B for ZIP)")
-    except Exception as e:
-        issues.append(f"Cannot read file signature: {str(e)}")
-        return False, issues
+        if member_name.lower().endswith('.odt'):
+            questions_fixed = process_odt_file(
+                input_path, output_path, ignore_step_update,
+                streaming_threshold=app.config['ODT_STREAMING_THRESHOLD'],
+                compresslevel=app.config['ODT_COMPRESS_LEVEL'],
+                block_cache=block_cache,
+                zip_limits=app.config['ZIP_LIMITS']
+            )
+            result = {'questions_fixed': questions_fixed}
+        else:
+            process_docx_file(input_path, output_path, ignore_step_update, zip_limits=app.config['ZIP_LIMITS'])
+            result = {}
+        
+        result_cache.store(cache_key, output_path, result)
     
-    # Check 5: Has mimetype file?
-    try:
-        with zipfile.ZipFile(file_path, 'r') as z:
-            file_list = z.namelist()
-            
-            if 'mimetype' not in file_list:
-                issues.append("Missing 'mimetype' file in ODT structure")
-                return False, issues
-            
-            # Check 6: Correct mimetype content
-            mimetype = z.read('mimetype').decode('utf-8', 'ignore').strip()
-            expected_mimetype = 'application/vnd.oasis.opendocument.text'
-            
-            if mimetype != expected_mimetype:
-                issues.append(f"Invalid mimetype: '{mimetype}' (expected: '{expected_mimetype}')")
-                return False, issues
-            
-            # Check 7: Has content.xml?
-            if 'content.xml' not in file_list:
-                issues.append("Missing 'content.xml' file in ODT structure")
-                return False, issues
-            
-            # Check 8: Can parse content.xml?
-            try:
-                content_xml = z.read('content.xml')
-                etree.fromstring(content_xml)
-            except Exception as e:
-                issues.append(f"Cannot parse content.xml: {str(e)}")
-                return False, issues
-    
-    except zipfile.BadZipFile:
-        issues.append("Corrupted ZIP structure")
-        return False, issues
     except Exception as e:
-        issues.append(f"Error during validation: {str(e)}")
-        return False, issues
-    
-    # All checks passed
-    return True, []
-
-
-# ==================== ODT HELPER FUNCTIONS ====================
-
-def extract_valid_question_type(text):
-    """
-    Text se valid question type extract karta hai.
-    Agar valid type nahi mila to None return karta hai.
-    """
-    text_upper = text.upper()
+        send_status_update({
+            'type': 'file',
+            'name': member_name,
+            'status': 'failed',
+            'time': f"{(time.time() - start_time):.2f}s",
+            'message': str(e)
+        })
+        return {'name': member_name, 'status': 'failed', 'error': str(e)}
     
-    for q_type in VALID_QUESTION_TYPES:
-        if q_type in text_upper:
-            return q_type
+    finally:
+        os.unlink(input_path)
     
-    return None
-
-
-def get_para_text(para):
-    """Extract text from ODT paragraph element"""
-    return ''.join(para.itertext())
+    send_status_update({
+        'type': 'file',
+        'name': member_name,
+        'status': 'completed',
+        'time': f"{(time.time() - start_time):.2f}s",
+        **result
+    })
+    return {'name': member_name, 'status': 'ok', 'time': f"{(time.time() - start_time):.2f}", **result}
 
 
-def clear_para_content(para):
-    """Clear all child elements from paragraph"""
-    for child in list(para):
-        para.remove(child)
-    para.text = None
-    para.tail = None
-
-
-def set_para_text(para, text):
-    """Set text for ODT paragraph"""
-    clear_para_content(para)
-    para.text = text
-
-
-# ==================== ODT PROCESSING FUNCTIONS ====================
-
-def fix_odt_question_numbers_and_brackets(root, namespaces):
+class BatchJob:
     """
-    ODT file mein:
-    1. Question numbers ko fix karta hai (ascending order: 1, 2, 3...)
-    2. Bracket text [People], [Process] etc. ko remove karta hai
-    3. Valid question types ko preserve karta hai
+    Zip of ODT/DOCX files ko worker pool par fan out karta hai (runs in a
+    thread of the web process). Har file khatam hote hi result archive mein
+    likhi jati hai; aakhir mein manifest.json (per-file status/errors).
     """
-    question_counter = 1
-    
-    # Pattern for both "Question No:" and "Question:"
-    pattern = re.compile(r'^Question\s*(No)?:\s*\d+', re.IGNORECASE)
     
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    def __init__(self, batch_path, archive_path, channel):
+        self.batch_path = batch_path
+        self.archive_path = archive_path
+        self.channel = channel
+        self.manifest = []
+        # Future -> (member name, temp output path)
+        self.in_flight = {}
+        self.archive = None
     
-    for para in paragraphs:
-        para_text = get_para_text(para).strip()
+    def run(self):
+        start_total_time = time.time()
         
-        if pattern.match(para_text):
-            # Extract question type agar hai to
-            question_type = extract_valid_question_type(para_text)
-            
-            # Set new text with proper numbering (without brackets)
-            if question_type:
-                set_para_text(para, f"Question: {question_counter} {question_type}")
-            else:
-                set_para_text(para, f"Question: {question_counter}")
+        try:
+            with zipfile.ZipFile(self.batch_path, 'r') as batch_zip, \
+                    zipfile.ZipFile(self.archive_path, 'w', zipfile.ZIP_DEFLATED) as self.archive:
+                members = [info for info in batch_zip.infolist() if not info.is_dir()]
+                if len(members) > app.config['BATCH_MAX_FILES']:
+                    raise Exception(f"Batch has {len(members)} files (limit: {app.config['BATCH_MAX_FILES']})")
+                
+                for info in members:
+                    self.start_member(batch_zip, info)
+                
+                while self.in_flight:
+                    self.collect_finished()
+                
+                self.archive.writestr('manifest.json', json.dumps({'files': self.manifest}, indent=2))
             
-            question_counter += 1
-    
-    return root, question_counter - 1
-
-
-def ensure_spacing_before_question_tags_odt(root, namespaces):
-    """
-    Ensures there's proper spacing before QUESTION NO: tags in ODT.
-    """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
-    
-    for para in paragraphs:
-        para_text = get_para_text(para)
+            counts = {status: sum(1 for entry in self.manifest if entry['status'] == status)
+                      for status in ('ok', 'failed', 'skipped')}
+            artifact_store.evict(keep=self.channel.job_id)
+            self.channel.publish({
+                'type': 'complete',
+                'filename': os.path.basename(self.archive_path),
+                'download_url': artifact_url(self.channel.job_id, os.path.basename(self.archive_path)),
+                'total_time': f"{(time.time() - start_total_time):.2f}",
+                'files_processed': counts['ok'],
+                'files_failed': counts['failed'],
+                'files_skipped': counts['skipped']
+            })
         
-        # Check if paragraph contains QUESTION NO: but doesn't start with it
-        if "QUESTION NO:" in para_text and not para_text.strip().startswith("QUESTION NO:"):
-            # Split the text at QUESTION NO:
-            parts = para_text.split("QUESTION NO:")
+        except Exception as e:
+            # Let already queued members finish before dropping their files
+            for future, (_, output_path) in self.in_flight.items():
+                future.add_done_callback(lambda future, path=output_path: remove_file(path))
             
-            if len(parts) > 1:
-                # For ODT, we'll keep it simple - just set the text properly
-                new_text = parts[0].rstrip()
-                if new_text:
-                    new_text += "\n\n"
-                new_text += "QUESTION NO:" + "QUESTION NO:".join(parts[1:])
-                
-                set_para_text(para, new_text)
-    
-    return root
-
-
-def combined_text_operations_odt(root, namespaces):
-    """
-    Combined text operations for ODT:
-    - Replace QUESTION NO: with Question:
-    - Remove Explanation: tags
-    - Replace References with Reference
-    - Remove <map> tags
-    """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+            self.channel.publish({
+                'type': 'error',
+                'message': f"Batch processing failed: {str(e)}"
+            })
+        
+        finally:
+            os.unlink(self.batch_path)
     
-    for para in paragraphs:
-        para_text = get_para_text(para)
-        modified = False
+    def start_member(self, batch_zip, info):
+        """Extract one member and queue it (or take it from the result cache)"""
+        name = info.filename
+        extension = os.path.splitext(name)[1].lower()
         
-        # Replace QUESTION NO: with Question:
-        if "QUESTION NO:" in para_text:
-            para_text = para_text.replace("QUESTION NO:", "Question:")
-            modified = True
+        if extension not in ('.odt', '.docx'):
+            self.add_result({'name': name, 'status': 'skipped', 'error': 'Only ODT and DOCX files are supported'})
+            return
         
-        # Remove Explanation: tags (case insensitive)
-        if re.search(r'\bExplanation\s*:\s*', para_text, re.IGNORECASE):
-            para_text = re.sub(r'\bExplanation\s*:\s*', '', para_text, flags=re.IGNORECASE)
-            modified = True
+        input_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
+        with input_file, batch_zip.open(info) as source:
+            shutil.copyfileobj(source, input_file)
         
-        # Replace References with Reference (multiple to singular)
-        if "References:" in para_text:
-            para_text = para_text.replace("References:", "Reference:")
-            modified = True
+        output_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
+        output_file.close()
         
-        # Remove <map> tags
-        if "<map>" in para_text.lower():
-            para_text = MAP_TAG_PATTERN.sub('', para_text)
-            modified = True
+        cache_key = result_cache.key_for_file(input_file.name)
+        result = result_cache.lookup(cache_key, output_file.name)
+        if result is not None:
+            os.unlink(input_file.name)
+            self.add_result({'name': name, 'status': 'ok', 'time': '0.00', **result, 'cached': True}, output_file.name)
+            return
         
-        if modified:
-            set_para_text(para, para_text)
-    
-    return root
+        # Keep at most one member per worker in flight, so single uploads
+        # still get a slot
+        while True:
+            if len(self.in_flight) >= worker_pool.max_workers:
+                self.collect_finished()
+                continue
+            try:
+                future = worker_pool.submit(
+                    self.channel.job_id, process_batch_member,
+                    input_file.name, name, output_file.name, cache_key,
+                    report_crash=False
+                )
+                break
+            except PoolFullError:
+                if self.in_flight:
+                    self.collect_finished()
+                else:
+                    time.sleep(1)
+        
+        self.in_flight[future] = (name, output_file.name)
+    
+    def collect_finished(self):
+        """Wait for at least one queued member and add it to the archive"""
+        done, _ = wait(self.in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, output_path = self.in_flight.pop(future)
+            result = future.result() if future.exception() is None else None
+            if result is None:
+                result = {'name': name, 'status': 'failed', 'error': 'Worker process failed'}
+            self.add_result(result, output_path)
+    
+    def add_result(self, result, output_path=None):
+        """Record a manifest entry and add the processed file to the archive"""
+        if output_path is not None:
+            if result['status'] == 'ok':
+                self.archive.write(output_path, result['name'])
+            remove_file(output_path)
+        
+        self.manifest.append(result)
+        if result['status'] == 'skipped' or result.get('cached'):
+            # Workers report their own files, these never reach one
+            self.channel.publish({
+                'type': 'file',
+                'name': result['name'],
+                'status': 'completed' if result['status'] == 'ok' else result['status'],
+                'time': '0.00s'
+            })
+
+
+def remove_file(path):
+    """os.unlink that ignores already removed files"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
 
+# ==================== FLASK ROUTES ====================
 
-# def shift_question_types_to_next_line_odt(root, namespaces):
-#     """
-#     Question types (HOTSPOT, SIMULATION, DRAG DROP) ko next line mein shift karta hai
-#     """
-#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
+@app.route('/')
+def index():
+    return render_template('index.html', sse_base_url=sse_base_url(request, app.config['SSE_BASE_URL'], async_sse))
+
+
+@app.route('/status/<job_id>')
+def status(job_id):
+    """SSE endpoint for real-time status updates of one job"""
+    channel = status_channels.get(job_id)
+    if channel is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
     
-#     for i, para in enumerate(paragraphs):
-#         para_text = get_para_text(para)
-        
-#         # Check if this matches Question: X TYPE pattern
-#         match = QUESTION_TYPE_PATTERN.match(para_text.strip())
-        
-#         if match:
-#             question_part = match.group(1)  # "Question: X"
-#             question_type = match.group(2)  # "HOTSPOT" etc.
-#             remaining = match.group(3)      # Any remaining text
-            
-#             # Set current paragraph to just question number
-#             set_para_text(para, question_part)
-            
-#             # Insert new paragraph after current with question type
-#             # In ODT, we need to insert in parent
-#             parent = para.getparent()
-#             if parent is not None:
-#                 index = list(parent).index(para)
-                
-#                 # Create new paragraph element
-#                 new_para = etree.Element(f"{{{namespaces['text']}}}p")
-#                 new_para.text = question_type + (remaining if remaining else "")
-                
-#                 # Insert after current paragraph
-#                 parent.insert(index + 1, new_para)
+    def generate():
+        # Stops after the job's complete/error event
+        for update in channel.subscribe(timeout=30):
+            if update is None:
+                # Send keepalive
+                yield f"data: {json.dumps({'type': 'keepalive'})}\n\n"
+            else:
+                yield f"data: {json.dumps(update)}\n\n"
     
-#     return root
+    return Response(generate(), mimetype='text/event-stream')
+
+
+def artifact_url(job_id, filename):
+    """Download URL of a job's processed file"""
+    return f"/download/{job_id}/{filename}"
 
 
-def shift_question_types_to_next_line_odt(root, namespaces):
+def process_upload_job(temp_file_path, filename, job_id, cache_key, send_status_update):
     """
-    Question types (HOTSPOT, SIMULATION, DRAG DROP) ko next line mein shift karta hai
-    FIXED: Properly handles parent list modifications
+    Background processing function (runs in a worker process)
+    Processed file seedha job ke artifact folder mein likha jata hai aur
+    result cache mein bhi rakh diya jata hai
     """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
-    
-    # Collect all changes first to avoid modifying list during iteration
-    changes_to_make = []
-    
-    for para in paragraphs:
-        para_text = get_para_text(para)
-        
-        # Check if this matches Question: X TYPE pattern
-        match = QUESTION_TYPE_PATTERN.match(para_text.strip())
+    try:
+        start_total_time = time.time()
+        
+        # Process the ODT file straight into the job's folder
+        output_filename = f"processed_{filename}"
+        output_path = os.path.join(artifact_store.job_folder(job_id), output_filename)
+        questions_fixed = process_odt_file(
+            temp_file_path, output_path, send_status_update,
+            streaming_threshold=app.config['ODT_STREAMING_THRESHOLD'],
+            compresslevel=app.config['ODT_COMPRESS_LEVEL'],
+            shard_processes=app.config['ODT_SHARD_PROCESSES'],
+            shard_threshold=app.config['ODT_SHARD_THRESHOLD'],
+            block_cache=block_cache,
+            zip_limits=app.config['ZIP_LIMITS']
+        )
+        
+        result_cache.store(cache_key, output_path, {'questions_fixed': questions_fixed})
+        artifact_store.evict(keep=job_id)
+        
+        total_time = time.time() - start_total_time
         
-        if match:
-            question_part = match.group(1)  # "Question: X"
-            question_type = match.group(2)  # "HOTSPOT" etc.
-            remaining = match.group(3)      # Any remaining text
-            
-            changes_to_make.append({
-                'para': para,
-                'question_part': question_part,
-                'question_type': question_type,
-                'remaining': remaining
-            })
+        send_status_update({
+            'type': 'complete',
+            'filename': output_filename,
+            'download_url': artifact_url(job_id, output_filename),
+            'total_time': f"{total_time:.2f}",
+            'questions_fixed': questions_fixed
+        })
     
-    # Apply all changes after collection
-    for change in changes_to_make:
-        para = change['para']
-        question_part = change['question_part']
-        question_type = change['question_type']
-        remaining = change['remaining']
-        
-        # Set current paragraph to just question number
-        set_para_text(para, question_part)
-        
-        # Insert new paragraph after current with question type
-        parent = para.getparent()
-        if parent is not None:
-            try:
-                # Get fresh list of children
-                children = list(parent)
-                if para in children:
-                    index = children.index(para)
-                    
-                    # Create new paragraph element
-                    new_para = etree.Element(f"{{{namespaces['text']}}}p")
-                    new_para.text = question_type + (remaining if remaining else "")
-                    
-                    # Insert after current paragraph
-                    parent.insert(index + 1, new_para)
-            except ValueError:
-                # Element not found in parent - skip
-                continue
+    except Exception as e:
+        send_status_update({
+            'type': 'error',
+            'message': str(e)
+        })
     
-    return root
+    finally:
+        # Clean up temp file
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
 
 
-def normalize_option_spacing_odt(root, namespaces):
+def analyze_upload_job(temp_file_path, send_status_update):
     """
-    Options (A. B. C. etc.) ke formatting ko normalize karta hai
-    Format: "A. " (capital letter, period, single space)
+    /analyze dry run (runs in a worker process)
+    Returns: {'report': ...}, or {'error': message} if the file is invalid
     """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
-    
-    for para in paragraphs:
-        para_text = get_para_text(para)
-        
-        # Check if paragraph matches option pattern
-        match = OPTION_PATTERN.match(para_text.strip())
-        
-        if match:
-            option_letter = match.group(1)  # A, B, C, etc.
-            option_text = match.group(2)    # Rest of the text
-            
-            # Normalize: "A. text"
-            normalized_text = f"{option_letter}. {option_text}"
-            set_para_text(para, normalized_text)
-    
-    return root
+    try:
+        return {'report': analyze_odt_file(temp_file_path, zip_limits=app.config['ZIP_LIMITS'])}
+    except Exception as e:
+        return {'error': str(e)}
 
 
-# def add_explanation_tags_if_text_present_odt(root, namespaces):
-#     """
-#     Answer ke baad agar text hai to "Explanation:" tag add karta hai
-#     """
-#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
-#     answer_found = False
-#     explanation_added = False
-    
-#     for i, para in enumerate(paragraphs):
-#         para_text = get_para_text(para).strip()
-        
-#         # Check if this is Answer: line
-#         if para_text.startswith("Answer:"):
-#             answer_found = True
-#             explanation_added = False
-#             continue
-        
-#         # Check if this is next Question:
-#         if para_text.startswith("Question:"):
-#             answer_found = False
-#             explanation_added = False
-#             continue
-        
-#         # If we're after Answer: and haven't added Explanation yet
-#         if answer_found and not explanation_added and para_text:
-#             # Check if line already has Explanation:
-#             if not para_text.startswith("Explanation:") and not para_text.startswith("Reference:"):
-#                 # Insert new paragraph with "Explanation:" before this one
-#                 parent = para.getparent()
-#                 if parent is not None:
-#                     index = list(parent).index(para)
-                    
-#                     # Create new paragraph with Explanation:
-#                     explanation_para = etree.Element(f"{{{namespaces['text']}}}p")
-#                     explanation_para.text = "Explanation:"
-                    
-#                     # Insert before current paragraph
-#                     parent.insert(index, explanation_para)
-                    
-#                     explanation_added = True
-    
-#     return root
-
-
-def add_explanation_tags_if_text_present_odt(root, namespaces):
+def send_cached_result(channel, cache_key, filename):
     """
-    Answer ke baad agar text hai to "Explanation:" tag add karta hai
-    FIXED: Better parent handling
+    Cache hit par processed file job ke artifact folder mein copy karke
+    seedha 'complete' event bhej deta hai. Returns: True on a hit
     """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
-    
-    # Collect paragraphs that need explanation tags
-    explanation_insertions = []
-    
-    answer_found = False
-    explanation_added = False
-    
-    for i, para in enumerate(paragraphs):
-        para_text = get_para_text(para).strip()
-        
-        # Check if this is Answer: line
-        if para_text.startswith("Answer:"):
-            answer_found = True
-            explanation_added = False
-            continue
-        
-        # Check if this is next Question:
-        if para_text.startswith("Question:"):
-            answer_found = False
-            explanation_added = False
-            continue
-        
-        # If we're after Answer: and haven't added Explanation yet
-        if answer_found and not explanation_added and para_text:
-            # Check if line already has Explanation:
-            if not para_text.startswith("Explanation:") and not para_text.startswith("Reference:"):
-                explanation_insertions.append({
-                    'para': para,
-                    'before': True  # Insert before this paragraph
-                })
-                explanation_added = True
-    
-    # Apply all insertions
-    for insertion in explanation_insertions:
-        para = insertion['para']
-        parent = para.getparent()
-        
-        if parent is not None:
-            try:
-                children = list(parent)
-                if para in children:
-                    index = children.index(para)
-                    
-                    # Create new paragraph with Explanation:
-                    explanation_para = etree.Element(f"{{{namespaces['text']}}}p")
-                    explanation_para.text = "Explanation:"
-                    
-                    # Insert before current paragraph
-                    parent.insert(index, explanation_para)
-            except ValueError:
-                # Element not found - skip
-                continue
-    
-    return root
+    start_total_time = time.time()
+    output_filename = f"processed_{filename}"
+    output_path = os.path.join(artifact_store.job_folder(channel.job_id), output_filename)
+    
+    result = result_cache.lookup(cache_key, output_path)
+    if result is None:
+        return False
+    artifact_store.evict(keep=channel.job_id)
+    
+    channel.publish({
+        'type': 'complete',
+        'filename': output_filename,
+        'download_url': artifact_url(channel.job_id, output_filename),
+        'total_time': f"{(time.time() - start_total_time):.2f}",
+        **result,
+        'cached': True
+    })
+    return True
+
+
+def server_busy_response():
+    """503 with Retry-After when the worker pool can't take more jobs"""
+    response = jsonify({'error': 'Server is busy processing other files, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(app.config['BUSY_RETRY_AFTER'])
+    return response
 
 
-# def add_line_spacing_after_question_answer_odt(root, namespaces):
-#     """
-#     Question: aur Answer: ke baad proper line spacing add karta hai
-#     """
-#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
-#     parent = None
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    """Handle file upload and processing"""
+    try:
+        files = request.files
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
     
-#     # Find parent element
-#     for para in paragraphs:
-#         parent = para.getparent()
-#         if parent is not None:
-#             break
+    if 'file' not in files:
+        return jsonify({'error': 'No file uploaded'}), 400
     
-#     if parent is None:
-#         return root
+    file = files['file']
     
-#     # Process paragraphs in reverse to avoid index issues when inserting
-#     paragraphs_list = list(paragraphs)
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
     
-#     for i in range(len(paragraphs_list) - 1, -1, -1):
-#         para = paragraphs_list[i]
-#         para_text = get_para_text(para).strip()
-        
-#         # Add spacing after Question: lines
-#         if para_text.startswith("Question:"):
-#             index = list(parent).index(para)
-            
-#             # Add empty paragraph after
-#             empty_para = etree.Element(f"{{{namespaces['text']}}}p")
-#             empty_para.text = ""
-#             parent.insert(index + 1, empty_para)
-        
-#         # Add spacing after Answer: lines
-#         elif para_text.startswith("Answer:"):
-#             index = list(parent).index(para)
-            
-#             # Add empty paragraph after
-#             empty_para = etree.Element(f"{{{namespaces['text']}}}p")
-#             empty_para.text = ""
-#             parent.insert(index + 1, empty_para)
+    # Check file extension
+    if not file.filename.lower().endswith('.odt'):
+        return jsonify({'error': 'Only ODT files are supported'}), 400
     
-#     return root
+    # The upload is already on disk (spooled and hashed while it arrived)
+    filename = secure_filename(file.filename)
+    try:
+        spool = claim_spool(file)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return start_upload_job(status_channels.create(), spool.path, filename, spool.sha256)
 
 
-def add_line_spacing_after_question_answer_odt(root, namespaces):
+def start_upload_job(channel, temp_file_path, filename, sha256):
     """
-    Question: aur Answer: ke baad proper line spacing add karta hai
-    FIXED: Handles parent modifications correctly
+    Received ODT (temp_file_path, owned from here on) ka job channel par
+    shuru karta hai - cache hit ho to seedha result. Returns: JSON response
     """
-    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    # Same file processed before? Serve it without queueing a job
+    cache_key = result_cache.key_for_digest(sha256)
+    if send_cached_result(channel, cache_key, filename):
+        os.unlink(temp_file_path)
+        return jsonify({'success': True, 'message': 'Processing started', 'job_id': channel.job_id})
     
-    # Collect all spacing insertions
-    spacing_insertions = []
+    # Queue the job on the worker pool
+    try:
+        worker_pool.submit(channel.job_id, process_upload_job, temp_file_path, filename, channel.job_id, cache_key)
+    except PoolFullError:
+        os.unlink(temp_file_path)
+        return server_busy_response()
     
-    for para in paragraphs:
-        para_text = get_para_text(para).strip()
-        
-        # Mark paragraphs that need spacing after them
-        if para_text.startswith("Question:") or para_text.startswith("Answer:"):
-            spacing_insertions.append(para)
-    
-    # Apply spacing insertions in reverse order to maintain indices
-    # Reverse order ensures that indices remain valid
-    for para in reversed(spacing_insertions):
-        parent = para.getparent()
-        
-        if parent is not None:
-            try:
-                children = list(parent)
-                if para in children:
-                    index = children.index(para)
-                    
-                    # Create empty paragraph for spacing
-                    empty_para = etree.Element(f"{{{namespaces['text']}}}p")
-                    empty_para.text = ""
-                    
-                    # Insert after current paragraph
-                    parent.insert(index + 1, empty_para)
-            except ValueError:
-                # Element not found - skip
-                continue
+    return jsonify({'success': True, 'message': 'Processing started', 'job_id': channel.job_id})
+
+
+@app.route('/upload/session', methods=['POST'])
+def create_upload_session():
+    """Start a chunked upload: {"filename", "size"} -> session_id, chunk_size"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    
+    if not filename.lower().endswith('.odt'):
+        return jsonify({'error': 'Only ODT files are supported'}), 400
     
-    return root
+    try:
+        session = chunked_uploads.create(filename, data.get('size'))
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    return jsonify({'success': True, **session, 'received': []})
+
 
+@app.route('/upload/session/<session_id>')
+def upload_session_status(session_id):
+    """Received chunks of a session (to resume after a reconnect), job_id once complete"""
+    try:
+        return jsonify({'success': True, **chunked_uploads.load(session_id)})
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e)}), e.status
 
-# ==================== MAIN ODT PROCESSING ====================
 
-def process_odt_file(input_file, output_file, send_status_update):
+@app.route('/upload/session/<session_id>/<int:index>', methods=['PUT'])
+def upload_chunk(session_id, index):
     """
-    Main function to process ODT file with all operations
+    Store one chunk; the one completing the file starts processing
+    and the response carries its job_id
     """
-    temp_dir = tempfile.mkdtemp()
-    
     try:
-        # Step 0: Validate ODT file
-        send_status_update({
-            'type': 'status',
-            'name': 'Validate ODT File',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        
-        is_valid, issues = validate_odt_file(input_file)
-        
-        if not is_valid:
-            send_status_update({
-                'type': 'status',
-                'name': 'Validate ODT File',
-                'status': 'failed',
-                'time': f"{(time.time() - start_time):.2f}s"
-            })
-            raise Exception(f"Invalid ODT file. Issues found:\n" + "\n".join(f"- {issue}" for issue in issues))
-        
-        send_status_update({
-            'type': 'status',
-            'name': 'Validate ODT File',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Extract ODT file
-        with zipfile.ZipFile(input_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # Load and parse content.xml
-        content_file = os.path.join(temp_dir, 'content.xml')
-        tree = etree.parse(content_file)
-        root = tree.getroot()
-        
-        # Step 1: Fix Question Numbers and Remove Brackets
-        send_status_update({
-            'type': 'status',
-            'name': 'Fix Question Numbers & Remove Brackets',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root, questions_fixed = fix_odt_question_numbers_and_brackets(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Fix Question Numbers & Remove Brackets',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 2: Ensure Spacing Before Questions
-        send_status_update({
-            'type': 'status',
-            'name': 'Ensure Spacing Before Questions',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = ensure_spacing_before_question_tags_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Ensure Spacing Before Questions',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 3: Combined Text Operations
-        send_status_update({
-            'type': 'status',
-            'name': 'Combined Text Operations',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = combined_text_operations_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Combined Text Operations',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 4: Question Types to Next Line
-        send_status_update({
-            'type': 'status',
-            'name': 'Question Types to Next Line',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = shift_question_types_to_next_line_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Question Types to Next Line',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 5: Normalize Option Spacing
-        send_status_update({
-            'type': 'status',
-            'name': 'Normalize Option Spacing',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = normalize_option_spacing_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Normalize Option Spacing',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 6: Add Explanation Tags
-        send_status_update({
-            'type': 'status',
-            'name': 'Add Explanation Tags',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = add_explanation_tags_if_text_present_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Add Explanation Tags',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Step 7: Add Line Spacing
-        send_status_update({
-            'type': 'status',
-            'name': 'Add Line Spacing',
-            'status': 'in_progress',
-            'time': '0.00s'
-        })
-        start_time = time.time()
-        root = add_line_spacing_after_question_answer_odt(root, ODT_NAMESPACES)
-        send_status_update({
-            'type': 'status',
-            'name': 'Add Line Spacing',
-            'status': 'completed',
-            'time': f"{(time.time() - start_time):.2f}s"
-        })
-        
-        # Save modified XML
-        tree.write(content_file, xml_declaration=True, encoding='UTF-8', pretty_print=True)
-        
-        # Create output ODT file
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
-            for foldername, subfolders, filenames in os.walk(temp_dir):
-                for filename in filenames:
-                    file_path = os.path.join(foldername, filename)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zip_ref.write(file_path, arcname)
+        session = chunked_uploads.write_chunk(session_id, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+        if 'job_id' in session:
+            return jsonify({'success': True, 'message': 'Processing started', 'job_id': session['job_id']})
+        if len(session['received']) < session['chunks']:
+            return jsonify({'success': True, 'received': len(session['received']), 'chunks': session['chunks']})
         
-        return questions_fixed
+        finished = chunked_uploads.finish(session_id, app.config['UPLOAD_SPOOL_FOLDER'])
+    except ChunkedUploadError as e:
+        return jsonify({'error': str(e)}), e.status
     
-    except Exception as e:
-        raise Exception(f"ODT processing failed: {str(e)}")
+    if finished is None:
+        return jsonify({'error': 'Upload session is already complete'}), 410
+    temp_file_path, sha256 = finished
     
-    finally:
-        # Cleanup temp directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    channel = status_channels.create()
+    response = start_upload_job(channel, temp_file_path, session['filename'], sha256)
+    if response.status_code == 200:
+        chunked_uploads.record_job(session_id, channel.job_id)
+    return response
 
 
-# ==================== FLASK ROUTES ====================
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-
-@app.route('/status')
-def status():
-    """SSE endpoint for real-time status updates"""
-    def generate():
-        while True:
-            try:
-                # Wait for status update with timeout
-                update = status_queue.get(timeout=30)
-                yield f"data: {json.dumps(update)}\n\n"
-                
-                # If processing is complete or error, stop the stream
-                if update.get('type') in ['complete', 'error']:
-                    break
-            except queue.Empty:
-                # Send keepalive
-                yield f"data: {json.dumps({'type': 'keepalive'})}\n\n"
+@app.route('/batch', methods=['POST'])
+def upload_batch():
+    """
+    Handle a zip of ODT/DOCX files: per-file progress on /status/<job_id>
+    ('file' events), result archive + manifest.json on 'complete'
+    """
+    try:
+        files = request.files
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
     
-    return Response(generate(), mimetype='text/event-stream')
-
-
-def send_status_update(update):
-    """Helper function to send status updates"""
-    status_queue.put(update)
-
-
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    """Handle file upload and processing"""
-    if 'file' not in request.files:
+    if 'file' not in files:
         return jsonify({'error': 'No file uploaded'}), 400
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    # Check file extension
-    if not file.filename.lower().endswith('.odt'):
-        return jsonify({'error': 'Only ODT files are supported'}), 400
+    if not file.filename.lower().endswith('.zip'):
+        return jsonify({'error': 'Batch uploads must be a ZIP of ODT/DOCX files'}), 400
     
-    # Save uploaded file temporarily
+    # The archive is already on disk (spooled while it arrived) and its
+    # central directory passed the zip limits, so extracting the members
+    # can't blow up
     filename = secure_filename(file.filename)
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.odt')
-    temp_file_path = temp_file.name
-    file.save(temp_file_path)
-    temp_file.close()
+    try:
+        temp_file_path = claim_spool(file).path
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
     
-    def process_in_background():
-        """Background processing function"""
-        try:
-            start_total_time = time.time()
-            
-            # Create output file path
-            temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.odt')
-            temp_output.close()
-            
-            # Process the ODT file
-            questions_fixed = process_odt_file(temp_file_path, temp_output.name, send_status_update)
-            
-            # Read processed file
-            with open(temp_output.name, 'rb') as f:
-                output_data = f.read()
-            
-            # Clean up temp files
-            os.unlink(temp_file_path)
-            os.unlink(temp_output.name)
-            
-            total_time = time.time() - start_total_time
-            
-            # Save to uploads folder
-            output_filename = f"processed_{filename}"
-            output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-            with open(output_path, 'wb') as f:
-                f.write(output_data)
-            
-            send_status_update({
-                'type': 'complete',
-                'filename': output_filename,
-                'total_time': f"{total_time:.2f}",
-                'questions_fixed': questions_fixed
-            })
-        
-        except Exception as e:
-            send_status_update({
-                'type': 'error',
-                'message': str(e)
-            })
-            # Clean up temp file on error
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+    if not zipfile.is_zipfile(temp_file_path):
+        os.unlink(temp_file_path)
+        return jsonify({'error': 'File is not a valid ZIP archive'}), 400
+    
+    channel = status_channels.create()
+    archive_path = os.path.join(artifact_store.job_folder(channel.job_id), f"processed_{filename}")
     
-    # Start background thread
-    thread = threading.Thread(target=process_in_background)
+    # Coordinator thread - the files themselves run on the worker pool
+    thread = threading.Thread(target=BatchJob(temp_file_path, archive_path, channel).run)
     thread.daemon = True
     thread.start()
     
-    return jsonify({'success': True, 'message': 'Processing started'})
+    return jsonify({'success': True, 'message': 'Batch processing started', 'job_id': channel.job_id})
 
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    """Download processed file"""
+@app.route('/analyze', methods=['POST'])
+def analyze_file():
+    """
+    Dry run: question statistics of an uploaded ODT file as JSON (question
+    types, duplicate numbers, answers without explanations). Nothing is
+    processed or written - the analysis runs on the worker pool (503 when
+    it is full, like /upload) and the report comes back in this response.
+    """
+    try:
+        files = request.files
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if 'file' not in files or files['file'].filename == '':
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    file = files['file']
+    if not file.filename.lower().endswith('.odt'):
+        return jsonify({'error': 'Only ODT files are supported'}), 400
+    
+    try:
+        spool = claim_spool(file)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # No status channel: the result comes back through the Future
+        future = worker_pool.submit(None, analyze_upload_job, spool.path, report_crash=False)
+    except PoolFullError:
+        os.unlink(spool.path)
+        return server_busy_response()
+    
+    try:
+        result = future.result()
+    except Exception as e:
+        return jsonify({'error': f"Worker process failed: {str(e)}"}), 500
+    finally:
+        os.unlink(spool.path)
+    
+    if 'error' in result:
+        return jsonify({'error': result['error']}), 400
+    return jsonify({'success': True, 'filename': secure_filename(file.filename), 'report': result['report']})
+
+
+@app.route('/stats')
+def stats():
+    """Worker pool queue depth/utilization, result/block cache usage and artifact disk usage"""
+    return jsonify({
+        **worker_pool.stats(),
+        'result_cache': result_cache.stats(),
+        'block_cache': block_cache.stats() if block_cache is not None else None,
+        'artifacts': artifact_store.stats(),
+        'async_sse': async_sse.stats()
+    })
+
+
+@app.route('/download/<job_id>/<filename>')
+def download_file(job_id, filename):
+    """Download processed file (ETag/304, Range, sendfile or X-Accel-Redirect)"""
+    if artifact_store.job_folder(job_id, create=False) is None:
+        return jsonify({'error': 'Unknown job'}), 404
     try:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        return send_file(file_path, as_attachment=True)
+        response = send_download(app.config['ARTIFACT_FOLDER'], f"{job_id}/{filename}")
+        artifact_store.touch(job_id)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
 
 if __name__ == '__main__':
+    # Only the reloader's child process serves requests (and has the channels)
+    if app.config['ASYNC_SSE_PORT'] and is_running_from_reloader():
+        async_sse.start(app.config['ASYNC_SSE_HOST'], app.config['ASYNC_SSE_PORT'])
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
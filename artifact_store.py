@@ -0,0 +1,154 @@
+"""
+Processed files (artifacts) ka lifecycle.
+
+Har job ka output apne folder <root>/<job_id>/ mein jata hai, is liye do
+log ek hi naam ki file (exam.odt) saath upload karein to ek doosre ka
+result overwrite nahi hota. Folder ki mtime us ka "last used" hai (file
+likhne ya download hone par update hoti hai):
+    - TTL se purane job folders hata diye jate hain
+    - phir bhi total max_bytes se zyada ho to least recently used pehle
+Startup par pichle runs ki chhodi hui temp/spool files bhi saaf hoti hain.
+
+Sab kuch filesystem par hai, is liye web process aur worker processes
+dono ek hi store use kar sakte hain.
+"""
+import glob
+import os
+import re
+import shutil
+import threading
+import time
+
+# Job IDs are uuid4 hex strings (JobChannelRegistry)
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def folder_size(path):
+    """Total size of the files directly inside path"""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except FileNotFoundError:
+        pass
+    return total
+
+
+class ArtifactStore:
+    """
+    Per-job artifact folders with a disk budget
+    max_bytes: total size kept; ttl_seconds: unused folders older than this go
+    """
+    
+    def __init__(self, root, max_bytes, ttl_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.evicted = 0
+        self.orphans_reclaimed = 0
+        os.makedirs(root, exist_ok=True)
+    
+    def job_folder(self, job_id, create=True):
+        """Folder of a job's artifacts (None for an invalid job ID)"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        path = os.path.join(self.root, job_id)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+    
+    def touch(self, job_id):
+        """Mark a job's artifacts as recently used (e.g. on download)"""
+        path = self.job_folder(job_id, create=False)
+        if path is not None:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+    
+    def jobs(self):
+        """(last used, size, job folder) of every job"""
+        jobs = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False) or not JOB_ID_PATTERN.match(entry.name):
+                    continue
+                try:
+                    last_used = entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                jobs.append((last_used, folder_size(entry.path), entry.path))
+        return jobs
+    
+    def remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+        with self.lock:
+            self.evicted += 1
+    
+    def evict(self, keep=None):
+        """
+        Remove expired job folders, then least recently used ones until the
+        store fits in max_bytes. keep: job ID that is never removed (the
+        one that was just written)
+        """
+        keep_path = os.path.join(self.root, keep) if keep else None
+        expires_before = time.time() - self.ttl_seconds
+        jobs = []
+        for last_used, size, path in sorted(self.jobs()):
+            if path == keep_path:
+                continue
+            if last_used < expires_before:
+                self.remove(path)
+            else:
+                jobs.append((size, path))
+        
+        total = sum(size for size, _ in jobs) + (folder_size(keep_path) if keep_path else 0)
+        for size, path in jobs:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+    
+    def reclaim_orphans(self, patterns, min_age):
+        """
+        Delete files/folders matching the glob patterns that are older than
+        min_age seconds (temp files of jobs that died with an old process;
+        younger ones may still belong to a running request)
+        """
+        older_than = time.time() - min_age
+        reclaimed = 0
+        for pattern in patterns:
+            for path in glob.glob(pattern):
+                try:
+                    if os.stat(path).st_mtime >= older_than:
+                        continue
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.unlink(path)
+                    reclaimed += 1
+                except FileNotFoundError:
+                    pass
+        with self.lock:
+            self.orphans_reclaimed += reclaimed
+        return reclaimed
+    
+    def stats(self):
+        """Store size/budget, eviction counters and free space of the volume"""
+        jobs = self.jobs()
+        disk = shutil.disk_usage(self.root)
+        with self.lock:
+            return {
+                'jobs': len(jobs),
+                'bytes': sum(size for _, size, _ in jobs),
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'evicted': self.evicted,
+                'orphans_reclaimed': self.orphans_reclaimed,
+                'disk_total': disk.total,
+                'disk_used': disk.used,
+                'disk_free': disk.free
+            }
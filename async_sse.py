@@ -0,0 +1,172 @@
+"""
+Asyncio SSE server for job status streams.
+
+Flask ke SSE route par har khuli /status connection poori job ke dauran
+ek WSGI thread ko rok kar rakhti hai - kuch sau browser tabs aur server
+ke threads khatam. Yeh server web process ke andar apne thread mein ek
+event loop chalata hai aur wahi job channels (JobChannelRegistry) serve
+karta hai: har subscriber sirf ek coroutine hai, is liye hazaron streams
+ek hi loop par chal sakti hain. Documents ki processing pehle ki tarah
+worker pool mein hoti hai.
+
+Channel par publish hone par loop ko sirf ek call_soon_threadsafe milta
+hai (per channel, chahe us ke kitne bhi subscribers hon).
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import urlsplit
+from job_channels import TERMINAL_EVENT_TYPES
+
+# Longest request line + headers accepted
+MAX_REQUEST_HEAD = 16 * 1024
+REQUEST_HEAD_TIMEOUT = 10  # seconds
+
+
+class AsyncSSEServer:
+    """
+    Serves GET <path_prefix><job_id> as text/event-stream from channels
+    keepalive_event: event sent when nothing arrived for keepalive seconds
+    """
+    
+    def __init__(self, channels, path_prefix, keepalive_event, keepalive=30):
+        self.channels = channels
+        self.path_prefix = path_prefix
+        self.keepalive_event = keepalive_event
+        self.keepalive = keepalive
+        self.loop = None
+        self.port = None
+        # Job ID -> (channel listener, set of subscriber wake-up events)
+        self.subscribers = {}
+    
+    def start(self, host, port):
+        """Bind (errors surface here) and serve on a daemon thread"""
+        self.loop = asyncio.new_event_loop()
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_HEAD)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        thread = threading.Thread(target=self.loop.run_forever, name='async-sse')
+        thread.daemon = True
+        thread.start()
+    
+    @property
+    def running(self):
+        return self.port is not None
+    
+    # ---- subscriber bookkeeping (event loop thread only) ----
+    
+    def subscribe(self, channel, wakeup):
+        entry = self.subscribers.get(channel.job_id)
+        if entry is None:
+            job_id = channel.job_id
+            
+            def listener():
+                # Runs in the publishing thread
+                self.loop.call_soon_threadsafe(self.wake, job_id)
+            
+            entry = self.subscribers[job_id] = (listener, set())
+            channel.add_listener(listener)
+        entry[1].add(wakeup)
+    
+    def unsubscribe(self, channel, wakeup):
+        listener, wakeups = self.subscribers[channel.job_id]
+        wakeups.discard(wakeup)
+        if not wakeups:
+            del self.subscribers[channel.job_id]
+            channel.remove_listener(listener)
+    
+    def wake(self, job_id):
+        entry = self.subscribers.get(job_id)
+        if entry is not None:
+            for wakeup in entry[1]:
+                wakeup.set()
+    
+    # ---- HTTP ----
+    
+    async def handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_HEAD_TIMEOUT)
+            method, target, _ = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+            path = urlsplit(target).path
+            
+            channel = None
+            if method == 'GET' and path.startswith(self.path_prefix):
+                channel = self.channels.get(path[len(self.path_prefix):])
+            if channel is None:
+                await self.send_not_found(writer)
+            else:
+                await self.stream(channel, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def send_not_found(self, writer):
+        body = json.dumps({'error': 'Unknown or expired job'}).encode()
+        writer.write(
+            b'HTTP/1.1 404 Not Found\r\n'
+            b'Content-Type: application/json\r\n'
+            b'Access-Control-Allow-Origin: *\r\n'
+            b'Connection: close\r\n'
+            + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    
+    async def stream(self, channel, writer):
+        """Same events as the Flask route: buffered ones first, until complete/error"""
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/event-stream\r\n'
+            b'Cache-Control: no-cache\r\n'
+            b'X-Accel-Buffering: no\r\n'
+            b'Access-Control-Allow-Origin: *\r\n'
+            b'Connection: close\r\n\r\n'
+        )
+        wakeup = asyncio.Event()
+        self.subscribe(channel, wakeup)
+        sequence = 0
+        try:
+            while True:
+                wakeup.clear()
+                pending, sequence = channel.events_since(sequence)
+                if not pending:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        writer.write(f"data: {json.dumps(self.keepalive_event)}\n\n".encode())
+                        await writer.drain()
+                    continue
+                
+                for event in pending:
+                    writer.write(f"data: {json.dumps(event)}\n\n".encode())
+                    if event.get('type') in TERMINAL_EVENT_TYPES:
+                        await writer.drain()
+                        return
+                await writer.drain()
+        finally:
+            self.unsubscribe(channel, wakeup)
+    
+    def stats(self):
+        """Open async streams (read from another thread: approximate)"""
+        return {
+            'port': self.port,
+            'streams': sum(len(wakeups) for _, wakeups in list(self.subscribers.values()))
+        }
+
+
+def sse_base_url(request, configured, server):
+    """
+    Origin the browser should open status streams on: the configured URL
+    (e.g. behind a proxy), the async server's port on this host, or '' for
+    the Flask route
+    """
+    if configured:
+        return configured.rstrip('/')
+    if server is None or not server.running:
+        return ''
+    hostname = urlsplit(request.host_url).hostname
+    if ':' in hostname:
+        hostname = f"[{hostname}]"
+    return f"{request.scheme}://{hostname}:{server.port}"
@@ -0,0 +1,103 @@
+"""
+Scaling check for the ODT paragraph-insert steps.
+
+shift_question_types_to_next_line_odt, add_explanation_tags_if_text_present_odt
+aur add_line_spacing_after_question_answer_odt ko ek flat office:text body
+(sab paragraphs ek hi parent ke andar) par chalata hai - yahi woh case hai
+jahan index-based insertion O(n²) ho jati thi. Har size par time aur
+consecutive sizes ke beech exponent print hota hai (~1.0 = linear).
+
+Usage:
+    python benchmarks/bench_insert_steps.py [--sizes 25000 50000 100000 200000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+from lxml import etree
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.run_benchmarks import SUPERLINEAR_EXPONENT, scaling_exponent  # noqa: E402
+from odt_pipeline import (  # noqa: E402
+    ODT_NAMESPACES,
+    add_explanation_tags_if_text_present_odt,
+    add_line_spacing_after_question_answer_odt,
+    shift_question_types_to_next_line_odt
+)
+
+INSERT_STEPS = [
+    shift_question_types_to_next_line_odt,
+    add_explanation_tags_if_text_present_odt,
+    add_line_spacing_after_question_answer_odt
+]
+
+# One question = 8 paragraphs, 3 of which trigger an insertion
+QUESTION_PARAGRAPHS = [
+    "Question: {n} HOTSPOT Select the correct option",
+    "Which statement is correct?",
+    "A. First option",
+    "B. Second option",
+    "C. Third option",
+    "Answer: B",
+    "The second option is correct because of the stated reason.",
+    "Reference: https://example.com/{n}"
+]
+
+
+def build_flat_body(paragraphs):
+    """office:document-content with `paragraphs` text:p siblings under office:text"""
+    text_ns = ODT_NAMESPACES['text']
+    office_ns = ODT_NAMESPACES['office']
+    root = etree.Element(f"{{{office_ns}}}document-content", nsmap=ODT_NAMESPACES)
+    body = etree.SubElement(etree.SubElement(root, f"{{{office_ns}}}body"), f"{{{office_ns}}}text")
+    
+    for i in range(paragraphs):
+        para = etree.SubElement(body, f"{{{text_ns}}}p")
+        para.text = QUESTION_PARAGRAPHS[i % len(QUESTION_PARAGRAPHS)].format(n=i // len(QUESTION_PARAGRAPHS) + 1)
+    return root
+
+
+def time_steps(paragraphs, repeat=3):
+    """Best-of-`repeat` seconds per step, each run on a fresh flat body"""
+    times = {}
+    for _ in range(repeat):
+        root = build_flat_body(paragraphs)
+        gc.collect()
+        for step in INSERT_STEPS:
+            start_time = time.perf_counter()
+            step(root, ODT_NAMESPACES)
+            seconds = time.perf_counter() - start_time
+            times[step.__name__] = min(seconds, times.get(step.__name__, seconds))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the ODT paragraph-insert steps on flat bodies")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[25000, 50000, 100000, 200000],
+                        help="paragraphs per body")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per size (fastest is kept)")
+    args = parser.parse_args(argv)
+    
+    previous = None
+    superlinear = False
+    for size in args.sizes:
+        times = time_steps(size, args.repeat)
+        print(f"{size:>8} paragraphs")
+        for name, seconds in times.items():
+            exponent = scaling_exponent(previous[0], previous[1][name], size, seconds) if previous else None
+            flag = ''
+            if exponent is not None and exponent > SUPERLINEAR_EXPONENT:
+                flag = '  ⚠️ superlinear'
+                superlinear = True
+            print(f"    {name:<45} {seconds:8.3f}s  {'' if exponent is None else exponent}{flag}")
+        previous = (size, times)
+    
+    return 1 if superlinear else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
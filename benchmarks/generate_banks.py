@@ -0,0 +1,284 @@
+"""
+Synthetic question-bank generator for benchmarks.
+
+Real exam banks jaisi ODT aur DOCX files banata hai: HOTSPOT/DRAG DROP
+headers, [People] jaise bracket tags, A-J options, Answer/Explanation/
+Reference blocks, <map> noise aur embedded images. Same seed = same file.
+
+Usage:
+    python benchmarks/generate_banks.py OUTPUT_DIR [--sizes 100 1000 ...] [--seed 1]
+"""
+import argparse
+import os
+import random
+import struct
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+QUESTION_TYPES = ['HOTSPOT', 'DRAG DROP', 'SIMULATION', 'DRAGDROP', 'DROPDOWN',
+                  'FILLINTHEBLANK', 'POSITIONEDDRAGDROP', 'POSITIONEDDROPDOWN']
+BRACKET_TAGS = ['[People]', '[Process]', '[Business Environment]', '[Domain 2]']
+HEADER_FORMATS = ['QUESTION NO: {number}', 'Question No: {number}', 'Question: {number}', 'QUESTION NO:{number}']
+OPTION_FORMATS = ['{letter}. {text}', '{letter}.    {text}', '{letter} .{text}', '{letter}.  {text}', '{letter}.\t{text}']
+WORDS = ('network policy admin role access cloud storage audit region server '
+         'identity backup traffic subnet cluster deploy monitor latency quota').split()
+
+# Every Nth question gets an image after its stem
+IMAGE_EVERY = 10
+IMAGE_COUNT = 5
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def question_block(rng, index, total):
+    """
+    Paragraphs of one question as (kind, text) pairs; kind is 'text' or
+    'image' (text = image number)
+    """
+    paragraphs = []
+    
+    header = rng.choice(HEADER_FORMATS).format(number=rng.randint(1, total))
+    if rng.random() < 0.3:
+        header += ' ' + rng.choice(QUESTION_TYPES)
+    if rng.random() < 0.4:
+        header += ' ' + rng.choice(BRACKET_TAGS)
+    if rng.random() < 0.03:
+        # Header glued to the end of the previous text
+        header = sentence(rng, 5) + ' ' + header.replace('Question No:', 'QUESTION NO:').replace('Question:', 'QUESTION NO:')
+    paragraphs.append(('text', header))
+    
+    stem = sentence(rng, rng.randint(10, 30))
+    if rng.random() < 0.1:
+        stem += ' <map>hotspot area 1</map>'
+    paragraphs.append(('text', stem))
+    
+    if index % IMAGE_EVERY == 0:
+        paragraphs.append(('image', index // IMAGE_EVERY % IMAGE_COUNT))
+    
+    for letter in 'ABCDEFGHIJ'[:rng.randint(2, 10)]:
+        option = rng.choice(OPTION_FORMATS).format(letter=letter, text=sentence(rng, rng.randint(3, 8)))
+        paragraphs.append(('text', option))
+    
+    paragraphs.append(('text', f"Answer: {rng.choice('ABCD')}"))
+    
+    style = rng.random()
+    if style < 0.3:
+        paragraphs.append(('text', 'Explanation: ' + sentence(rng, 15)))
+    elif style < 0.8:
+        for _ in range(rng.randint(1, 3)):
+            paragraphs.append(('text', sentence(rng, rng.randint(8, 20))))
+        if rng.random() < 0.2:
+            paragraphs.append(('text', '<map>drag item</map>'))
+    
+    if rng.random() < 0.7:
+        paragraphs.append(('text', rng.choice(['References: https://example.com/docs', 'Reference: https://example.com/kb'])))
+    paragraphs.append(('text', ''))
+    
+    return paragraphs
+
+
+def iter_bank(questions, seed):
+    rng = random.Random(seed)
+    for index in range(questions):
+        yield from question_block(rng, index, questions)
+
+
+def png_bytes(seed, size=64):
+    """Small valid RGB PNG with noisy pixels"""
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + bytes(rng.getrandbits(8) for _ in range(size * 3)) for _ in range(size))
+    
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+# ==================== ODT ====================
+
+ODT_CONTENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<office:document-content'
+    ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    ' xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"'
+    ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+    ' xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"'
+    ' xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0"'
+    ' xmlns:xlink="http://www.w3.org/1999/xlink" office:version="1.3">'
+    '<office:automatic-styles>'
+    '<style:style style:name="P1" style:family="paragraph"/>'
+    '<style:style style:name="T1" style:family="text"/>'
+    '</office:automatic-styles>'
+    '<office:body><office:text>'
+)
+ODT_CONTENT_TAIL = '</office:text></office:body></office:document-content>'
+
+ODT_MANIFEST_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.3">'
+    '<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>'
+    '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+    '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+)
+
+ODT_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" office:version="1.3"/>'
+)
+
+
+def odt_paragraph(kind, value, rng):
+    if kind == 'image':
+        return (
+            '<text:p text:style-name="P1"><draw:frame draw:name="Image" svg:width="1in" svg:height="1in">'
+            f'<draw:image xlink:href="Pictures/image{value}.png"/></draw:frame></text:p>'
+        )
+    if len(value) > 10 and rng.random() < 0.3:
+        # Split across a span, like LibreOffice does after formatting
+        split = rng.randint(1, len(value) - 1)
+        return (f'<text:p text:style-name="P1"><text:span text:style-name="T1">{escape(value[:split])}</text:span>'
+                f'{escape(value[split:])}</text:p>')
+    return f'<text:p text:style-name="P1">{escape(value)}</text:p>'
+
+
+def write_odt_bank(path, questions, seed=1):
+    rng = random.Random(seed + 1)
+    body = ''.join(odt_paragraph(kind, value, rng) for kind, value in iter_bank(questions, seed))
+    
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr(zipfile.ZipInfo('mimetype'), 'application/vnd.oasis.opendocument.text', zipfile.ZIP_STORED)
+        z.writestr('content.xml', ODT_CONTENT_HEAD + body + ODT_CONTENT_TAIL)
+        z.writestr('styles.xml', ODT_STYLES)
+        manifest = ODT_MANIFEST_HEAD
+        for i in range(IMAGE_COUNT):
+            z.writestr(f'Pictures/image{i}.png', png_bytes(i), zipfile.ZIP_STORED)
+            manifest += f'<manifest:file-entry manifest:full-path="Pictures/image{i}.png" manifest:media-type="image/png"/>'
+        z.writestr('META-INF/manifest.xml', manifest + '</manifest:manifest>')
+
+
+# ==================== DOCX ====================
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+DOCX_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+DOCX_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    ' xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"'
+    ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+    ' xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<w:body>'
+)
+DOCX_DOCUMENT_TAIL = '<w:sectPr/></w:body></w:document>'
+
+# 1 inch in EMU
+IMAGE_EXTENT = 914400
+
+
+def docx_image_run(number):
+    return (
+        f'<w:r><w:drawing><wp:inline><wp:extent cx="{IMAGE_EXTENT}" cy="{IMAGE_EXTENT}"/>'
+        f'<wp:docPr id="{number + 1}" name="Picture {number + 1}"/>'
+        '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:pic><pic:nvPicPr><pic:cNvPr id="{number + 1}" name="image{number}.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="rIdImage{number}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{IMAGE_EXTENT}" cy="{IMAGE_EXTENT}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r>'
+    )
+
+
+def docx_paragraph(kind, value, rng):
+    if kind == 'image':
+        return f'<w:p>{docx_image_run(value)}</w:p>'
+    if not value:
+        return '<w:p/>'
+    if len(value) > 10 and rng.random() < 0.3:
+        # Text split over two runs, the second one bold
+        split = rng.randint(1, len(value) - 1)
+        return (f'<w:p><w:r><w:t xml:space="preserve">{escape(value[:split])}</w:t></w:r>'
+                f'<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">{escape(value[split:])}</w:t></w:r></w:p>')
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(value)}</w:t></w:r></w:p>'
+
+
+def write_docx_bank(path, questions, seed=1):
+    rng = random.Random(seed + 1)
+    body = ''.join(docx_paragraph(kind, value, rng) for kind, value in iter_bank(questions, seed))
+    
+    document_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        + ''.join(
+            f'<Relationship Id="rIdImage{i}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+            f'Target="media/image{i}.png"/>'
+            for i in range(IMAGE_COUNT)
+        )
+        + '</Relationships>'
+    )
+    
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml', DOCX_CONTENT_TYPES)
+        z.writestr('_rels/.rels', DOCX_PACKAGE_RELS)
+        z.writestr('word/document.xml', DOCX_DOCUMENT_HEAD + body + DOCX_DOCUMENT_TAIL)
+        z.writestr('word/_rels/document.xml.rels', document_rels)
+        for i in range(IMAGE_COUNT):
+            z.writestr(f'word/media/image{i}.png', png_bytes(i), zipfile.ZIP_STORED)
+
+
+def bank_path(output_dir, questions, extension, seed=1):
+    return os.path.join(output_dir, f"bank_{questions}_seed{seed}.{extension}")
+
+
+def generate(output_dir, sizes, seed=1, formats=('odt', 'docx')):
+    """
+    Write bank_<n>_seed<seed>.odt/.docx for every size (existing files are
+    reused - same seed always gives the same bank); returns the paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {'odt': write_odt_bank, 'docx': write_docx_bank}
+    paths = []
+    for questions in sizes:
+        for extension in formats:
+            path = bank_path(output_dir, questions, extension, seed)
+            if not os.path.exists(path):
+                writers[extension](path, questions, seed)
+            paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic ODT/DOCX question banks")
+    parser.add_argument('output_dir')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="questions per bank")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    
+    for path in generate(args.output_dir, args.sizes, args.seed):
+        print(f"{path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
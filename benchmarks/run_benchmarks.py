@@ -0,0 +1,177 @@
+"""
+Scaling benchmark for the ODT/DOCX pipelines.
+
+Har (target, bank size) ek alag Python process mein chalta hai taake peak
+RSS sahi naapa ja sake. Har run ka wall time, peak RSS aur per-step time
+record hota hai; consecutive sizes ke beech scaling exponent bhi nikalta
+hai (1.0 = linear, 2.0 = quadratic) - quadratic regressions yahin pakri
+jati hain.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 100 1000 10000 100000] [--banks DIR]
+                                        [--targets odt docx docx-app-odt] [--output results.json]
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.generate_banks import DEFAULT_SIZES, generate, bank_path  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Target name -> (input format, description)
+TARGETS = {
+    'odt': ('odt', "app.py: process_odt_file"),
+    'docx': ('docx', "app-docx.py: process_docx_file"),
+    'docx-app-odt': ('odt', "app-docx.py: fix_odt_question_numbers")
+}
+
+# Exponent above which a step is reported as superlinear
+SUPERLINEAR_EXPONENT = 1.3
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def measure(target, input_path):
+    """Run one target on one bank in this process; returns a result dict"""
+    steps = {}
+    
+    def record_step(update):
+        if update.get('type') == 'status' and update.get('status') == 'completed':
+            steps[update['name']] = float(update['time'].rstrip('s'))
+    
+    output_dir = tempfile.mkdtemp()
+    output_path = os.path.join(output_dir, 'out.' + TARGETS[target][0])
+    
+    if target == 'odt':
+        from odt_pipeline import process_odt_file
+        run = lambda: process_odt_file(input_path, output_path, record_step)
+    elif target == 'docx':
+        from docx_pipeline import process_docx_file
+        run = lambda: process_docx_file(input_path, output_path, record_step)
+    else:
+        # app-docx.py can't be imported by name (hyphen); it also creates
+        # its uploads folder in the working directory
+        os.chdir(output_dir)
+        spec = importlib.util.spec_from_file_location('app_docx', os.path.join(REPO_DIR, 'app-docx.py'))
+        app_docx = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app_docx)
+        run = lambda: app_docx.fix_odt_question_numbers(input_path, output_path)
+    
+    start_time = time.perf_counter()
+    run()
+    wall_time = time.perf_counter() - start_time
+    
+    return {
+        'wall_time': round(wall_time, 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'steps': steps
+    }
+
+
+def measure_in_subprocess(target, input_path, timeout):
+    command = [sys.executable, os.path.abspath(__file__), '--measure', target, input_path]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout, cwd=REPO_DIR)
+    except subprocess.TimeoutExpired:
+        return {'error': f"timeout after {timeout}s"}
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def scaling_exponent(size_a, time_a, size_b, time_b):
+    """Slope on a log-log plot: time ~ size ** exponent"""
+    if not time_a or not time_b or size_a == size_b:
+        return None
+    return round(math.log(time_b / time_a) / math.log(size_b / size_a), 2)
+
+
+def add_scaling(results, sizes):
+    """Wall-time and per-step exponents between consecutive sizes"""
+    for target, by_size in results.items():
+        measured = [size for size in sizes if 'wall_time' in by_size.get(str(size), {})]
+        for smaller, larger in zip(measured, measured[1:]):
+            a, b = by_size[str(smaller)], by_size[str(larger)]
+            b['scaling'] = {'from_size': smaller, 'wall_time': scaling_exponent(smaller, a['wall_time'], larger, b['wall_time'])}
+            for step, step_time in b['steps'].items():
+                # Sub-10ms timings are mostly noise
+                if step_time >= 0.01 and a['steps'].get(step, 0) >= 0.01:
+                    b['scaling'][step] = scaling_exponent(smaller, a['steps'][step], larger, step_time)
+
+
+def print_report(results, sizes):
+    for target, by_size in results.items():
+        print(f"\n{target} ({TARGETS[target][1]})")
+        print(f"{'questions':>10} {'wall (s)':>10} {'peak RSS (MB)':>14} {'exponent':>9}")
+        for size in sizes:
+            result = by_size.get(str(size), {})
+            if 'error' in result:
+                print(f"{size:>10} {result['error']}")
+                continue
+            exponent = result.get('scaling', {}).get('wall_time')
+            print(f"{size:>10} {result['wall_time']:>10.3f} {str(result['peak_rss_mb']):>14} "
+                  f"{'' if exponent is None else exponent:>9}")
+            for step, value in result.get('scaling', {}).items():
+                if step not in ('from_size', 'wall_time') and value is not None and value > SUPERLINEAR_EXPONENT:
+                    print(f"{'':>10} ⚠️  {step}: exponent {value} (superlinear)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines on synthetic question banks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="questions per bank")
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=list(TARGETS))
+    parser.add_argument('--banks', default=os.path.join(tempfile.gettempdir(), 'question_banks'),
+                        help="where generated banks are kept (reused between runs)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=int, default=1800, help="seconds per run")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--measure', nargs=2, metavar=('TARGET', 'INPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.measure:
+        # Child process: one measurement, result as the last stdout line
+        print(json.dumps(measure(*args.measure)))
+        return
+    
+    formats = sorted({TARGETS[target][0] for target in args.targets})
+    print(f"Generating banks in {args.banks} ...")
+    generate(args.banks, args.sizes, args.seed, formats)
+    
+    results = {}
+    for target in args.targets:
+        results[target] = {}
+        for size in args.sizes:
+            input_path = bank_path(args.banks, size, TARGETS[target][0], args.seed)
+            print(f"{target} {size} ...", flush=True)
+            results[target][str(size)] = measure_in_subprocess(target, input_path, args.timeout)
+    
+    add_scaling(results, args.sizes)
+    print_report(results, args.sizes)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'sizes': args.sizes, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
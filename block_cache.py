@@ -0,0 +1,121 @@
+"""
+Persistent cache of processed question blocks (incremental reprocessing).
+
+Question bank mein 10 questions edit kar ke dobara upload karne par poori
+file ka result_cache miss hota hai, lekin baqi hazaron blocks wahi hain.
+BlockOdtWriter har block (header se Reference tak) ke XML ka hash banata
+hai; yahan se pehle ka processed output (template + question count) mil
+jata hai aur sirf badle hue blocks pipeline se guzarte hain.
+
+Key = sha256(pipeline fingerprint + namespace context + block XML), is
+liye code badalne par purane blocks khud hi miss ho jate hain. Entries
+ek SQLite file mein hain (WAL: kai worker processes saath parh/likh
+sakte hain); least recently used blocks max_bytes se upar evict hote hain.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Keys per IN (...) query (SQLite's default variable limit is 999)
+LOOKUP_BATCH_SIZE = 500
+
+
+class BlockCache:
+    """
+    Block templates by key, with a size cap and LRU eviction.
+    Connections are per thread; every process opens its own.
+    """
+    
+    def __init__(self, path, max_bytes, fingerprint):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint.encode()
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    def connect(self):
+        """This thread's connection (table created on first use)"""
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS blocks ('
+                           'key BLOB PRIMARY KEY, template BLOB, questions INTEGER NOT NULL, '
+                           'size INTEGER NOT NULL, used REAL NOT NULL)')
+            self.local.db = db
+        return db
+    
+    def key(self, context, block):
+        """Cache key of a block's XML (context: wrapper start tag with namespaces)"""
+        digest = hashlib.sha256(self.fingerprint)
+        digest.update(b'\x00' + context + b'\x00')
+        digest.update(block)
+        return digest.digest()
+    
+    def get_many(self, keys):
+        """
+        Returns: {key: (template, questions)} for the cached keys
+        (template None: block that has to be processed with its real numbers)
+        """
+        db = self.connect()
+        found = {}
+        unique_keys = list(set(keys))
+        batches = [unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                   for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE)]
+        
+        for batch in batches:
+            rows = db.execute(f"SELECT key, template, questions FROM blocks WHERE key IN ({','.join('?' * len(batch))})",
+                              batch)
+            for key, template, questions in rows:
+                found[key] = (template, questions)
+        
+        # Mark as recently used
+        if found:
+            now = time.time()
+            with db:
+                for batch in batches:
+                    db.execute(f"UPDATE blocks SET used = ? WHERE key IN ({','.join('?' * len(batch))})",
+                               [now] + batch)
+        return found
+    
+    def put_many(self, entries):
+        """Add (key, template or None, questions) entries, then evict"""
+        now = time.time()
+        db = self.connect()
+        with db:
+            db.executemany('INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)',
+                           ((key, template, questions, len(key) + len(template or b''), now)
+                            for key, template, questions in entries))
+        self.evict()
+    
+    def evict(self):
+        """Remove least recently used blocks until under max_bytes"""
+        db = self.connect()
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM blocks').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        expired = []
+        for key, size in db.execute('SELECT key, size FROM blocks ORDER BY used'):
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        with db:
+            db.executemany('DELETE FROM blocks WHERE key = ?', expired)
+    
+    def stats(self):
+        """
+        Current size (lookups happen in the worker processes; per-job
+        reuse is in the Serialize Output status: blocks, blocks_reused)
+        """
+        entries, size = self.connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blocks').fetchone()
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes
+        }
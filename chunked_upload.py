@@ -0,0 +1,237 @@
+"""
+Chunked, resumable uploads.
+
+Bari question bank ek hi request mein bhejne par network ki ek hichki
+poori upload zaya kar deti hai. Yahan file chunks mein aati hai:
+    
+    POST /upload/session              {"filename", "size"} -> session_id, chunk_size
+    GET  /upload/session/<id>         received chunks (resume ke liye)
+    PUT  /upload/session/<id>/<index> chunk bytes (X-Chunk-SHA256 header optional)
+
+Har chunk seedha session ki data file mein apne offset par likha jata hai
+(koi reassembly copy nahi) aur checksum/length theek hon to us ka marker
+file banta hai - server restart ke baad bhi session wahin se chalta hai.
+Pehle chunk par hi ZIP/mimetype check hota hai (upload_spool). Aakhri
+chunk commit hote hi file spool folder mein move hoti hai, us ki central
+directory zip limits par check hoti hai (zip_guard) aur job shuru;
+session us job ka ID yaad rakhta hai, is liye aakhri response gum ho jaye
+to dobara poochne par wahi job_id milta hai.
+
+Status 409 wale errors (checksum/length mismatch) par chunk dobara bhejein;
+baqi 4xx par retry ka faida nahi.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import zipfile
+from result_cache import file_sha256
+from upload_spool import SNIFF_SIZE, UploadRejected, check_upload_head
+from zip_guard import ZipLimitError
+
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkedUploadError(Exception):
+    """Rejected session/chunk request (message is user-facing)"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploads:
+    """
+    Upload sessions under directory/<session_id>/:
+        session.json  - filename, size, chunk_size, created
+                        (session.finished once complete, + job_id)
+        data          - the file, chunks written at their offsets
+        <index>.ok    - chunk committed (checksum/length verified)
+    zip_limits (ZipLimits or None): checked when the file is complete
+    """
+    
+    def __init__(self, directory, chunk_size, max_size, ttl_seconds, zip_limits=None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.zip_limits = zip_limits
+        os.makedirs(directory, exist_ok=True)
+    
+    def session_folder(self, session_id):
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ChunkedUploadError('Unknown or expired upload session', 404)
+        return os.path.join(self.directory, session_id)
+    
+    def create(self, filename, size):
+        """New session for a file of size bytes. Returns: session dict"""
+        self.expire()
+        if not isinstance(size, int) or size <= 0:
+            raise ChunkedUploadError('File size is missing or empty')
+        if size > self.max_size:
+            raise ChunkedUploadError(f"File is too large (limit: {self.max_size // (1024 * 1024)}MB)", 413)
+        
+        session_id = uuid.uuid4().hex
+        folder = os.path.join(self.directory, session_id)
+        os.makedirs(folder)
+        # Sparse file of the final size; chunks fill it in any order
+        with open(os.path.join(folder, 'data'), 'wb') as f:
+            f.truncate(size)
+        
+        session = {
+            'session_id': session_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': self.chunk_size,
+            'chunks': -(-size // self.chunk_size),
+            'created': time.time()
+        }
+        with open(os.path.join(folder, 'session.json'), 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        return session
+    
+    def load(self, session_id):
+        """
+        Session dict with the received chunk indexes; finished sessions
+        have finished=True and the job_id once it was recorded
+        """
+        folder = self.session_folder(session_id)
+        for name, finished in (('session.json', False), ('session.finished', True)):
+            try:
+                with open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+                break
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                raise ChunkedUploadError('Unknown or expired upload session', 404)
+        else:
+            raise ChunkedUploadError('Unknown or expired upload session', 404)
+        
+        session['finished'] = finished
+        session['received'] = self.received(folder)
+        return session
+    
+    def received(self, folder):
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-len('.ok')]) for name in names if name.endswith('.ok'))
+    
+    def write_chunk(self, session_id, index, stream, checksum=None):
+        """
+        Write chunk index from stream (file-like) at its offset and commit it
+        checksum: expected sha256 hex of the chunk (checked when given)
+        Returns: session dict (with received) after the commit
+        """
+        session = self.load(session_id)
+        folder = self.session_folder(session_id)
+        if session['finished']:
+            # Resent after the last chunk was committed (lost response)
+            if 'job_id' in session:
+                return session
+            raise ChunkedUploadError('Upload session is already complete', 410)
+        if not 0 <= index < session['chunks']:
+            raise ChunkedUploadError(f"Chunk {index} is out of range (0-{session['chunks'] - 1})")
+        
+        offset = index * session['chunk_size']
+        expected_length = min(session['chunk_size'], session['size'] - offset)
+        digest = hashlib.sha256()
+        length = 0
+        head = b''
+        
+        with open(os.path.join(folder, 'data'), 'r+b') as f:
+            f.seek(offset)
+            for block in iter(lambda: stream.read(STREAM_BLOCK_SIZE), b''):
+                length += len(block)
+                if length > expected_length:
+                    raise ChunkedUploadError(f"Chunk {index} is larger than {expected_length} bytes", 409)
+                if index == 0 and len(head) < SNIFF_SIZE:
+                    head += block[:SNIFF_SIZE - len(head)]
+                digest.update(block)
+                f.write(block)
+        
+        if length != expected_length:
+            raise ChunkedUploadError(f"Chunk {index} is incomplete ({length} of {expected_length} bytes)", 409)
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise ChunkedUploadError(f"Chunk {index} checksum mismatch, please resend it", 409)
+        
+        # Not a document? Stop at the first chunk, not the last
+        if index == 0:
+            try:
+                check_upload_head(head, os.path.splitext(session['filename'])[1].lower(), complete=True)
+            except UploadRejected as e:
+                self.discard(session_id)
+                raise ChunkedUploadError(str(e))
+        
+        open(os.path.join(folder, f"{index}.ok"), 'w').close()
+        session['received'] = self.received(folder)
+        return session
+    
+    def finish(self, session_id, spool_folder):
+        """
+        Move the completed file into spool_folder
+        Returns: (path, sha256), or None if another request already
+        finished this session
+        Raises: ChunkedUploadError (zip limits; the session is removed)
+        """
+        folder = self.session_folder(session_id)
+        extension = os.path.splitext(self.load(session_id)['filename'])[1].lower()
+        # Renaming the session file makes exactly one caller the finisher
+        try:
+            os.rename(os.path.join(folder, 'session.json'), os.path.join(folder, 'session.finished'))
+        except FileNotFoundError:
+            return None
+        
+        path = os.path.join(spool_folder, f"chunked-{session_id}{extension}")
+        os.replace(os.path.join(folder, 'data'), path)
+        
+        if self.zip_limits is not None:
+            try:
+                self.zip_limits.check_file(path)
+            except (OSError, zipfile.BadZipFile):
+                self.reject(session_id, path)
+                raise ChunkedUploadError("File is not a valid ZIP archive")
+            except ZipLimitError as e:
+                self.reject(session_id, path)
+                raise ChunkedUploadError(str(e))
+        
+        # The finished session stays (with its job_id) until it expires
+        for name in os.listdir(folder):
+            if name.endswith('.ok'):
+                os.unlink(os.path.join(folder, name))
+        return path, file_sha256(path)
+    
+    def record_job(self, session_id, job_id):
+        """Remember the job a finished session started"""
+        path = os.path.join(self.session_folder(session_id), 'session.finished')
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        session['job_id'] = job_id
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        os.replace(path + '.tmp', path)
+    
+    def discard(self, session_id):
+        shutil.rmtree(self.session_folder(session_id), ignore_errors=True)
+    
+    def reject(self, session_id, path):
+        """Remove a finished upload that failed the zip limits, and its session"""
+        os.unlink(path)
+        self.discard(session_id)
+    
+    def expire(self):
+        """Remove sessions older than the TTL (abandoned uploads)"""
+        expires_before = time.time() - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            folder = os.path.join(self.directory, name)
+            try:
+                if os.stat(folder).st_mtime < expires_before:
+                    shutil.rmtree(folder, ignore_errors=True)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,318 @@
+"""
+Command line processing of ODT/DOCX files (no Flask/browser needed).
+
+Usage:
+    python cli.py SOURCE_DIR OUTPUT_DIR [-j N] [--shards N] [--block-cache FILE] [--force] [--summary summary.json]
+    python cli.py SOURCE_DIR --analyze [-j N] [--summary report.json]
+
+SOURCE_DIR ki saari .odt/.docx files (subfolders samet) process ho kar
+OUTPUT_DIR mein same relative path par likhi jati hain. Jin files ka output
+input (aur pipeline code) se naya hai unhe skip kar diya jata hai. Pipeline
+ka fingerprint (code + QUESTION_TYPE_VENDOR) OUTPUT_DIR/.pipeline_fingerprint
+mein rehta hai; woh badle (jaise doosra vendor) to saari files dobara
+process hoti hain.
+--shards N: ek bari ODT file ko N processes mein shards bana kar process
+karta hai (kam files + bari files ke liye, jaise -j 1 --shards 8).
+--block-cache FILE: ODT question blocks ka cache (SQLite file); edit ki hui
+file dobara chalane par sirf badle hue blocks process hote hain.
+--analyze: kuch process/likhe baghair har ODT file ki report (questions,
+types, duplicate numbers, answers without explanation).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from block_cache import BlockCache
+from odt_pipeline import analyze_odt_file, process_odt_file
+from docx_pipeline import process_docx_file
+from question_types import QUESTION_TYPE_VENDOR
+from result_cache import pipeline_fingerprint
+
+SUPPORTED_EXTENSIONS = ('.odt', '.docx')
+# Size cap of the --block-cache file (least recently used blocks are evicted)
+BLOCK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Code that decides the output - outputs older than these are regenerated
+PIPELINE_SOURCE_FILES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('odt_pipeline.py', 'docx_pipeline.py', 'zip_repack.py', 'paragraph_index.py',
+                 'text_rules.py', 'text_rules.json', 'question_types.py', 'question_types.json')
+]
+# Fingerprint of the pipeline that wrote OUTPUT_DIR's files
+PIPELINE_STAMP_FILE = '.pipeline_fingerprint'
+
+
+def current_fingerprint():
+    """Pipeline code + settings that change the output (question type vendor)"""
+    return pipeline_fingerprint(*PIPELINE_SOURCE_FILES, settings=[QUESTION_TYPE_VENDOR])
+
+
+def read_stamp(output_dir):
+    """Fingerprint stored in output_dir (None if there is none)"""
+    try:
+        with open(os.path.join(output_dir, PIPELINE_STAMP_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_stamp(output_dir, fingerprint):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, PIPELINE_STAMP_FILE), 'w', encoding='utf-8') as f:
+        f.write(fingerprint + '\n')
+
+
+def find_documents(source_dir):
+    """Relative paths of all ODT/DOCX files under source_dir (sorted)"""
+    documents = []
+    for folder, subfolders, filenames in os.walk(source_dir):
+        subfolders.sort()
+        for filename in sorted(filenames):
+            # Skip LibreOffice/Word lock files like ~$exam.docx
+            if filename.startswith(('~$', '.~lock')):
+                continue
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                documents.append(os.path.relpath(os.path.join(folder, filename), source_dir))
+    return documents
+
+
+def is_up_to_date(input_path, output_path, pipeline_mtime):
+    """Output exists and is newer than both the input and the pipeline code"""
+    try:
+        output_mtime = os.path.getmtime(output_path)
+    except OSError:
+        return False
+    return output_mtime >= max(os.path.getmtime(input_path), pipeline_mtime)
+
+
+def process_document(input_path, output_path, shard_processes=1, block_cache_path=None):
+    """
+    Process one file (runs in a worker process)
+    Returns: per-file summary entry (dict)
+    """
+    steps = {}
+    
+    def record_step(update):
+        if update.get('type') == 'status' and update.get('status') == 'completed':
+            steps[update['name']] = float(update['time'].rstrip('s'))
+            # Block cache reuse (--block-cache)
+            if 'blocks' in update:
+                entry['blocks'] = update['blocks']
+                entry['blocks_reused'] = update['blocks_reused']
+    
+    start_time = time.perf_counter()
+    entry = {
+        'input': input_path,
+        'output': output_path,
+        'bytes': os.path.getsize(input_path)
+    }
+    
+    # Write next to the final path first, so an interrupted run never
+    # leaves an "up to date" half-written output
+    temp_output = f"{output_path}.partial"
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    
+    try:
+        if input_path.lower().endswith('.odt'):
+            block_cache = None
+            if block_cache_path:
+                block_cache = BlockCache(block_cache_path, BLOCK_CACHE_MAX_BYTES, current_fingerprint())
+            entry['questions_fixed'] = process_odt_file(input_path, temp_output, record_step,
+                                                        shard_processes=shard_processes,
+                                                        block_cache=block_cache)
+        else:
+            process_docx_file(input_path, temp_output, record_step)
+        os.replace(temp_output, output_path)
+        entry['status'] = 'processed'
+    except Exception as e:
+        if os.path.exists(temp_output):
+            os.unlink(temp_output)
+        entry['status'] = 'failed'
+        entry['error'] = str(e)
+    
+    entry['seconds'] = round(time.perf_counter() - start_time, 3)
+    entry['steps'] = steps
+    return entry
+
+
+def run(source_dir, output_dir, jobs, force=False, shard_processes=1, block_cache_path=None):
+    """
+    Process every document under source_dir
+    Returns: summary dict (per-file entries + totals)
+    """
+    pipeline_mtime = max(os.path.getmtime(path) for path in PIPELINE_SOURCE_FILES)
+    fingerprint = current_fingerprint()
+    # Outputs written by another pipeline (e.g. another vendor) are all stale
+    if read_stamp(output_dir) != fingerprint:
+        force = True
+    entries = []
+    pending = []
+    
+    for relative_path in find_documents(source_dir):
+        input_path = os.path.join(source_dir, relative_path)
+        output_path = os.path.join(output_dir, relative_path)
+        if not force and is_up_to_date(input_path, output_path, pipeline_mtime):
+            entries.append({'input': input_path, 'output': output_path, 'status': 'skipped'})
+        else:
+            pending.append((input_path, output_path))
+    
+    start_time = time.perf_counter()
+    
+    if jobs == 1:
+        for input_path, output_path in pending:
+            entries.append(report(process_document(input_path, output_path, shard_processes, block_cache_path)))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(process_document, *paths, shard_processes, block_cache_path)
+                       for paths in pending]
+            for future in as_completed(futures):
+                entries.append(report(future.result()))
+    
+    wall_time = time.perf_counter() - start_time
+    failed = sum(1 for entry in entries if entry['status'] == 'failed')
+    # Failed files may still have an old output - keep them stale
+    if not failed:
+        write_stamp(output_dir, fingerprint)
+    processed = [entry for entry in entries if entry['status'] == 'processed']
+    processed_bytes = sum(entry['bytes'] for entry in processed)
+    
+    return {
+        'files': entries,
+        'totals': {
+            'processed': len(processed),
+            'failed': failed,
+            'skipped': sum(1 for entry in entries if entry['status'] == 'skipped'),
+            'jobs': jobs,
+            'wall_time': round(wall_time, 3),
+            'documents_per_second': round(len(processed) / wall_time, 2) if wall_time else 0.0,
+            'mb_per_second': round(processed_bytes / (1024 * 1024) / wall_time, 2) if wall_time else 0.0
+        }
+    }
+
+
+def analyze_document(input_path):
+    """
+    Analysis report of one ODT file (runs in a worker process)
+    Returns: per-file summary entry (dict)
+    """
+    entry = {'input': input_path}
+    try:
+        entry['report'] = analyze_odt_file(input_path)
+        entry['status'] = 'analyzed'
+    except Exception as e:
+        entry['status'] = 'failed'
+        entry['error'] = str(e)
+    return entry
+
+
+def analyze(source_dir, jobs):
+    """
+    Analyze every ODT file under source_dir (nothing is written)
+    Returns: summary dict (per-file reports + totals)
+    """
+    pending = [os.path.join(source_dir, relative_path) for relative_path in find_documents(source_dir)
+               if relative_path.lower().endswith('.odt')]
+    entries = []
+    start_time = time.perf_counter()
+    
+    if jobs == 1:
+        for input_path in pending:
+            entries.append(report_analysis(analyze_document(input_path)))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(analyze_document, input_path) for input_path in pending]
+            for future in as_completed(futures):
+                entries.append(report_analysis(future.result()))
+    
+    reports = [entry['report'] for entry in entries if entry['status'] == 'analyzed']
+    return {
+        'files': entries,
+        'totals': {
+            'analyzed': len(reports),
+            'failed': len(entries) - len(reports),
+            'questions': sum(report['questions'] for report in reports),
+            'duplicate_numbers': sum(report['numbering']['duplicate_numbers'] for report in reports),
+            'questions_without_answer': sum(report['questions_without_answer']['count'] for report in reports),
+            'answers_without_explanation': sum(report['answers_without_explanation']['count'] for report in reports),
+            'wall_time': round(time.perf_counter() - start_time, 3)
+        }
+    }
+
+
+def report(entry):
+    """Print one line per finished file"""
+    if entry['status'] == 'processed':
+        print(f"✅ {entry['input']} ({entry['seconds']:.2f}s)")
+    else:
+        print(f"❌ {entry['input']}: {entry['error']}")
+    return entry
+
+
+def report_analysis(entry):
+    """Print one line per analyzed file"""
+    if entry['status'] == 'analyzed':
+        report = entry['report']
+        print(f"📊 {entry['input']}: {report['questions']} questions, "
+              f"{report['numbering']['duplicate_numbers']} duplicate numbers, "
+              f"{report['answers_without_explanation']['count']} answers without explanation")
+    else:
+        print(f"❌ {entry['input']}: {entry['error']}")
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process a directory tree of ODT/DOCX question files")
+    parser.add_argument('source_dir', help="folder with .odt/.docx files (searched recursively)")
+    parser.add_argument('output_dir', nargs='?',
+                        help="processed files are written here (same relative paths)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="processes per large ODT file, sharded mode (default: 1 = off)")
+    parser.add_argument('--block-cache', metavar='FILE',
+                        help="cache of processed ODT question blocks: edited files only reprocess changed blocks")
+    parser.add_argument('--force', action='store_true', help="process files even if their output is up to date")
+    parser.add_argument('--analyze', action='store_true',
+                        help="only report question statistics of the ODT files, write nothing")
+    parser.add_argument('--summary', help="write a JSON summary with per-file, per-step timings to this file")
+    args = parser.parse_args(argv)
+    
+    if args.jobs < 1:
+        parser.error("-j must be at least 1")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if not os.path.isdir(args.source_dir):
+        parser.error(f"{args.source_dir} is not a directory")
+    
+    if args.analyze:
+        summary = analyze(args.source_dir, args.jobs)
+        totals = summary['totals']
+        if args.summary:
+            with open(args.summary, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+        print(f"{totals['analyzed']} analyzed, {totals['failed']} failed in {totals['wall_time']:.2f}s: "
+              f"{totals['questions']} questions, {totals['answers_without_explanation']} answers without explanation")
+        return 1 if totals['failed'] else 0
+    
+    if args.output_dir is None:
+        parser.error("OUTPUT_DIR is required (unless --analyze)")
+    
+    summary = run(args.source_dir, args.output_dir, args.jobs, args.force, args.shards, args.block_cache)
+    totals = summary['totals']
+    
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    
+    print(f"{totals['processed']} processed, {totals['skipped']} up to date, {totals['failed']} failed "
+          f"in {totals['wall_time']:.2f}s ({totals['documents_per_second']} documents/s, "
+          f"{totals['mb_per_second']} MB/s)")
+    
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
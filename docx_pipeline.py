@@ -0,0 +1,806 @@
+"""
+DOCX question processing pipeline.
+
+Yeh steps pehle app-docx.py ke andar the - ab alag module mein hain taake
+app-docx.py aur app.py (batch uploads) dono same pipeline use kar sakein.
+
+Default engine word/document.xml ke lxml tree par seedha kaam karta hai
+(python-docx jaisa hi output); python-docx sirf fallback ke liye hai.
+"""
+import re
+import time
+import zipfile
+from bisect import bisect_right
+from lxml import etree
+from paragraph_index import ParagraphIndex
+from question_types import extract_valid_question_type
+from text_rules import load_text_rules
+from zip_guard import ZIP_LIMITS
+from zip_repack import repack_zip
+
+try:
+    from docx import Document
+    from docx.oxml import OxmlElement
+except ImportError:  # Only needed for the fallback engine
+    Document = OxmlElement = None
+
+# 'lxml' (direct document.xml tree) or 'python-docx'
+DOCX_ENGINE = 'lxml'
+
+# Pre-compile regex patterns for better performance
+QUESTION_PATTERN = re.compile(r"^\s*Question\s*:?\s*\d*\s*$")
+QUESTION_NUMBER_PATTERN = re.compile(r"Question\s*:\s*\d+")
+QUESTION_TYPE_PATTERN = re.compile(r"(Question\s*:\s*\d+)\s+(HOTSPOT|SIMULATION|DRAG DROP)(.*)")
+OPTION_PATTERN = re.compile(r"^\s*([A-J])\s*\.\s*(.+)$")
+MAP_TAG_PATTERN = re.compile(r"<map>.*?</map>", flags=re.DOTALL)
+QUESTION_HEADER_PATTERN = re.compile(r'^Question\s*(No)?:\s*\d+', re.IGNORECASE)
+QUESTION_TYPE_SEARCH_PATTERN = re.compile(r"(Question\s*:?)\s*(\d+)\s+(SIMULATION|DRAG DROP|HOTSPOT)")
+
+# Combined Text Operations rules (text_rules.json)
+DOCX_TEXT_RULES = load_text_rules('docx')
+
+# DOCX processing steps (names are shown in the SSE progress UI)
+DOCX_PROCESSING_STEPS = [
+    'Fix Question Numbers & Remove Brackets',
+    'Ensure Spacing Before Questions',
+    'Combined Text Operations',
+    'Question Types to Next Line',
+    'Normalize Option Spacing',
+    'Add Explanation Tags',
+    'Add Line Spacing'
+]
+
+
+# ==================== DOCX FUNCTIONS ====================
+
+def fix_docx_question_numbers_and_brackets(doc):
+    """
+    DOCX file mein:
+    1. Question numbers ko fix karta hai (ascending order: 1, 2, 3...)
+    2. Bracket text [People], [Process] etc. ko remove karta hai
+    3. Valid question types ko preserve karta hai
+    """
+    question_counter = 1
+    
+    # Pattern for both "Question No:" and "Question:"
+    pattern = re.compile(r'^Question\s*(No)?:\s*\d+', re.IGNORECASE)
+    
+    for para in doc.paragraphs:
+        para_text = para.text.strip()
+        
+        if pattern.match(para_text):
+            # Extract question type agar hai to
+            question_type = extract_valid_question_type(para_text)
+            
+            # Clear paragraph and set new text
+            para.clear()
+            
+            # Set new text with proper numbering (without brackets)
+            if question_type:
+                para.add_run(f"Question: {question_counter} {question_type}")
+            else:
+                para.add_run(f"Question: {question_counter}")
+            
+            question_counter += 1
+    
+    return doc
+
+
+def ensure_spacing_before_question_tags(doc):
+    """
+    Ensures there's proper spacing before QUESTION NO: tags to catch all questions.
+    This prevents questions from being missed when they appear directly after text.
+    """
+    for para in doc.paragraphs:
+        # Check if paragraph contains QUESTION NO: but doesn't start with it
+        if "QUESTION NO:" in para.text and not para.text.strip().startswith("QUESTION NO:"):
+            # Split the text at QUESTION NO:
+            parts = para.text.split("QUESTION NO:")
+            if len(parts) > 1:
+                # Clear the paragraph
+                para.clear()
+                
+                # Add the text before QUESTION NO: (if any)
+                if parts[0].strip():
+                    para.add_run(parts[0].rstrip())
+                    para.add_run().add_break()
+                    para.add_run().add_break()  # Add extra line for spacing
+                
+                # Add QUESTION NO: and the rest
+                para.add_run("QUESTION NO:" + "QUESTION NO:".join(parts[1:]))
+    return doc
+
+
+def combined_text_operations(doc):
+    """
+    Optimized: Combine multiple simple text operations in one pass
+    (rules: text_rules.json 'docx')
+    - Replace QUESTION NO: with Question:
+    - Remove Explanation: tags
+    - Replace References with Reference
+    - Remove <map> tags
+    """
+    for para in doc.paragraphs:
+        text, modified = DOCX_TEXT_RULES.apply(para.text)
+        
+        if modified:
+            para.text = text
+    
+    return doc
+
+
+def shift_question_types_to_next_line(doc):
+    """Move question types (SIMULATION, DRAG DROP, HOTSPOT) to next line"""
+    for para in doc.paragraphs:
+        if any(keyword in para.text for keyword in ["SIMULATION", "DRAG DROP", "HOTSPOT"]):
+            match = re.search(r"(Question\s*:?)\s*(\d+)\s+(SIMULATION|DRAG DROP|HOTSPOT)", para.text)
+            if match:
+                question_part = f"{match.group(1).strip()} {match.group(2).strip()}"
+                para.clear()
+                para.alignment = None
+                para.paragraph_format.left_indent = None
+                para.paragraph_format.right_indent = None
+                para.paragraph_format.first_line_indent = None
+                run1 = para.add_run(question_part)
+                para.add_run().add_break()
+                run2 = para.add_run(match.group(3))
+                run1.font.size = None
+                run2.font.size = None
+    return doc
+
+
+def normalize_option_spacing(doc):
+    """Ensure option lines like "A.     text" become "A. text" with one space"""
+    for para in doc.paragraphs:
+        txt = para.text
+        if not txt:
+            continue
+        # Replace non-breaking spaces and tabs with regular spaces
+        cleaned = txt.replace('\u00A0', ' ').replace('\t', ' ')
+        match = OPTION_PATTERN.match(cleaned)
+        if match:
+            letter = match.group(1)
+            value = match.group(2).strip()
+            para.text = f"{letter}. {value}"
+    return doc
+
+
+def add_explanation_tags_if_text_present(doc):
+    """
+    Optimized: Add Explanation: tags where needed after Answer: tags.
+    Single pass with better logic and reduced DOM manipulations.
+    """
+    paragraphs = list(doc.paragraphs)  # Convert to list once for better indexing
+    i = 0
+    
+    while i < len(paragraphs):
+        para = paragraphs[i]
+        text = para.text.strip()
+        
+        if text.startswith("Answer:"):
+            explanation_lines = []
+            j = i + 1
+            
+            # Collect explanation lines
+            while j < len(paragraphs):
+                next_text = paragraphs[j].text.strip()
+                
+                # Stop conditions - check if we've reached next section
+                if (next_text.startswith("Reference:") or 
+                    next_text.startswith("Question:") or 
+                    next_text.startswith("Topic") or
+                    QUESTION_PATTERN.match(next_text)):
+                    break
+                
+                # Clean text and collect if non-empty
+                cleaned_text = MAP_TAG_PATTERN.sub("", next_text).strip()
+                if cleaned_text:
+                    explanation_lines.append(cleaned_text)
+                
+                j += 1
+            
+            # Only process if we found explanation text
+            if explanation_lines:
+                # Clear paragraphs between Answer and next section
+                for k in range(i + 1, j):
+                    paragraphs[k].clear()
+                
+                # Add "Explanation:" label
+                if i + 1 < len(paragraphs):
+                    paragraphs[i + 1].text = "Explanation:"
+                
+                # Add explanation content
+                for idx, line in enumerate(explanation_lines):
+                    target_idx = i + 2 + idx
+                    if target_idx < len(paragraphs):
+                        paragraphs[target_idx].text = line
+                    else:
+                        # Only create new paragraphs if absolutely needed
+                        p = paragraphs[-1]._element
+                        new_para = OxmlElement("w:p")
+                        run = OxmlElement("w:r")
+                        text_elem = OxmlElement("w:t")
+                        text_elem.text = line
+                        run.append(text_elem)
+                        new_para.append(run)
+                        p.addnext(new_para)
+                        # Refresh paragraph list
+                        paragraphs = list(doc.paragraphs)
+                
+                i = j
+            else:
+                i += 1
+        else:
+            i += 1
+    
+    return doc
+
+
+def add_line_spacing_after_question_answer(doc):
+    """
+    Optimized: Add line spacing after Question: and Answer: tags.
+    Process insertions in reverse to maintain indices.
+    """
+    paragraphs = list(doc.paragraphs)
+    insertions = []  # Track where to insert empty paragraphs: (index, type, match_data)
+    
+    # First pass: identify where insertions are needed
+    for i, para in enumerate(paragraphs):
+        para_text = para.text.strip()
+        
+        # Check for Answer: tags
+        if para_text.startswith("Answer:"):
+            insertions.append((i, 'answer', None))
+        
+        # Check for Question: X pattern
+        elif QUESTION_NUMBER_PATTERN.match(para_text):
+            match = QUESTION_TYPE_PATTERN.search(para_text)
+            if match:
+                insertions.append((i, 'question_with_type', match))
+            else:
+                insertions.append((i, 'question', None))
+    
+    # Second pass: process insertions in reverse order to maintain correct indices
+    for i, insert_type, match in reversed(insertions):
+        para = paragraphs[i]
+        p = para._element
+        
+        if insert_type == 'answer' or insert_type == 'question':
+            # Simple case: just add empty paragraph after
+            empty_para = OxmlElement("w:p")
+            p.addnext(empty_para)
+        
+        elif insert_type == 'question_with_type':
+            # Complex case: split question and type
+            question_part = match.group(1)
+            question_type = match.group(2)
+            remaining_text = match.group(3).strip()
+            
+            # Clear and rebuild the paragraph
+            para.clear()
+            para.add_run(question_part)
+            
+            # Add empty paragraph
+            empty_para = OxmlElement("w:p")
+            p.addnext(empty_para)
+            
+            # Add question type paragraph
+            type_para = OxmlElement("w:p")
+            run = OxmlElement("w:r")
+            text = OxmlElement("w:t")
+            text.text = question_type + (" " + remaining_text if remaining_text else "")
+            run.append(text)
+            type_para.append(run)
+            empty_para.addnext(type_para)
+    
+    return doc
+
+
+# ==================== LXML DOCX ENGINE ====================
+# word/document.xml par seedha kaam - python-docx ke Paragraph/Run proxy
+# objects nahi banate aur paragraph text cache rehta hai. Har helper
+# python-docx ke usi operation jaisa XML banata hai (clear(), add_run(),
+# text setter, font.size = None ...) taake output same rahe.
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_NSMAP = {'w': W_NS}
+W_P = f"{{{W_NS}}}p"
+W_R = f"{{{W_NS}}}r"
+W_T = f"{{{W_NS}}}t"
+W_BR = f"{{{W_NS}}}br"
+W_TAB = f"{{{W_NS}}}tab"
+W_PPR = f"{{{W_NS}}}pPr"
+W_RPR = f"{{{W_NS}}}rPr"
+W_HYPERLINK = f"{{{W_NS}}}hyperlink"
+W_BR_TYPE = f"{{{W_NS}}}type"
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+# Tabs and line breaks become their own run children
+RUN_TEXT_SPLIT_PATTERN = re.compile(r"([\t\r\n])")
+
+# Run children and their text (w:br depends on its type, see run_text)
+RUN_TEXT_ELEMENTS = {
+    f"{{{W_NS}}}tab": "\t",
+    f"{{{W_NS}}}ptab": "\t",
+    f"{{{W_NS}}}cr": "\n",
+    f"{{{W_NS}}}noBreakHyphen": "-"
+}
+
+OFFICE_DOCUMENT_RELATIONSHIP = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+PACKAGE_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+DOCUMENT_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml'
+
+# Same settings as python-docx's parser (drops whitespace-only text between elements)
+DOCX_XML_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+
+
+class DocxPackageError(Exception):
+    """The lxml engine can't handle this file (python-docx fallback is used)"""
+
+
+def w_element(tag):
+    """New w: element, created the way python-docx's OxmlElement does"""
+    return etree.Element(tag, nsmap=W_NSMAP)
+
+
+def run_text(run):
+    """Text of a w:r (python-docx Run.text)"""
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag == W_BR:
+            # Page/column breaks have no text
+            if child.get(W_BR_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append("\n")
+        elif tag in RUN_TEXT_ELEMENTS:
+            parts.append(RUN_TEXT_ELEMENTS[tag])
+    return "".join(parts)
+
+
+def paragraph_text(para):
+    """Text of a w:p: direct runs and hyperlink runs (python-docx Paragraph.text)"""
+    parts = []
+    for child in para:
+        if child.tag == W_R:
+            parts.append(run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(run_text(run) for run in child if run.tag == W_R)
+    return "".join(parts)
+
+
+def set_run_text(run, text):
+    """Append w:t/w:tab/w:br children for text (python-docx Run.text setter)"""
+    for piece in RUN_TEXT_SPLIT_PATTERN.split(text):
+        if piece == "\t":
+            run.append(w_element(W_TAB))
+        elif piece in ("\r", "\n"):
+            run.append(w_element(W_BR))
+        elif piece:
+            t = w_element(W_T)
+            t.text = piece
+            if len(piece.strip()) < len(piece):
+                t.set(XML_SPACE, 'preserve')
+            run.append(t)
+
+
+def get_or_add_child(element, tag):
+    """First child with tag, inserted as the first child if missing (pPr/rPr)"""
+    child = element.find(tag)
+    if child is None:
+        child = w_element(tag)
+        element.insert(0, child)
+    return child
+
+
+def new_text_paragraph(text=None):
+    """Loose w:p with one run holding text (w:p only if text is None)"""
+    para = w_element(W_P)
+    if text is not None:
+        run = w_element(W_R)
+        t = w_element(W_T)
+        t.text = text
+        run.append(t)
+        para.append(run)
+    return para
+
+
+# Paragraph kind flags (ParagraphIndex column) - one per step trigger
+KIND_QUESTION_HEADER = 0x01     # Question: 5 / Question No: 5 (step 1)
+KIND_INLINE_QUESTION_TAG = 0x02  # text ... QUESTION NO: (step 2)
+KIND_TEXT_OPERATION = 0x04      # a text_rules.json rule applies (step 3)
+KIND_QUESTION_TYPE = 0x08       # SIMULATION / DRAG DROP / HOTSPOT (step 4)
+KIND_OPTION = 0x10              # A. text (step 5)
+KIND_ANSWER = 0x20              # Answer: (steps 6, 7)
+KIND_SECTION_END = 0x40         # Reference: / Question: / Topic / bare Question (step 6)
+KIND_QUESTION_NUMBER = 0x80     # Question: 5 (step 7)
+
+
+def classify_docx_text(text):
+    """Kind flags of a paragraph - the same tests the steps run, done once"""
+    kind = 0
+    if not text:
+        return kind
+    stripped = text.strip()
+    
+    if QUESTION_HEADER_PATTERN.match(stripped):
+        kind |= KIND_QUESTION_HEADER
+    if "QUESTION NO:" in text and not stripped.startswith("QUESTION NO:"):
+        kind |= KIND_INLINE_QUESTION_TAG
+    if DOCX_TEXT_RULES.matches(text):
+        kind |= KIND_TEXT_OPERATION
+    if "SIMULATION" in text or "DRAG DROP" in text or "HOTSPOT" in text:
+        kind |= KIND_QUESTION_TYPE
+    if OPTION_PATTERN.match(text.replace('\u00A0', ' ').replace('\t', ' ')):
+        kind |= KIND_OPTION
+    if stripped.startswith("Answer:"):
+        kind |= KIND_ANSWER
+    if (stripped.startswith("Reference:") or
+        stripped.startswith("Question:") or
+        stripped.startswith("Topic") or
+        QUESTION_PATTERN.match(stripped)):
+        kind |= KIND_SECTION_END
+    if QUESTION_NUMBER_PATTERN.match(stripped):
+        kind |= KIND_QUESTION_NUMBER
+    return kind
+
+
+class DocxXmlDocument:
+    """
+    Open DOCX package with its parsed main document part. Body paragraphs
+    ek ParagraphIndex mein hain (text + kind flags); har step sirf apne
+    targets par jata hai aur jo paragraph badalta hai sirf usi ka index
+    entry invalidate hota hai.
+    Package pehle zip_limits par check hota hai (ZipLimitError fallback
+    nahi - python-docx to saare parts memory mein load karta hai).
+    """
+    
+    def __init__(self, file_path, zip_limits=ZIP_LIMITS):
+        try:
+            self.zip_file = zip_limits.open(file_path)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise DocxPackageError(str(e))
+        
+        try:
+            self.part_name = self.find_document_part()
+            with self.zip_file.open(self.part_name) as source:
+                self.root = etree.parse(source, DOCX_XML_PARSER).getroot()
+        except DocxPackageError:
+            self.close()
+            raise
+        except (KeyError, OSError, zipfile.BadZipFile, etree.XMLSyntaxError) as e:
+            self.close()
+            raise DocxPackageError(str(e))
+        
+        self.body = self.root.find(f"{{{W_NS}}}body")
+        if self.body is None:
+            self.close()
+            raise DocxPackageError("document has no w:body")
+        self.refresh()
+    
+    def find_document_part(self):
+        """Main document part name from _rels/.rels, checked against [Content_Types].xml"""
+        rels = etree.fromstring(self.zip_file.read('_rels/.rels'))
+        for rel in rels.iter(f"{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship"):
+            if rel.get('Type') == OFFICE_DOCUMENT_RELATIONSHIP and rel.get('TargetMode') != 'External':
+                part_name = rel.get('Target', '').lstrip('/')
+                break
+        else:
+            raise DocxPackageError("no officeDocument relationship")
+        
+        # .docm/.dotx etc. - python-docx reports those itself
+        content_types = etree.fromstring(self.zip_file.read('[Content_Types].xml'))
+        for override in content_types.iter(f"{{{CONTENT_TYPES_NS}}}Override"):
+            if override.get('PartName', '').lstrip('/') == part_name:
+                if override.get('ContentType') != DOCUMENT_CONTENT_TYPE:
+                    raise DocxPackageError(f"unexpected content type {override.get('ContentType')}")
+                return part_name
+        raise DocxPackageError(f"no content type for {part_name}")
+    
+    def refresh(self):
+        """Re-index the body paragraphs (after structural changes)"""
+        self.index = ParagraphIndex(
+            (child for child in self.body if child.tag == W_P),
+            paragraph_text,
+            classify_docx_text
+        )
+    
+    def text(self, position):
+        return self.index.text(position)
+    
+    def clear(self, position):
+        """Remove all content except w:pPr (python-docx Paragraph.clear)"""
+        para = self.index.items[position]
+        for child in list(para):
+            if isinstance(child.tag, str) and child.tag != W_PPR:
+                para.remove(child)
+        self.index.invalidate(position)
+    
+    def add_run(self, position, text=None):
+        """Append a w:r (python-docx Paragraph.add_run)"""
+        run = w_element(W_R)
+        self.index.items[position].append(run)
+        if text:
+            set_run_text(run, text)
+        self.index.invalidate(position)
+        return run
+    
+    def set_text(self, position, text):
+        """Replace content with one run (python-docx Paragraph.text setter)"""
+        self.clear(position)
+        self.add_run(position, text)
+    
+    def save(self, output_file):
+        """Write the package with the new main document part; other members are copied raw"""
+        def write_document(dest):
+            dest.write(etree.tostring(self.root, encoding='UTF-8', standalone=True))
+        
+        repack_zip(self.zip_file, output_file, {self.part_name: write_document})
+    
+    def close(self):
+        self.zip_file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fix_docx_question_numbers_and_brackets_xml(document):
+    """lxml version of fix_docx_question_numbers_and_brackets"""
+    question_counter = 1
+    
+    for position in document.index.positions(KIND_QUESTION_HEADER):
+        question_type = extract_valid_question_type(document.text(position).strip())
+        
+        document.clear(position)
+        
+        if question_type:
+            document.add_run(position, f"Question: {question_counter} {question_type}")
+        else:
+            document.add_run(position, f"Question: {question_counter}")
+        
+        question_counter += 1
+    
+    return document
+
+
+def ensure_spacing_before_question_tags_xml(document):
+    """lxml version of ensure_spacing_before_question_tags"""
+    for position in document.index.positions(KIND_INLINE_QUESTION_TAG):
+        parts = document.text(position).split("QUESTION NO:")
+        document.clear(position)
+        
+        if parts[0].strip():
+            document.add_run(position, parts[0].rstrip())
+            document.add_run(position).append(w_element(W_BR))
+            document.add_run(position).append(w_element(W_BR))  # Add extra line for spacing
+        
+        document.add_run(position, "QUESTION NO:" + "QUESTION NO:".join(parts[1:]))
+    return document
+
+
+def combined_text_operations_xml(document):
+    """lxml version of combined_text_operations"""
+    for position in document.index.positions(KIND_TEXT_OPERATION):
+        text, _ = DOCX_TEXT_RULES.apply(document.text(position))
+        document.set_text(position, text)
+    
+    return document
+
+
+def shift_question_types_to_next_line_xml(document):
+    """lxml version of shift_question_types_to_next_line"""
+    for position in document.index.positions(KIND_QUESTION_TYPE):
+        match = QUESTION_TYPE_SEARCH_PATTERN.search(document.text(position))
+        if match:
+            question_part = f"{match.group(1).strip()} {match.group(2).strip()}"
+            document.clear(position)
+            para = document.index.items[position]
+            
+            # alignment / left, right and first-line indent = None
+            pPr = get_or_add_child(para, W_PPR)
+            for jc in pPr.findall(f"{{{W_NS}}}jc"):
+                pPr.remove(jc)
+            ind = pPr.find(f"{{{W_NS}}}ind")
+            if ind is not None:
+                for name in ('left', 'right', 'firstLine', 'hanging'):
+                    ind.attrib.pop(f"{{{W_NS}}}{name}", None)
+            
+            run1 = document.add_run(position, question_part)
+            document.add_run(position).append(w_element(W_BR))
+            run2 = document.add_run(position, match.group(3))
+            
+            # font.size = None
+            for run in (run1, run2):
+                rPr = get_or_add_child(run, W_RPR)
+                for sz in rPr.findall(f"{{{W_NS}}}sz"):
+                    rPr.remove(sz)
+    return document
+
+
+def normalize_option_spacing_xml(document):
+    """lxml version of normalize_option_spacing"""
+    for position in document.index.positions(KIND_OPTION):
+        cleaned = document.text(position).replace('\u00A0', ' ').replace('\t', ' ')
+        match = OPTION_PATTERN.match(cleaned)
+        document.set_text(position, f"{match.group(1)}. {match.group(2).strip()}")
+    return document
+
+
+def add_explanation_tags_if_text_present_xml(document):
+    """
+    lxml version of add_explanation_tags_if_text_present
+    Answer: aur section-end paragraphs index se milte hain; beech ke
+    paragraphs ka text sirf Answer blocks ke andar parha jata hai.
+    """
+    index = document.index
+    answers = index.positions(KIND_ANSWER)
+    section_ends = index.positions(KIND_SECTION_END)
+    i = 0
+    
+    while i < len(index):
+        # Paragraph i may have been rewritten by the previous block, so it is
+        # checked directly; everything after it is still as indexed
+        if not index.kind(i) & KIND_ANSWER:
+            next_answer = bisect_right(answers, i)
+            if next_answer == len(answers):
+                break
+            i = answers[next_answer]
+            continue
+        
+        next_end = bisect_right(section_ends, i)
+        j = section_ends[next_end] if next_end < len(section_ends) else len(index)
+        
+        explanation_lines = []
+        for k in range(i + 1, j):
+            cleaned_text = MAP_TAG_PATTERN.sub("", document.text(k).strip()).strip()
+            if cleaned_text:
+                explanation_lines.append(cleaned_text)
+        
+        if not explanation_lines:
+            i += 1
+            continue
+        
+        for k in range(i + 1, j):
+            document.clear(k)
+        
+        document.set_text(i + 1, "Explanation:")
+        
+        appended = False
+        for idx, line in enumerate(explanation_lines):
+            target_idx = i + 2 + idx
+            if target_idx < len(index):
+                document.set_text(target_idx, line)
+            else:
+                # New paragraph after the last one is the new last body paragraph
+                new_para = new_text_paragraph(line)
+                index.items[-1].addnext(new_para)
+                index.append(new_para)
+                appended = True
+        
+        if appended:
+            # Scanning continues into the appended paragraphs
+            answers = index.positions(KIND_ANSWER)
+            section_ends = index.positions(KIND_SECTION_END)
+        
+        i = j
+    
+    return document
+
+
+def add_line_spacing_after_question_answer_xml(document):
+    """lxml version of add_line_spacing_after_question_answer"""
+    positions = document.index.positions(KIND_ANSWER | KIND_QUESTION_NUMBER)
+    
+    # Inserts are relative to the paragraph element, so order doesn't matter
+    for position in positions:
+        para = document.index.items[position]
+        
+        if document.index.kind(position) & KIND_ANSWER:
+            para.addnext(new_text_paragraph())
+            continue
+        
+        match = QUESTION_TYPE_PATTERN.search(document.text(position).strip())
+        if not match:
+            para.addnext(new_text_paragraph())
+            continue
+        
+        question_part = match.group(1)
+        question_type = match.group(2)
+        remaining_text = match.group(3).strip()
+        
+        document.set_text(position, question_part)
+        
+        empty_para = new_text_paragraph()
+        para.addnext(empty_para)
+        empty_para.addnext(new_text_paragraph(question_type + (" " + remaining_text if remaining_text else "")))
+    
+    if positions:
+        document.refresh()
+    return document
+
+
+PYTHON_DOCX_STEPS = [
+    fix_docx_question_numbers_and_brackets,
+    ensure_spacing_before_question_tags,
+    combined_text_operations,
+    shift_question_types_to_next_line,
+    normalize_option_spacing,
+    add_explanation_tags_if_text_present,
+    add_line_spacing_after_question_answer
+]
+
+XML_DOCX_STEPS = [
+    fix_docx_question_numbers_and_brackets_xml,
+    ensure_spacing_before_question_tags_xml,
+    combined_text_operations_xml,
+    shift_question_types_to_next_line_xml,
+    normalize_option_spacing_xml,
+    add_explanation_tags_if_text_present_xml,
+    add_line_spacing_after_question_answer_xml
+]
+
+
+# ==================== MAIN DOCX PROCESSING ====================
+
+def run_docx_steps(doc, steps, send_status_update):
+    """Run the processing steps in order with per-step status updates"""
+    for step_name, step in zip(DOCX_PROCESSING_STEPS, steps):
+        send_status_update({
+            'type': 'status',
+            'name': step_name,
+            'status': 'in_progress',
+            'time': '0.00s'
+        })
+        start_time = time.time()
+        doc = step(doc)
+        send_status_update({
+            'type': 'status',
+            'name': step_name,
+            'status': 'completed',
+            'time': f"{(time.time() - start_time):.2f}s"
+        })
+    return doc
+
+
+def process_docx_file(input_file, output_file, send_status_update, engine=None, zip_limits=ZIP_LIMITS):
+    """
+    Main function to process DOCX file with all operations
+    engine: 'lxml' / 'python-docx' (default DOCX_ENGINE). Jo file lxml engine
+    na khol sake (corrupt, .docm, ...) woh python-docx ko di jati hai, taake
+    errors bhi pehle jaise hi rahein.
+    zip_limits (ZipLimits): dono engines se pehle central directory ke
+    sizes/ratio check hote hain (ZipLimitError)
+    """
+    engine = engine or DOCX_ENGINE
+    
+    if engine == 'lxml':
+        try:
+            document = DocxXmlDocument(input_file, zip_limits)
+        except DocxPackageError as e:
+            if Document is None:
+                raise Exception(f"Cannot open DOCX file: {str(e)}")
+            document = None
+        
+        if document is not None:
+            with document:
+                run_docx_steps(document, XML_DOCX_STEPS, send_status_update)
+                document.save(output_file)
+            return
+    
+    if Document is None:
+        raise Exception("python-docx is not installed")
+    
+    # python-docx loads every part into memory: limits first (a missing or
+    # non-zip file gets python-docx's own error, as before)
+    try:
+        zip_limits.check_file(input_file)
+    except (OSError, zipfile.BadZipFile):
+        pass
+    
+    doc = Document(input_file)
+    doc = run_docx_steps(doc, PYTHON_DOCX_STEPS, send_status_update)
+    doc.save(output_file)
@@ -0,0 +1,85 @@
+"""
+Download responses for processed files.
+
+Har processed file ka strong ETag us ke content (sha256) se banta hai aur
+file ke saath ek chhoti sidecar (.<name>.etag) mein rakha jata hai - size
+ya mtime badle to dobara hash hota hai, warna har download par poori file
+hash nahi hoti. Browser ke If-None-Match par 304 milta hai aur Range
+requests (206) se adhoori download wahin se resume hoti hai.
+
+File body Python se copy nahi hoti:
+    - default: send_file (WSGI file_wrapper -> server ka sendfile)
+    - USE_X_SENDFILE = True: Apache/lighttpd X-Sendfile header (Flask)
+    - DOWNLOAD_ACCEL_REDIRECT = '/protected/': nginx X-Accel-Redirect to
+      that internal location, which must map to the uploads folder
+"""
+import json
+import mimetypes
+import os
+import uuid
+from urllib.parse import quote
+from flask import Response, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from result_cache import file_sha256
+
+
+def etag_sidecar_path(file_path):
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.etag")
+
+
+def content_etag(file_path):
+    """sha256 of a file, cached in its sidecar while size/mtime match"""
+    stat = os.stat(file_path)
+    sidecar_path = etag_sidecar_path(file_path)
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        if sidecar['size'] == stat.st_size and sidecar['mtime_ns'] == stat.st_mtime_ns:
+            return sidecar['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    digest = file_sha256(file_path)
+    temp_path = f"{sidecar_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}, f)
+    os.replace(temp_path, sidecar_path)
+    return digest
+
+
+def accel_redirect_response(prefix, filename, etag):
+    """Empty response telling nginx to serve the file itself"""
+    response = Response(status=200)
+    response.set_etag(etag)
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+    
+    download_name = os.path.basename(filename)
+    response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(filename)
+    response.headers['Content-Type'] = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def send_download(directory, filename):
+    """
+    Attachment response for directory/filename (filename may contain
+    subfolders) with a content ETag, 304 on If-None-Match and 206 on Range
+    Raises: NotFound (werkzeug) if the file doesn't exist
+    """
+    # Relative to the working directory like the rest of the app (Flask
+    # would resolve it against the app's root path)
+    directory = os.path.abspath(directory)
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        # send_from_directory raises the proper 404
+        return send_from_directory(directory, filename)
+    
+    etag = content_etag(file_path)
+    prefix = current_app.config.get('DOWNLOAD_ACCEL_REDIRECT')
+    if prefix:
+        return accel_redirect_response(prefix, filename, etag)
+    return send_from_directory(directory, filename, as_attachment=True, etag=etag, conditional=True)
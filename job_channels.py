@@ -0,0 +1,142 @@
+"""
+Per-job status channels for SSE.
+
+Har upload ko apna job ID aur apna bounded event channel milta hai, is liye
+concurrent jobs ek doosre ke events nahi churate. Finished channels thori
+der (late subscribers ke liye) rakh kar registry se hata diye jate hain.
+"""
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+
+# Events that end a job's stream
+TERMINAL_EVENT_TYPES = ('complete', 'error')
+
+
+class JobChannel:
+    """
+    Bounded event buffer for one job. Publishing never blocks; when the
+    buffer is full the oldest events are dropped (the terminal event is
+    always the newest, so it's never lost). Every subscriber replays the
+    buffer from the start, so connecting late misses nothing that's kept.
+    """
+    
+    def __init__(self, job_id, max_events):
+        self.job_id = job_id
+        # (sequence number, event) pairs
+        self.events = deque(maxlen=max_events)
+        self.condition = threading.Condition()
+        self.next_sequence = 0
+        self.finished_at = None
+        # Called (without arguments) after every publish, e.g. to wake an event loop
+        self.listeners = []
+    
+    @property
+    def finished(self):
+        return self.finished_at is not None
+    
+    def publish(self, event):
+        """Add an event (dict) and wake up subscribers"""
+        with self.condition:
+            self.events.append((self.next_sequence, event))
+            self.next_sequence += 1
+            if event.get('type') in TERMINAL_EVENT_TYPES:
+                self.finished_at = time.monotonic()
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        
+        for listener in listeners:
+            listener()
+    
+    def add_listener(self, listener):
+        with self.condition:
+            self.listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        with self.condition:
+            self.listeners.remove(listener)
+    
+    def events_since(self, sequence):
+        """
+        Buffered events from sequence on, without waiting (anything already
+        dropped from the buffer is skipped)
+        Returns: (events, sequence to continue from)
+        """
+        with self.condition:
+            if self.events and self.events[0][0] > sequence:
+                sequence = self.events[0][0]
+            start = len(self.events) - (self.next_sequence - sequence)
+            return [event for _, event in itertools.islice(self.events, start, None)], self.next_sequence
+    
+    def subscribe(self, timeout=30):
+        """
+        Generator of events from the first buffered one until the terminal
+        event. Yields None when nothing arrived for timeout seconds
+        (caller sends a keepalive).
+        """
+        sequence = 0
+        while True:
+            with self.condition:
+                if sequence >= self.next_sequence and not self.finished:
+                    self.condition.wait(timeout)
+                pending, sequence = self.events_since(sequence)
+            
+            if not pending:
+                yield None
+                continue
+            
+            for event in pending:
+                yield event
+                if event.get('type') in TERMINAL_EVENT_TYPES:
+                    return
+
+
+class JobChannelRegistry:
+    """
+    Job ID -> JobChannel. Finished channels are removed retention seconds
+    after their terminal event; channels that never finish are removed
+    after max_age seconds, so abandoned jobs can't leak memory.
+    """
+    
+    def __init__(self, max_events=256, retention=120, max_age=6 * 60 * 60):
+        self.max_events = max_events
+        self.retention = retention
+        self.max_age = max_age
+        self.channels = {}
+        self.created_at = {}
+        self.lock = threading.Lock()
+    
+    def create(self):
+        """New channel with a fresh job ID"""
+        self.collect()
+        job_id = uuid.uuid4().hex
+        channel = JobChannel(job_id, self.max_events)
+        with self.lock:
+            self.channels[job_id] = channel
+            self.created_at[job_id] = time.monotonic()
+        return channel
+    
+    def get(self, job_id):
+        """Channel for job_id, or None if unknown/expired"""
+        with self.lock:
+            return self.channels.get(job_id)
+    
+    def collect(self):
+        """Remove expired channels"""
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                job_id for job_id, channel in self.channels.items()
+                if (channel.finished and now - channel.finished_at > self.retention)
+                or now - self.created_at[job_id] > self.max_age
+            ]
+            for job_id in expired:
+                del self.channels[job_id]
+                del self.created_at[job_id]
+        return len(expired)
+    
+    def __len__(self):
+        with self.lock:
+            return len(self.channels)
@@ -0,0 +1,1690 @@
+"""
+ODT question processing pipeline.
+
+Validation, the fused/streaming step pipeline and repackaging - web app
+(app.py) aur command line (cli.py) dono isi ko use karte hain.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from io import BufferedWriter
+import multiprocessing
+import re
+import time
+import uuid
+import zipfile
+from lxml import etree
+import os
+from question_types import extract_valid_question_type
+from text_rules import load_text_rules
+from zip_guard import ZIP_LIMITS, ZipLimitError
+from zip_repack import repack_zip
+
+# content.xml (uncompressed) size above which streaming mode is used
+ODT_STREAMING_THRESHOLD = 64 * 1024 * 1024
+# content.xml size above which sharded mode is used (when shard processes > 1)
+ODT_SHARD_THRESHOLD = 16 * 1024 * 1024
+# Work units per process - smaller last units keep every core busy till the end
+SHARDS_PER_PROCESS = 4
+# Deflate level of the rewritten content.xml (1 = fastest ... 9 = smallest)
+ODT_COMPRESS_LEVEL = 6
+# Writes are collected into blocks this big before they reach the compressor
+SERIALIZE_BUFFER_SIZE = 1024 * 1024
+# Longest question lists in an analysis report (counts are always complete)
+ODT_ANALYSIS_LIST_LIMIT = 100
+# Biggest 'mimetype' member that is read (the real one is 39 bytes)
+ODT_MIMETYPE_MAX_SIZE = 256
+
+# Pre-compile regex patterns for better performance
+QUESTION_PATTERN = re.compile(r"^\s*Question\s*:?\s*\d*\s*$")
+QUESTION_NUMBER_PATTERN = re.compile(r"Question\s*:\s*\d+")
+QUESTION_TYPE_PATTERN = re.compile(r"(Question\s*:\s*\d+)\s+(HOTSPOT|SIMULATION|DRAG DROP)(.*)")
+OPTION_PATTERN = re.compile(r"^\s*([A-J])\s*\.\s*(.+)$")
+MAP_TAG_PATTERN = re.compile(r"<map>.*?</map>", flags=re.DOTALL)
+QUESTION_HEADER_PATTERN = re.compile(r'^Question\s*(No)?:\s*\d+', re.IGNORECASE)
+
+# Combined Text Operations rules (text_rules.json)
+ODT_TEXT_RULES = load_text_rules('odt')
+
+# ODT Namespaces
+ODT_NAMESPACES = {
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+}
+
+# ODT processing steps (names are shown in the SSE progress UI)
+ODT_PROCESSING_STEPS = [
+    'Fix Question Numbers & Remove Brackets',
+    'Ensure Spacing Before Questions',
+    'Combined Text Operations',
+    'Question Types to Next Line',
+    'Normalize Option Spacing',
+    'Add Explanation Tags',
+    'Add Line Spacing'
+]
+# Writing content.xml into the output zip (reported with its byte counts)
+ODT_SERIALIZE_STEP = 'Serialize Output'
+
+
+# ==================== ODT VALIDATION ====================
+
+class OdtDocument:
+    """
+    Validated ODT file handle: open zip, member index and (after parse())
+    the parsed content.xml tree. Validation aur processing dono isi ko use
+    karte hain, is liye content.xml sirf ek dafa decompress/parse hota hai.
+    """
+    
+    def __init__(self, file_path, zip_file):
+        self.file_path = file_path
+        self.zip_file = zip_file
+        self.members = {info.filename: info for info in zip_file.infolist()}
+        self.tree = None
+    
+    @property
+    def content_size(self):
+        """Uncompressed size of content.xml from the central directory"""
+        return self.members['content.xml'].file_size
+    
+    def open_content(self):
+        """
+        Decompressing file object for content.xml - streams, and stops at
+        the central directory size that passed the zip limits
+        """
+        return self.zip_file.open(self.members['content.xml'])
+    
+    def parse(self):
+        """
+        Parse content.xml into self.tree (once)
+        Returns: issues_list (empty if parsed)
+        """
+        if self.tree is None:
+            try:
+                with self.open_content() as source:
+                    self.tree = etree.parse(source)
+            except Exception as e:
+                return [f"Cannot parse content.xml: {str(e)}"]
+        return []
+    
+    def close(self):
+        self.zip_file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_odt_document(file_path, parse_content=True, zip_limits=ZIP_LIMITS):
+    """
+    Validates if file is a proper ODT file and keeps it open for processing
+    Checks 1-7 sirf central directory aur mimetype ke bytes parhte hain
+    (zip_limits: zip bomb sizes/ratio); parse_content=False skips the
+    content.xml parse (call document.parse() later, while processing)
+    Returns: (document or None, issues_list)
+    """
+    issues = []
+    
+    # Check 1: File exists
+    if not os.path.exists(file_path):
+        issues.append("File does not exist")
+        return None, issues
+    
+    # Check 2: File size > 0
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        issues.append("File is empty (0 bytes)")
+        return None, issues
+    
+    # Check 3: Is it a valid ZIP file, within the size/ratio limits?
+    try:
+        zip_file = zip_limits.open(file_path)
+    except zipfile.BadZipFile:
+        issues.append("File is not a valid ZIP archive (ODT files must be ZIP format)")
+        return None, issues
+    except ZipLimitError as e:
+        issues.append(str(e))
+        return None, issues
+    except Exception as e:
+        issues.append(f"Error during validation: {str(e)}")
+        return None, issues
+    
+    document = OdtDocument(file_path, zip_file)
+    
+    try:
+        # Check 4: Read magic bytes
+        zip_file.fp.seek(0)
+        magic = zip_file.fp.read(4)
+        # ZIP files start with PK (0x504B)
+        if magic[:2] != b'PK':
+            issues.append(f"Invalid file signature: {magic.hex()} (expected: 504B for ZIP)")
+        
+        # Check 5: Has mimetype file?
+        if 'mimetype' not in document.members:
+            issues.append("Missing 'mimetype' file in ODT structure")
+            document.close()
+            return None, issues
+        
+        # Check 6: Correct mimetype content
+        expected_mimetype = 'application/vnd.oasis.opendocument.text'
+        if document.members['mimetype'].file_size > ODT_MIMETYPE_MAX_SIZE:
+            issues.append(f"Invalid mimetype: {document.members['mimetype'].file_size} bytes "
+                          f"(expected: '{expected_mimetype}')")
+            document.close()
+            return None, issues
+        
+        mimetype = zip_file.read('mimetype').decode('utf-8', 'ignore').strip()
+        if mimetype != expected_mimetype:
+            issues.append(f"Invalid mimetype: '{mimetype}' (expected: '{expected_mimetype}')")
+            document.close()
+            return None, issues
+        
+        # Check 7: Has content.xml?
+        if 'content.xml' not in document.members:
+            issues.append("Missing 'content.xml' file in ODT structure")
+            document.close()
+            return None, issues
+        
+        # Check 8: Can parse content.xml?
+        if parse_content:
+            issues.extend(document.parse())
+            if issues:
+                document.close()
+                return None, issues
+    
+    except zipfile.BadZipFile:
+        document.close()
+        issues.append("Corrupted ZIP structure")
+        return None, issues
+    except Exception as e:
+        document.close()
+        issues.append(f"Error during validation: {str(e)}")
+        return None, issues
+    
+    # All checks passed
+    return document, []
+
+
+def validate_odt_file(file_path, parse_content=False, zip_limits=ZIP_LIMITS):
+    """
+    Validates if file is a proper ODT file
+    Default: fast tier only (central directory + mimetype, microseconds);
+    parse_content=True also parses content.xml
+    Returns: (is_valid, issues_list)
+    """
+    document, issues = open_odt_document(file_path, parse_content, zip_limits)
+    if document is None:
+        return False, issues
+    
+    document.close()
+    return True, []
+
+
+# ==================== ODT HELPER FUNCTIONS ====================
+
+def get_para_text(para):
+    """Extract text from ODT paragraph element"""
+    return ''.join(para.itertext())
+
+
+def clear_para_content(para):
+    """Clear all child elements from paragraph"""
+    for child in list(para):
+        para.remove(child)
+    para.text = None
+    para.tail = None
+
+
+def set_para_text(para, text):
+    """Set text for ODT paragraph"""
+    clear_para_content(para)
+    para.text = text
+
+
+# ==================== ODT PROCESSING FUNCTIONS ====================
+
+def fix_odt_question_numbers_and_brackets(root, namespaces):
+    """
+    ODT file mein:
+    1. Question numbers ko fix karta hai (ascending order: 1, 2, 3...)
+    2. Bracket text [People], [Process] etc. ko remove karta hai
+    3. Valid question types ko preserve karta hai
+    """
+    question_counter = 1
+    
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    for para in paragraphs:
+        para_text = get_para_text(para).strip()
+        
+        # Pattern for both "Question No:" and "Question:"
+        if QUESTION_HEADER_PATTERN.match(para_text):
+            # Extract question type agar hai to
+            question_type = extract_valid_question_type(para_text)
+            
+            # Set new text with proper numbering (without brackets)
+            if question_type:
+                set_para_text(para, f"Question: {question_counter} {question_type}")
+            else:
+                set_para_text(para, f"Question: {question_counter}")
+            
+            question_counter += 1
+    
+    return root, question_counter - 1
+
+
+def ensure_spacing_before_question_tags_odt(root, namespaces):
+    """
+    Ensures there's proper spacing before QUESTION NO: tags in ODT.
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    for para in paragraphs:
+        para_text = get_para_text(para)
+        
+        # Check if paragraph contains QUESTION NO: but doesn't start with it
+        if "QUESTION NO:" in para_text and not para_text.strip().startswith("QUESTION NO:"):
+            # Split the text at QUESTION NO:
+            parts = para_text.split("QUESTION NO:")
+            
+            if len(parts) > 1:
+                # For ODT, we'll keep it simple - just set the text properly
+                new_text = parts[0].rstrip()
+                if new_text:
+                    new_text += "\n\n"
+                new_text += "QUESTION NO:" + "QUESTION NO:".join(parts[1:])
+                
+                set_para_text(para, new_text)
+    
+    return root
+
+
+def combined_text_operations_odt(root, namespaces):
+    """
+    Combined text operations for ODT (rules: text_rules.json 'odt'):
+    - Replace QUESTION NO: with Question:
+    - Remove Explanation: tags
+    - Replace References with Reference
+    - Remove <map> tags
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    for para in paragraphs:
+        para_text, modified = ODT_TEXT_RULES.apply(get_para_text(para))
+        
+        if modified:
+            set_para_text(para, para_text)
+    
+    return root
+
+
+# def shift_question_types_to_next_line_odt(root, namespaces):
+#     """
+#     Question types (HOTSPOT, SIMULATION, DRAG DROP) ko next line mein shift karta hai
+#     """
+#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+#     for i, para in enumerate(paragraphs):
+#         para_text = get_para_text(para)
+        
+#         # Check if this matches Question: X TYPE pattern
+#         match = QUESTION_TYPE_PATTERN.match(para_text.strip())
+        
+#         if match:
+#             question_part = match.group(1)  # "Question: X"
+#             question_type = match.group(2)  # "HOTSPOT" etc.
+#             remaining = match.group(3)      # Any remaining text
+            
+#             # Set current paragraph to just question number
+#             set_para_text(para, question_part)
+            
+#             # Insert new paragraph after current with question type
+#             # In ODT, we need to insert in parent
+#             parent = para.getparent()
+#             if parent is not None:
+#                 index = list(parent).index(para)
+                
+#                 # Create new paragraph element
+#                 new_para = etree.Element(f"{{{namespaces['text']}}}p")
+#                 new_para.text = question_type + (remaining if remaining else "")
+                
+#                 # Insert after current paragraph
+#                 parent.insert(index + 1, new_para)
+    
+#     return root
+
+
+def shift_question_types_to_next_line_odt(root, namespaces):
+    """
+    Question types (HOTSPOT, SIMULATION, DRAG DROP) ko next line mein shift karta hai
+    FIXED: Properly handles parent list modifications
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    # Collect all changes first to avoid modifying list during iteration
+    changes_to_make = []
+    
+    for para in paragraphs:
+        para_text = get_para_text(para)
+        
+        # Check if this matches Question: X TYPE pattern
+        match = QUESTION_TYPE_PATTERN.match(para_text.strip())
+        
+        if match:
+            question_part = match.group(1)  # "Question: X"
+            question_type = match.group(2)  # "HOTSPOT" etc.
+            remaining = match.group(3)      # Any remaining text
+            
+            changes_to_make.append({
+                'para': para,
+                'question_part': question_part,
+                'question_type': question_type,
+                'remaining': remaining
+            })
+    
+    # Apply all changes after collection
+    for change in changes_to_make:
+        para = change['para']
+        question_part = change['question_part']
+        question_type = change['question_type']
+        remaining = change['remaining']
+        
+        # Set current paragraph to just question number
+        set_para_text(para, question_part)
+        
+        # Insert new paragraph after current with question type
+        # (addnext links the sibling directly - no O(siblings) index lookup)
+        if para.getparent() is not None:
+            new_para = etree.Element(f"{{{namespaces['text']}}}p")
+            new_para.text = question_type + (remaining if remaining else "")
+            para.addnext(new_para)
+    
+    return root
+
+
+def normalize_option_spacing_odt(root, namespaces):
+    """
+    Options (A. B. C. etc.) ke formatting ko normalize karta hai
+    Format: "A. " (capital letter, period, single space)
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    for para in paragraphs:
+        para_text = get_para_text(para)
+        
+        # Check if paragraph matches option pattern
+        match = OPTION_PATTERN.match(para_text.strip())
+        
+        if match:
+            option_letter = match.group(1)  # A, B, C, etc.
+            option_text = match.group(2)    # Rest of the text
+            
+            # Normalize: "A. text"
+            normalized_text = f"{option_letter}. {option_text}"
+            set_para_text(para, normalized_text)
+    
+    return root
+
+
+# def add_explanation_tags_if_text_present_odt(root, namespaces):
+#     """
+#     Answer ke baad agar text hai to "Explanation:" tag add karta hai
+#     """
+#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
+#     answer_found = False
+#     explanation_added = False
+    
+#     for i, para in enumerate(paragraphs):
+#         para_text = get_para_text(para).strip()
+        
+#         # Check if this is Answer: line
+#         if para_text.startswith("Answer:"):
+#             answer_found = True
+#             explanation_added = False
+#             continue
+        
+#         # Check if this is next Question:
+#         if para_text.startswith("Question:"):
+#             answer_found = False
+#             explanation_added = False
+#             continue
+        
+#         # If we're after Answer: and haven't added Explanation yet
+#         if answer_found and not explanation_added and para_text:
+#             # Check if line already has Explanation:
+#             if not para_text.startswith("Explanation:") and not para_text.startswith("Reference:"):
+#                 # Insert new paragraph with "Explanation:" before this one
+#                 parent = para.getparent()
+#                 if parent is not None:
+#                     index = list(parent).index(para)
+                    
+#                     # Create new paragraph with Explanation:
+#                     explanation_para = etree.Element(f"{{{namespaces['text']}}}p")
+#                     explanation_para.text = "Explanation:"
+                    
+#                     # Insert before current paragraph
+#                     parent.insert(index, explanation_para)
+                    
+#                     explanation_added = True
+    
+#     return root
+
+
+def add_explanation_tags_if_text_present_odt(root, namespaces):
+    """
+    Answer ke baad agar text hai to "Explanation:" tag add karta hai
+    FIXED: Better parent handling
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    # Collect paragraphs that need explanation tags
+    explanation_insertions = []
+    
+    answer_found = False
+    explanation_added = False
+    
+    for i, para in enumerate(paragraphs):
+        para_text = get_para_text(para).strip()
+        
+        # Check if this is Answer: line
+        if para_text.startswith("Answer:"):
+            answer_found = True
+            explanation_added = False
+            continue
+        
+        # Check if this is next Question:
+        if para_text.startswith("Question:"):
+            answer_found = False
+            explanation_added = False
+            continue
+        
+        # If we're after Answer: and haven't added Explanation yet
+        if answer_found and not explanation_added and para_text:
+            # Check if line already has Explanation:
+            if not para_text.startswith("Explanation:") and not para_text.startswith("Reference:"):
+                explanation_insertions.append({
+                    'para': para,
+                    'before': True  # Insert before this paragraph
+                })
+                explanation_added = True
+    
+    # Apply all insertions
+    for insertion in explanation_insertions:
+        para = insertion['para']
+        
+        if para.getparent() is not None:
+            # Create new paragraph with Explanation:
+            explanation_para = etree.Element(f"{{{namespaces['text']}}}p")
+            explanation_para.text = "Explanation:"
+            
+            # Insert before current paragraph
+            para.addprevious(explanation_para)
+    
+    return root
+
+
+# def add_line_spacing_after_question_answer_odt(root, namespaces):
+#     """
+#     Question: aur Answer: ke baad proper line spacing add karta hai
+#     """
+#     paragraphs = root.xpath('//text:p', namespaces=namespaces)
+#     parent = None
+    
+#     # Find parent element
+#     for para in paragraphs:
+#         parent = para.getparent()
+#         if parent is not None:
+#             break
+    
+#     if parent is None:
+#         return root
+    
+#     # Process paragraphs in reverse to avoid index issues when inserting
+#     paragraphs_list = list(paragraphs)
+    
+#     for i in range(len(paragraphs_list) - 1, -1, -1):
+#         para = paragraphs_list[i]
+#         para_text = get_para_text(para).strip()
+        
+#         # Add spacing after Question: lines
+#         if para_text.startswith("Question:"):
+#             index = list(parent).index(para)
+            
+#             # Add empty paragraph after
+#             empty_para = etree.Element(f"{{{namespaces['text']}}}p")
+#             empty_para.text = ""
+#             parent.insert(index + 1, empty_para)
+        
+#         # Add spacing after Answer: lines
+#         elif para_text.startswith("Answer:"):
+#             index = list(parent).index(para)
+            
+#             # Add empty paragraph after
+#             empty_para = etree.Element(f"{{{namespaces['text']}}}p")
+#             empty_para.text = ""
+#             parent.insert(index + 1, empty_para)
+    
+#     return root
+
+
+def add_line_spacing_after_question_answer_odt(root, namespaces):
+    """
+    Question: aur Answer: ke baad proper line spacing add karta hai
+    FIXED: Handles parent modifications correctly
+    """
+    paragraphs = root.xpath('//text:p', namespaces=namespaces)
+    
+    # Collect all spacing insertions
+    spacing_insertions = []
+    
+    for para in paragraphs:
+        para_text = get_para_text(para).strip()
+        
+        # Mark paragraphs that need spacing after them
+        if para_text.startswith("Question:") or para_text.startswith("Answer:"):
+            spacing_insertions.append(para)
+    
+    # Insertions are relative to the paragraph itself, so order doesn't matter
+    for para in spacing_insertions:
+        if para.getparent() is not None:
+            # Create empty paragraph for spacing
+            empty_para = etree.Element(f"{{{namespaces['text']}}}p")
+            empty_para.text = ""
+            
+            # Insert after current paragraph
+            para.addnext(empty_para)
+    
+    return root
+
+
+# ==================== FUSED ODT PIPELINE ====================
+
+class FusedOdtPipeline:
+    """
+    Saare 7 ODT steps ko ek hi ordered traversal mein apply karta hai.
+    Har paragraph ka text sirf ek dafa nikalta hai aur har step ka time
+    alag se count karta hai (step_times) taake SSE progress UI chalta rahe.
+    Output upar wale step functions ko sequence mein chalane jaisa hi hai.
+    """
+    
+    def __init__(self, namespaces):
+        self.namespaces = namespaces
+        self.para_tag = f"{{{namespaces['text']}}}p"
+        self.question_counter = 1
+        self.answer_found = False
+        self.explanation_added = False
+        self.step_times = [0.0] * len(ODT_PROCESSING_STEPS)
+        # Paragraphs inserted by a step as (para, first_step)
+        self.inserted = []
+        self.steps = [
+            self.fix_question_number,
+            self.ensure_spacing_before_question,
+            self.combined_text_operations,
+            self.shift_question_type,
+            self.normalize_option_spacing,
+            self.add_explanation_tag,
+            self.add_line_spacing
+        ]
+    
+    def run(self, root):
+        """Process all paragraphs, returns number of questions fixed"""
+        nested = set()
+        
+        for para in list(root.iter(self.para_tag)):
+            if para in nested:
+                continue
+            
+            nested.update(self.process_unit(para))
+        
+        return self.question_counter - 1
+    
+    def process_unit(self, para):
+        """
+        Process a top-level paragraph (one with no paragraph ancestor).
+        Returns the nested paragraphs that were handled as part of it.
+        """
+        descendants = list(para.iterdescendants(self.para_tag))
+        if descendants:
+            self.process_nested_unit(para)
+        else:
+            self.process_paragraph(para, 0)
+        
+        return descendants
+    
+    def process_paragraph(self, para, first_step):
+        """
+        Run steps first_step..7 on a paragraph without nested paragraphs.
+        Text is cached between steps and only re-set when a step rewrites it.
+        """
+        self.inserted = []
+        text = get_para_text(para)
+        clock = time.perf_counter
+        start_time = clock()
+        
+        for index in range(first_step, len(self.steps)):
+            text = self.steps[index](para, text)
+            now = clock()
+            self.step_times[index] += now - start_time
+            start_time = now
+        
+        self.process_inserted(self.inserted)
+    
+    def process_nested_unit(self, unit):
+        """
+        Paragraph jis ke andar aur paragraphs hain (text-box, notes) - yahan
+        har step poore unit par chalta hai taake sequential order same rahe.
+        """
+        unit_inserted = []
+        clock = time.perf_counter
+        
+        for index, step in enumerate(self.steps):
+            start_time = clock()
+            
+            # Fresh list of the unit's paragraphs, like the per-step xpath
+            for para in list(unit.iter(self.para_tag)):
+                self.inserted = []
+                step(para, get_para_text(para))
+                
+                # Paragraphs inserted inside the unit are picked up by the
+                # next step's list, only siblings of the unit need queueing
+                if para is unit:
+                    unit_inserted.extend(self.inserted)
+            
+            self.step_times[index] += clock() - start_time
+        
+        self.process_inserted(unit_inserted)
+    
+    def process_inserted(self, inserted):
+        """Run the remaining steps on paragraphs inserted by earlier steps"""
+        for para, first_step in inserted:
+            if first_step < len(self.steps):
+                self.process_paragraph(para, first_step)
+    
+    def new_paragraph(self, text):
+        """Create an empty ODT paragraph element"""
+        new_para = etree.Element(self.para_tag)
+        new_para.text = text
+        return new_para
+    
+    # ---------- Steps (same logic as the standalone step functions) ----------
+    
+    def fix_question_number(self, para, text):
+        para_text = text.strip()
+        
+        if QUESTION_HEADER_PATTERN.match(para_text):
+            question_type = extract_valid_question_type(para_text)
+            
+            if question_type:
+                text = f"Question: {self.question_counter} {question_type}"
+            else:
+                text = f"Question: {self.question_counter}"
+            set_para_text(para, text)
+            
+            self.question_counter += 1
+        
+        return text
+    
+    def ensure_spacing_before_question(self, para, text):
+        if "QUESTION NO:" in text and not text.strip().startswith("QUESTION NO:"):
+            parts = text.split("QUESTION NO:")
+            
+            if len(parts) > 1:
+                new_text = parts[0].rstrip()
+                if new_text:
+                    new_text += "\n\n"
+                new_text += "QUESTION NO:" + "QUESTION NO:".join(parts[1:])
+                
+                set_para_text(para, new_text)
+                text = new_text
+        
+        return text
+    
+    def combined_text_operations(self, para, text):
+        text, modified = ODT_TEXT_RULES.apply(text)
+        
+        if modified:
+            set_para_text(para, text)
+        
+        return text
+    
+    def shift_question_type(self, para, text):
+        match = QUESTION_TYPE_PATTERN.match(text.strip())
+        
+        if match:
+            question_part = match.group(1)
+            question_type = match.group(2)
+            remaining = match.group(3)
+            
+            set_para_text(para, question_part)
+            text = question_part
+            
+            if para.getparent() is not None:
+                new_para = self.new_paragraph(question_type + (remaining if remaining else ""))
+                para.addnext(new_para)
+                self.inserted.append((new_para, 4))
+        
+        return text
+    
+    def normalize_option_spacing(self, para, text):
+        match = OPTION_PATTERN.match(text.strip())
+        
+        if match:
+            text = f"{match.group(1)}. {match.group(2)}"
+            set_para_text(para, text)
+        
+        return text
+    
+    def add_explanation_tag(self, para, text):
+        para_text = text.strip()
+        
+        if para_text.startswith("Answer:"):
+            self.answer_found = True
+            self.explanation_added = False
+        elif para_text.startswith("Question:"):
+            self.answer_found = False
+            self.explanation_added = False
+        elif self.answer_found and not self.explanation_added and para_text:
+            if not para_text.startswith("Explanation:") and not para_text.startswith("Reference:"):
+                if para.getparent() is not None:
+                    explanation_para = self.new_paragraph("Explanation:")
+                    para.addprevious(explanation_para)
+                    self.inserted.append((explanation_para, 6))
+                self.explanation_added = True
+        
+        return text
+    
+    def add_line_spacing(self, para, text):
+        para_text = text.strip()
+        
+        if para_text.startswith("Question:") or para_text.startswith("Answer:"):
+            if para.getparent() is not None:
+                para.addnext(self.new_paragraph(""))
+        
+        return text
+
+
+# ==================== STREAMING ODT PIPELINE ====================
+
+NAMESPACE_DECLARATION_PATTERN = re.compile(rb'\s+xmlns(?::([^=\s]+))?="([^"]*)"')
+NAMESPACE_BLOCK_PATTERN = re.compile(rb'<[^\s/>]+((?:\s+xmlns(?::[^=\s]+)?="[^"]*")+)')
+
+
+def escape_xml_text(text):
+    """Escape text content the same way libxml2 serializes it"""
+    return (text.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('\r', '&#13;'))
+
+
+def strip_inherited_namespaces(data, inherited_nsmap, cache=None):
+    """
+    lxml har standalone serialized element par parent ke saare xmlns
+    declarations likh deta hai - jo ancestors par pehle se hain unko
+    start tag se hata deta hai. cache (dict, ek hi inherited_nsmap ke liye)
+    same declaration block ka result dobara use karta hai.
+    """
+    match = NAMESPACE_BLOCK_PATTERN.match(data)
+    if match is None:
+        return data
+    
+    block = match.group(1)
+    stripped = cache.get(block) if cache is not None else None
+    
+    if stripped is None:
+        def keep_declaration(declaration):
+            prefix = declaration.group(1).decode() if declaration.group(1) else None
+            if inherited_nsmap.get(prefix) == declaration.group(2).decode():
+                return b''
+            return declaration.group(0)
+        
+        stripped = NAMESPACE_DECLARATION_PATTERN.sub(keep_declaration, block)
+        if cache is not None:
+            cache[block] = stripped
+    
+    return data[:match.start(1)] + stripped + data[match.end(1):]
+
+
+class StreamingOdtWriter:
+    """
+    content.xml ko iterparse se stream karta hai. Har top-level text:p close
+    hote hi FusedOdtPipeline se process hota hai, output mein likha jata hai
+    aur tree se hata diya jata hai - is liye memory document size par depend
+    nahi karti. Output compact XML hai (pretty_print nahi hota).
+    """
+    
+    def __init__(self, output, pipeline):
+        self.output = output
+        self.pipeline = pipeline
+        self.para_tag = pipeline.para_tag
+        # Open containers as [element, start_tag_written]
+        self.stack = []
+        # Children already written except for their tail
+        self.written = set()
+        # Top-level paragraphs waiting for their tail before processing
+        self.pending_units = set()
+        # Stripped namespace declaration blocks per inherited nsmap
+        self.namespace_caches = {}
+    
+    def run(self, source):
+        """Stream source (file object) through the pipeline"""
+        unit_depth = 0
+        
+        self.output.write(b"<?xml version='1.0' encoding='UTF-8'?>\n")
+        
+        for event, elem in etree.iterparse(source, events=('start', 'end', 'comment', 'pi')):
+            if unit_depth:
+                # Inside a paragraph - collected whole, handled at its end
+                if event == 'start':
+                    unit_depth += 1
+                elif event == 'end':
+                    unit_depth -= 1
+                    if unit_depth == 0:
+                        self.pending_units.add(elem)
+                continue
+            
+            if event == 'end':
+                self.close_container()
+                continue
+            
+            if event != 'start' and elem.getparent() is None:
+                # Comment or processing instruction outside the root element
+                self.output.write(etree.tostring(elem, encoding='UTF-8') + b'\n')
+                continue
+            
+            if self.stack:
+                self.flush(current=elem)
+            
+            if event == 'start':
+                if elem.tag == self.para_tag:
+                    unit_depth = 1
+                else:
+                    self.stack.append([elem, False])
+        
+        return self.pipeline.question_counter - 1
+    
+    def write_start_tag(self, entry):
+        """Write the start tag of an open container (once)"""
+        elem = entry[0]
+        if entry[1]:
+            return
+        
+        data = etree.tostring(elem, encoding='UTF-8', with_tail=False)
+        start_tag = data[:data.find(b'>') + 1]
+        parent = elem.getparent()
+        if parent is not None:
+            start_tag = strip_inherited_namespaces(start_tag, parent.nsmap, self.namespace_cache(parent.nsmap))
+        
+        self.output.write(start_tag)
+        if elem.text:
+            self.output.write(escape_xml_text(elem.text).encode('utf-8'))
+        entry[1] = True
+    
+    def flush(self, current=None):
+        """
+        Write (and free) all finished children of the innermost open
+        container, stopping at the child that is still being parsed.
+        """
+        entry = self.stack[-1]
+        container = entry[0]
+        self.write_start_tag(entry)
+        
+        # Process paragraphs first, their steps may insert new siblings.
+        # iterparse reads ahead, so siblings after current may already be
+        # in the tree - walk from the first child instead of list(container)
+        if self.pending_units:
+            child = next(iter(container), None)
+            while child is not None and child is not current:
+                if child in self.pending_units:
+                    self.pending_units.discard(child)
+                    self.pipeline.process_unit(child)
+                child = child.getnext()
+        
+        nsmap = container.nsmap
+        namespace_cache = self.namespace_cache(nsmap)
+        child = next(iter(container), None)
+        while child is not None and child is not current:
+            if child in self.written:
+                self.written.discard(child)
+                if child.tail:
+                    self.output.write(escape_xml_text(child.tail).encode('utf-8'))
+            else:
+                data = etree.tostring(child, encoding='UTF-8', with_tail=True)
+                if isinstance(child.tag, str):
+                    data = strip_inherited_namespaces(data, nsmap, namespace_cache)
+                self.output.write(data)
+            
+            # Empty it first so removing it doesn't walk the subtree
+            next_child = child.getnext()
+            child.clear()
+            container.remove(child)
+            child = next_child
+    
+    def close_container(self):
+        """Finish the innermost open container at its end event"""
+        entry = self.stack[-1]
+        elem = entry[0]
+        
+        if not entry[1] and len(elem) == 0:
+            # Never had children - serialize it whole (keeps <tag/> form)
+            self.stack.pop()
+            data = etree.tostring(elem, encoding='UTF-8', with_tail=False)
+            parent = elem.getparent()
+            if parent is not None:
+                data = strip_inherited_namespaces(data, parent.nsmap, self.namespace_cache(parent.nsmap))
+            self.output.write(data)
+        else:
+            self.flush()
+            self.stack.pop()
+            self.output.write(f"</{self.qualified_name(elem)}>".encode('utf-8'))
+        
+        if elem.getparent() is not None:
+            self.written.add(elem)
+    
+    def namespace_cache(self, nsmap):
+        """Cache of stripped declaration blocks for one inherited nsmap"""
+        return self.namespace_caches.setdefault(tuple(nsmap.items()), {})
+    
+    @staticmethod
+    def qualified_name(elem):
+        """Prefixed tag name of an element, e.g. text:p"""
+        local_name = etree.QName(elem).localname
+        return f"{elem.prefix}:{local_name}" if elem.prefix else local_name
+
+
+# ==================== BLOCK ODT PIPELINE ====================
+
+def is_block_start(child, para_tag):
+    """
+    True if a child of office:text starts a question block: a plain
+    paragraph (no nested paragraphs) that fix_question_number renumbers.
+    Its processing resets the Answer/Explanation state (unless a text rule
+    rewrites "Question:" - process_odt_blocks checks), so a block doesn't
+    depend on anything before it except the question number.
+    """
+    if child.tag != para_tag:
+        return False
+    # Cheap first-letter check before joining the whole text
+    text = child.text.lstrip() if child.text else ''
+    if not text:
+        text = next((chunk.lstrip() for chunk in child.itertext() if chunk.strip()), '')
+    if not text or text[0] not in 'qQ':
+        return False
+    return (next(child.iterdescendants(para_tag), None) is None
+            and QUESTION_HEADER_PATTERN.match(get_para_text(child).strip()) is not None)
+
+
+def find_shardable_body(root):
+    """
+    office:text element if all paragraphs of the document are inside it
+    (blocks only cover its children), else None. An empty office:text is
+    None too: the serial run writes it self-closed (<office:text/>)
+    """
+    para_tag = f"{{{ODT_NAMESPACES['text']}}}p"
+    body = root.find('office:body/office:text', ODT_NAMESPACES)
+    if body is None or len(body) == 0:
+        return None
+    
+    # Siblings of office:text and of each of its ancestors
+    elem = body
+    while elem.getparent() is not None:
+        for sibling in elem.getparent():
+            if sibling is not elem and next(sibling.iter(para_tag), None) is not None:
+                return None
+        elem = elem.getparent()
+    return body
+
+
+class BlockRecordingPipeline(FusedOdtPipeline):
+    """
+    FusedOdtPipeline jo renumbered headers yaad rakhta hai, taake output
+    mein unke number baad mein kisi aur number se badle ja saken.
+    reusable False ho jata hai agar kisi header ka text number par depend
+    kare (text rules) ya header kisi nested unit ke andar ho (caller har
+    block se pehle ise True karta hai).
+    """
+    
+    def __init__(self, namespaces):
+        super().__init__(namespaces)
+        # (para, number) of every renumbered header
+        self.headers = []
+        self.reusable = True
+        self.nested_unit = None
+        self.probe_para = etree.Element(self.para_tag)
+    
+    def process_nested_unit(self, unit):
+        self.nested_unit = unit
+        try:
+            super().process_nested_unit(unit)
+        finally:
+            self.nested_unit = None
+    
+    def fix_question_number(self, para, text):
+        number = self.question_counter
+        text = super().fix_question_number(para, text)
+        
+        if self.question_counter != number:
+            self.headers.append((para, number))
+            if ((self.nested_unit is not None and para is not self.nested_unit)
+                    or not self.number_independent(text, number)):
+                self.reusable = False
+        
+        return text
+    
+    def number_independent(self, text, number):
+        """
+        True if steps 2-3 give the same header text for any other number,
+        with the number kept at the start. Step 4 only cuts "Question: N"
+        off the type and steps 5-7 keep the text, so the output differs
+        only in the number.
+        """
+        prefix = f"Question: {number}"
+        other_prefix = f"Question: {number + 10 ** 6}"
+        results = []
+        for header_text in (text, other_prefix + text[len(prefix):]):
+            header_text = self.ensure_spacing_before_question(self.probe_para, header_text)
+            results.append(self.combined_text_operations(self.probe_para, header_text))
+        
+        result, other_result = results
+        return (result.startswith(prefix) and not result[len(prefix):len(prefix) + 1].isdigit()
+                and other_result == other_prefix + result[len(prefix):])
+
+
+def fill_block_template(template, first_question):
+    """Block output with its question numbers, counting from first_question"""
+    parts = template.split(b'\x00')
+    parts[1::2] = [str(first_question + int(offset)).encode() for offset in parts[1::2]]
+    return b''.join(parts)
+
+
+def serialize_children(body):
+    """Children of a wrapper element as XML bytes (without its start/end tags)"""
+    data = etree.tostring(body, encoding='UTF-8', xml_declaration=False)
+    return data[data.index(b'>') + 1:data.rindex(b'</')]
+
+
+def process_odt_blocks(blocks_xml, marker):
+    """
+    Process consecutive question blocks (runs in-process or in a block
+    process)
+    blocks_xml: serialized office:text element holding the blocks' children,
+    each block preceded by a marker comment
+    Returns: ([(template, questions, independent) per block], step_times).
+    Templates hold the block's XML with every header number replaced by
+    NUL + offset from the block's first number + NUL; template is None
+    for a block whose output can't be renumbered (process_odt_block
+    instead). independent: the block's first paragraph reset the
+    Answer/Explanation state.
+    """
+    body = etree.fromstring(blocks_xml)
+    pipeline = BlockRecordingPipeline(ODT_NAMESPACES)
+    # Per block: [first question number, first header index, reusable,
+    # starting header paragraph (None at the document start)]
+    blocks = []
+    first_child = False
+    
+    for child in list(body):
+        if child.tag is etree.Comment and child.text == marker:
+            if blocks:
+                blocks[-1][2] = pipeline.reusable
+            blocks.append([pipeline.question_counter, len(pipeline.headers), True, None])
+            pipeline.reusable = True
+            first_child = True
+            continue
+        
+        if first_child and is_block_start(child, pipeline.para_tag):
+            blocks[-1][3] = child
+        first_child = False
+        if child.tag == pipeline.para_tag:
+            pipeline.process_unit(child)
+        else:
+            pipeline.run(child)
+    blocks[-1][2] = pipeline.reusable
+    
+    # Numbers become token<number>token in the text, offsets after splitting
+    token = uuid.uuid4().hex
+    for index, (_, first_header, reusable, _) in enumerate(blocks):
+        last_header = blocks[index + 1][1] if index + 1 < len(blocks) else len(pipeline.headers)
+        for para, number in pipeline.headers[first_header:last_header]:
+            prefix = f"Question: {number}"
+            if len(para) or not (para.text or '').startswith(prefix):
+                blocks[index][2] = False
+            elif reusable:
+                para.text = f"Question: {token}{number}{token}{para.text[len(prefix):]}"
+    
+    token = token.encode()
+    block_data = serialize_children(body).split(f"<!--{marker}-->".encode())[1:]
+    results = []
+    for index, data in enumerate(block_data):
+        first_number, _, reusable, header = blocks[index]
+        next_number = blocks[index + 1][0] if index + 1 < len(blocks) else pipeline.question_counter
+        # Step 5 saw the text the paragraph still has (steps 6-7 keep it)
+        independent = header is not None and get_para_text(header).strip().startswith("Question:")
+        template = None
+        if reusable:
+            # Split at the tokens: every odd part is a number
+            parts = data.split(token)
+            parts[1::2] = [b'%d' % (int(number) - first_number) for number in parts[1::2]]
+            template = b'\x00'.join(parts)
+        results.append((template, next_number - first_number, independent))
+    
+    return results, pipeline.step_times
+
+
+def process_odt_block(block_xml, first_question):
+    """
+    Process one block with its real numbering (blocks without a template)
+    Returns: (processed children as XML bytes, step_times)
+    """
+    body = etree.fromstring(block_xml)
+    pipeline = FusedOdtPipeline(ODT_NAMESPACES)
+    pipeline.question_counter = first_question
+    pipeline.run(body)
+    return serialize_children(body), pipeline.step_times
+
+
+class BlockOdtWriter:
+    """
+    office:text ke children ko question blocks mein kaatta hai (har block
+    ek header paragraph se shuru hota hai, Question se Reference tak).
+    Block ka output sirf us ke apne XML aur question number par depend
+    karta hai, is liye:
+    
+    - block_cache ho to har block ke XML ka hash dekha jata hai; pehle se
+      process hue blocks cache se aate hain aur sirf naye/badle blocks
+      pipeline se guzarte hain (edit ke baad dobara upload)
+    - processes > 1 ho to baqi blocks alag processes mein bante hain
+      (sharded mode)
+    
+    Blocks local numbering ke saath process hote hain aur output mein
+    header numbers ki jagah slots rehte hain (template); likhte waqt
+    parent order mein asal numbers bharta hai - output serial run jaisa hi.
+    
+    Tree ek hi dafa serialize hota hai (block boundaries par marker
+    comments ke saath) aur bytes markers par kaate jate hain - elements
+    move nahi hote, is liye namespace declarations bhi as-is rehti hain.
+    """
+    
+    def __init__(self, tree, body, processes=1, block_cache=None):
+        self.tree = tree
+        self.body = body
+        self.processes = processes
+        self.block_cache = block_cache
+        self.para_tag = f"{{{ODT_NAMESPACES['text']}}}p"
+        # Step times summed over the processed blocks, time spent writing
+        self.step_times = [0.0] * len(ODT_PROCESSING_STEPS)
+        self.write_time = 0.0
+        self.questions_fixed = 0
+        self.blocks = 0
+        self.blocks_reused = 0
+        self.head = self.tail = None
+        self.results = None
+    
+    def prepare(self):
+        """
+        Process the blocks that aren't cached. Returns False if the
+        document has to go through the serial run instead: a block whose
+        header doesn't reset the Answer/Explanation state (text rules).
+        The tree is left unchanged.
+        """
+        marker = f"block-{uuid.uuid4().hex}"
+        comments = self.mark_blocks(marker)
+        try:
+            data = etree.tostring(self.tree, xml_declaration=True, encoding='UTF-8')
+        finally:
+            for comment in comments:
+                self.body.remove(comment)
+        
+        marker_comment = f"<!--{marker}-->".encode()
+        blocks = data.split(marker_comment)
+        del data
+        self.head, self.tail = blocks.pop(0), blocks.pop()
+        self.blocks = len(blocks)
+        
+        # Blocks are parsed inside an office:text declaring the same namespaces
+        wrapper = etree.Element(self.body.tag, nsmap=self.body.nsmap)
+        wrapper.text = marker
+        wrapper_start, wrapper_end = etree.tostring(wrapper, encoding='UTF-8').split(marker.encode())
+        
+        self.results = [None] * len(blocks)
+        keys = None
+        if self.block_cache is not None:
+            keys = [self.block_cache.key(wrapper_start, block) for block in blocks]
+            cached = self.block_cache.get_many(keys)
+            for index, key in enumerate(keys):
+                if key in cached:
+                    self.results[index] = (*cached[key], True)
+            self.blocks_reused = sum(1 for result in self.results if result is not None and result[0] is not None)
+        
+        units = self.missing_units()
+        jobs = ((wrapper_start + b''.join(marker_comment + blocks[index] for index in unit) + wrapper_end, marker)
+                for unit in units)
+        
+        if self.processes > 1 and len(units) > 1:
+            executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'))
+            try:
+                self.collect(units, executor.map(process_odt_blocks, *zip(*jobs)))
+            finally:
+                executor.shutdown(cancel_futures=True)
+        else:
+            self.collect(units, (process_odt_blocks(*job) for job in jobs))
+        
+        if not all(independent for _, _, independent in self.results[1:]):
+            return False
+        
+        # Blocks without a template are cached too (as template None): next
+        # time they skip the template attempt
+        if keys is not None:
+            entries = []
+            for index in (index for unit in units for index in unit):
+                template, questions, independent = self.results[index]
+                if independent:
+                    entries.append((keys[index], template, questions))
+            self.block_cache.put_many(entries)
+        
+        # Blocks without a template: processed again with their real numbers
+        first_question = 1
+        for index, (template, questions, independent) in enumerate(self.results):
+            if template is None:
+                data, step_times = process_odt_block(wrapper_start + blocks[index] + wrapper_end, first_question)
+                self.results[index] = (data, questions, independent)
+                self.add_step_times(step_times)
+            first_question += questions
+        self.questions_fixed = first_question - 1
+        return True
+    
+    def mark_blocks(self, marker):
+        """Put a marker comment before every block and after the last one"""
+        comments = []
+        children = list(self.body)
+        
+        for index, child in enumerate(children):
+            if index == 0 or is_block_start(child, self.para_tag):
+                comments.append(etree.Comment(marker))
+                child.addprevious(comments[-1])
+        
+        comments.append(etree.Comment(marker))
+        self.body.append(comments[-1])
+        return comments
+    
+    def missing_units(self):
+        """
+        Work units (lists of block indexes) covering the blocks without a
+        result - runs of consecutive missing blocks, split so that every
+        process gets several units
+        """
+        missing = [index for index, result in enumerate(self.results) if result is None]
+        unit_size = len(missing)
+        if self.processes > 1:
+            unit_size = -(-len(missing) // (self.processes * SHARDS_PER_PROCESS))
+        
+        units = []
+        for index in missing:
+            if units and units[-1][-1] == index - 1 and len(units[-1]) < unit_size:
+                units[-1].append(index)
+            else:
+                units.append([index])
+        return units
+    
+    def collect(self, units, outputs):
+        """Store the units' results in order"""
+        for unit, (results, step_times) in zip(units, outputs):
+            for index, result in zip(unit, results):
+                self.results[index] = result
+            self.add_step_times(step_times)
+    
+    def add_step_times(self, step_times):
+        for index, step_time in enumerate(step_times):
+            self.step_times[index] += step_time
+    
+    def write(self, output):
+        """
+        Write content.xml with the blocks numbered in order (blocks
+        processed with real numbers have no NULs and stay as they are)
+        """
+        start_time = time.time()
+        output.write(self.head)
+        first_question = 1
+        for template, questions, _ in self.results:
+            output.write(fill_block_template(template, first_question))
+            first_question += questions
+        output.write(self.tail)
+        self.write_time += time.time() - start_time
+
+
+# ==================== OUTPUT SERIALIZATION ====================
+
+class CountingWriter:
+    """File-like wrapper that counts the bytes written through it"""
+    
+    def __init__(self, output):
+        self.output = output
+        self.bytes_written = 0
+    
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.output.write(data)
+
+
+def buffered_member_writer(write_xml):
+    """
+    repack_zip writer for content.xml: write_xml(output) gets a buffered,
+    counting file object that feeds the zip member's compressor directly
+    (no temp file). Returns: (writer, counter)
+    """
+    counter = CountingWriter(None)
+    
+    def write_member(dest):
+        buffered = BufferedWriter(dest, SERIALIZE_BUFFER_SIZE)
+        counter.output = buffered
+        write_xml(counter)
+        buffered.flush()
+    
+    return write_member, counter
+
+
+# ==================== ODT ANALYSIS ====================
+
+class OdtAnalyzer:
+    """
+    Pipeline ki question/answer/option detection read-only chalata hai:
+    paragraphs document order mein aate hain, header original text par
+    pehchana jata hai (step 1 ki tarah) aur Answer ke baad wale paragraphs
+    text rules ke baad (jaise step 5 dekhta hai). Sirf ginti hoti hai -
+    document badalta nahi.
+    """
+    
+    def __init__(self, list_limit=ODT_ANALYSIS_LIST_LIMIT):
+        self.list_limit = list_limit
+        self.paragraphs = 0
+        self.questions = 0
+        self.question_types = Counter()
+        self.numbers = Counter()
+        self.numbers_to_fix = 0
+        self.options = 0
+        self.answers = 0
+        self.without_answer = []
+        self.without_explanation = []
+        # {'question': position, 'number': original} of the open question
+        self.current = None
+        self.answer_found = False
+        self.explanation_found = False
+    
+    def add_paragraph(self, text):
+        self.paragraphs += 1
+        para_text = text.strip()
+        
+        header = para_text[:1] in ('q', 'Q') and QUESTION_HEADER_PATTERN.match(para_text)
+        if header:
+            self.close_question()
+            self.questions += 1
+            number = int(re.search(r'\d+$', header.group(0)).group(0))
+            self.numbers[number] += 1
+            if number != self.questions:
+                self.numbers_to_fix += 1
+            self.question_types[extract_valid_question_type(para_text) or 'none'] += 1
+            self.current = {'question': self.questions, 'number': number}
+            return
+        
+        if para_text.startswith("Answer:"):
+            self.answers += 1
+            self.answer_found = True
+            self.explanation_found = False
+        elif self.answer_found:
+            # "Explanation:" labels are stripped by the text rules, what's
+            # left after an answer (before Reference:) is the explanation
+            if para_text and not self.explanation_found:
+                para_text = ODT_TEXT_RULES.apply(para_text)[0].strip()
+                self.explanation_found = bool(para_text) and not para_text.startswith("Reference:")
+        elif OPTION_PATTERN.match(para_text):
+            self.options += 1
+    
+    def close_question(self):
+        if self.current is not None:
+            if not self.answer_found:
+                self.without_answer.append(self.current)
+            elif not self.explanation_found:
+                self.without_explanation.append(self.current)
+        self.current = None
+        self.answer_found = False
+        self.explanation_found = False
+    
+    def report(self):
+        """Returns: report dict (question lists cut at list_limit, counts complete)"""
+        self.close_question()
+        duplicates = {str(number): count for number, count in sorted(self.numbers.items()) if count > 1}
+        
+        return {
+            'paragraphs': self.paragraphs,
+            'questions': self.questions,
+            'question_types': dict(self.question_types.most_common()),
+            'options': self.options,
+            'answers': self.answers,
+            'numbering': {
+                'numbers_to_fix': self.numbers_to_fix,
+                'duplicate_numbers': len(duplicates),
+                'duplicates': dict(list(duplicates.items())[:self.list_limit])
+            },
+            'questions_without_answer': {
+                'count': len(self.without_answer),
+                'questions': self.without_answer[:self.list_limit]
+            },
+            'answers_without_explanation': {
+                'count': len(self.without_explanation),
+                'questions': self.without_explanation[:self.list_limit]
+            }
+        }
+
+
+def analyze_odt_file(input_file, list_limit=ODT_ANALYSIS_LIST_LIMIT, zip_limits=ZIP_LIMITS):
+    """
+    Dry run: question statistics of an ODT file without processing it.
+    content.xml ek streaming pass mein parhi jati hai (parsed paragraphs
+    saath saath free hote hain) - koi copy, change, serialize ya zip nahi.
+    Returns: report dict (see OdtAnalyzer.report, plus 'time')
+    """
+    start_time = time.time()
+    document, issues = open_odt_document(input_file, parse_content=False, zip_limits=zip_limits)
+    if issues:
+        raise Exception("Invalid ODT file. Issues found:\n" + "\n".join(f"- {issue}" for issue in issues))
+    
+    analyzer = OdtAnalyzer(list_limit)
+    para_tag = f"{{{ODT_NAMESPACES['text']}}}p"
+    depth = 0
+    nested = False
+    
+    try:
+        with document.open_content() as source:
+            for event, elem in etree.iterparse(source, events=('start', 'end'), tag=para_tag):
+                if event == 'start':
+                    depth += 1
+                    if depth > 1:
+                        nested = True
+                    continue
+                
+                depth -= 1
+                if depth:
+                    continue
+                
+                # Top-level paragraph: it and its nested ones, in document order
+                if nested:
+                    for para in elem.iter(para_tag):
+                        analyzer.add_paragraph(get_para_text(para))
+                    nested = False
+                elif len(elem):
+                    analyzer.add_paragraph(get_para_text(elem))
+                else:
+                    analyzer.add_paragraph(elem.text or '')
+                
+                # Done with it and everything before it (removed one by one)
+                elem.clear(keep_tail=True)
+                previous = elem.getprevious()
+                if previous is not None:
+                    elem.getparent().remove(previous)
+    except etree.XMLSyntaxError as e:
+        raise Exception(f"Invalid ODT file. Issues found:\n- Cannot parse content.xml: {str(e)}")
+    finally:
+        document.close()
+    
+    report = analyzer.report()
+    report['time'] = round(time.time() - start_time, 3)
+    return report
+
+
+# ==================== MAIN ODT PROCESSING ====================
+
+def process_odt_file(input_file, output_file, send_status_update, streaming=None,
+                     streaming_threshold=ODT_STREAMING_THRESHOLD,
+                     compresslevel=ODT_COMPRESS_LEVEL, pretty_print=False,
+                     shard_processes=1, shard_threshold=ODT_SHARD_THRESHOLD,
+                     block_cache=None, zip_limits=ZIP_LIMITS):
+    """
+    Main function to process ODT file with all operations
+    streaming=None: content.xml streaming_threshold se bara ho to
+    bounded-memory streaming mode khud on ho jata hai
+    shard_processes > 1: content.xml shard_threshold se bara ho to itne
+    processes mein sharded mode chalta hai (streaming ki jagah; document
+    memory mein parse hota hai)
+    block_cache (BlockCache): streaming_threshold tak ki file block mode
+    mein chalti hai; pichli uploads ke unchanged question blocks cache se
+    aate hain aur sirf badle hue blocks process hote hain (is se bari file
+    streaming mode mein rehti hai, sharded na ho to)
+    content.xml compact XML ki shakal mein seedha output zip ke compressor
+    mein likha jata hai; pretty_print=True purana indented output deta hai
+    (sirf non-streaming mode, aur ODT text whitespace badal sakta hai)
+    zip_limits (ZipLimits): validation sirf central directory parhti hai;
+    in limits se bara package (zip bomb) kuch decompress hone se pehle hi
+    reject hota hai
+    """
+    document = None
+    
+    try:
+        # Step 0: Validate ODT file
+        send_status_update({
+            'type': 'status',
+            'name': 'Validate ODT File',
+            'status': 'in_progress',
+            'time': '0.00s'
+        })
+        start_time = time.time()
+        
+        document, issues = open_odt_document(input_file, parse_content=False, zip_limits=zip_limits)
+        
+        blocks = False
+        if document is not None:
+            if streaming is None:
+                # Block cache: only up to the streaming threshold, bigger
+                # documents keep bounded memory (unless sharded)
+                blocks = not pretty_print and (
+                    (shard_processes > 1 and document.content_size > shard_threshold) or
+                    (block_cache is not None and document.content_size <= streaming_threshold))
+                streaming = not blocks and document.content_size > streaming_threshold
+            
+            # Streaming mode parses content.xml only once, while processing
+            if not streaming:
+                issues = document.parse()
+        
+        if issues:
+            send_status_update({
+                'type': 'status',
+                'name': 'Validate ODT File',
+                'status': 'failed',
+                'time': f"{(time.time() - start_time):.2f}s"
+            })
+            raise Exception(f"Invalid ODT file. Issues found:\n" + "\n".join(f"- {issue}" for issue in issues))
+        
+        send_status_update({
+            'type': 'status',
+            'name': 'Validate ODT File',
+            'status': 'completed',
+            'time': f"{(time.time() - start_time):.2f}s"
+        })
+        
+        # Steps 1-7: all operations in a single fused traversal
+        for step_name in ODT_PROCESSING_STEPS + [ODT_SERIALIZE_STEP]:
+            send_status_update({
+                'type': 'status',
+                'name': step_name,
+                'status': 'in_progress',
+                'time': '0.00s'
+            })
+        
+        pipeline = FusedOdtPipeline(ODT_NAMESPACES)
+        step_times = pipeline.step_times
+        writer = None
+        if blocks:
+            body = find_shardable_body(document.tree.getroot())
+            if body is not None:
+                writer = BlockOdtWriter(document.tree, body, shard_processes, block_cache)
+                # Blocks that depend on each other (text rules): serial run below
+                if not writer.prepare():
+                    writer = None
+        
+        if streaming:
+            # content.xml is processed while it's written into the output zip
+            result = {}
+            
+            def write_xml(output):
+                with document.open_content() as source:
+                    result['questions_fixed'] = StreamingOdtWriter(output, pipeline).run(source)
+            
+            write_content, counter = buffered_member_writer(write_xml)
+            start_time = time.time()
+            try:
+                repack_zip(document.zip_file, output_file, {'content.xml': write_content}, compresslevel)
+            except etree.XMLSyntaxError as e:
+                raise Exception(f"Invalid ODT file. Issues found:\n- Cannot parse content.xml: {str(e)}")
+            # Processing runs inside the write; the rest is serialization
+            serialize_time = max(time.time() - start_time - sum(pipeline.step_times), 0.0)
+            questions_fixed = result['questions_fixed']
+        elif writer is not None:
+            # Blocks were processed (or reused) above, written in order
+            write_content, counter = buffered_member_writer(writer.write)
+            repack_zip(document.zip_file, output_file, {'content.xml': write_content}, compresslevel)
+            questions_fixed = writer.questions_fixed
+            # Summed over the processed blocks
+            step_times = writer.step_times
+            serialize_time = writer.write_time
+        else:
+            # content.xml was already parsed during validation
+            tree = document.tree
+            questions_fixed = pipeline.run(tree.getroot())
+        
+        for step_name, step_time in zip(ODT_PROCESSING_STEPS, step_times):
+            send_status_update({
+                'type': 'status',
+                'name': step_name,
+                'status': 'completed',
+                'time': f"{step_time:.2f}s"
+            })
+        
+        if not streaming and writer is None:
+            # Create output ODT file - only content.xml is rewritten,
+            # every other member is copied as-is
+            def write_xml(output):
+                tree.write(output, xml_declaration=True, encoding='UTF-8', pretty_print=pretty_print)
+            
+            write_content, counter = buffered_member_writer(write_xml)
+            start_time = time.time()
+            repack_zip(document.zip_file, output_file, {'content.xml': write_content}, compresslevel)
+            serialize_time = time.time() - start_time
+        
+        serialize_status = {
+            'type': 'status',
+            'name': ODT_SERIALIZE_STEP,
+            'status': 'completed',
+            'time': f"{serialize_time:.2f}s",
+            'xml_bytes': counter.bytes_written,
+            'bytes_out': os.path.getsize(output_file)
+        }
+        if writer is not None and block_cache is not None:
+            serialize_status['blocks'] = writer.blocks
+            serialize_status['blocks_reused'] = writer.blocks_reused
+        send_status_update(serialize_status)
+        
+        return questions_fixed
+    
+    except Exception as e:
+        raise Exception(f"ODT processing failed: {str(e)}")
+    
+    finally:
+        if document is not None:
+            document.close()
@@ -0,0 +1,85 @@
+"""
+Columnar per-paragraph index shared by the pipeline steps.
+
+Har paragraph ka text aur us ke "kind" flags (question header, option,
+Answer:, ...) ek dafa nikal kar columns mein rakhe jate hain - flags ek
+compact array('H') mein, text ek list mein. Jo step kisi paragraph ko
+badalta hai woh sirf us ki entry invalidate karta hai; agle lookup par
+woh dobara classify ho jati hai.
+
+positions(mask) flag column par mask laga kar matching paragraphs deta
+hai, taake steps har paragraph par string tests chalane ki bajaye sirf
+apne targets par jayein. NumPy installed ho to masks vectorized hain.
+"""
+from array import array
+
+try:
+    import numpy
+except ImportError:  # Plain Python scan is used instead
+    numpy = None
+
+
+class ParagraphIndex:
+    """
+    items: paragraph objects (e.g. lxml elements), in document order
+    text_of(item): paragraph text
+    classify(text): int of kind flags (fits in 16 bits)
+    """
+    
+    __slots__ = ('items', 'text_of', 'classify', 'texts', 'flags', 'stale')
+    
+    def __init__(self, items, text_of, classify):
+        self.items = list(items)
+        self.text_of = text_of
+        self.classify = classify
+        self.texts = [None] * len(self.items)
+        self.flags = array('H', [0]) * len(self.items)
+        # Positions whose flags must be (re)computed before use
+        self.stale = set(range(len(self.items)))
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def text(self, position):
+        """Paragraph text (cached until the paragraph is invalidated)"""
+        text = self.texts[position]
+        if text is None:
+            text = self.texts[position] = self.text_of(self.items[position])
+        return text
+    
+    def kind(self, position):
+        """Kind flags of one paragraph"""
+        if position in self.stale:
+            self.update(position)
+        return self.flags[position]
+    
+    def update(self, position):
+        self.flags[position] = self.classify(self.text(position))
+        self.stale.discard(position)
+    
+    def invalidate(self, position):
+        """Paragraph was rewritten - drop its text and flags"""
+        self.texts[position] = None
+        self.stale.add(position)
+    
+    def append(self, item):
+        """Add a paragraph after the last one"""
+        self.items.append(item)
+        self.texts.append(None)
+        self.flags.append(0)
+        self.stale.add(len(self.items) - 1)
+    
+    def refresh(self):
+        """Classify every stale paragraph"""
+        for position in list(self.stale):
+            self.update(position)
+    
+    def positions(self, mask):
+        """Sorted positions of paragraphs having any of the flags in mask"""
+        self.refresh()
+        if not self.flags:
+            return []
+        if numpy is not None:
+            return numpy.flatnonzero(numpy.frombuffer(self.flags, dtype=numpy.uint16) & mask).tolist()
+        return [position for position, flags in enumerate(self.flags) if flags & mask]
+
@@ -0,0 +1,92 @@
+"""
+Question type detection (HOTSPOT, DRAG DROP, ...) for question headers.
+
+Types question_types.json mein vendor ke hisaab se hain; active set
+QUESTION_TYPE_VENDOR environment variable se chunta hai (default:
+'default'). Saare types ek trie mein jorr kar ek hi regex mein compile
+hote hain, is liye har header par ek scan chalta hai - chahe sau types
+register hon. Result leftmost-longest hai: text mein jo type pehle aaye
+woh jeetta hai, aur ek hi jagah par lamba type (POSITIONEDDRAGDROP)
+chhote (DRAGDROP) par.
+"""
+import json
+import os
+import re
+
+QUESTION_TYPES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_types.json')
+DEFAULT_VENDOR = 'default'
+
+
+def trie_pattern(words):
+    """
+    Regex source matching any of words, built from their trie so every
+    position is tried against all words at once. At a node, continuing
+    is preferred over ending, which makes each match the longest word
+    starting there.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of a word
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        ends_here = '' in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        return group + '?' if ends_here else group
+    
+    return build(trie)
+
+
+class QuestionTypeMatcher:
+    """Finds the question type in a header line (None if there is none)"""
+    
+    def __init__(self, types):
+        self.types = list(types)
+        # Matching is on upper-cased text; report the type as configured
+        self.canonical = {}
+        for question_type in self.types:
+            self.canonical.setdefault(question_type.upper(), question_type)
+        words = [word for word in self.canonical if word]
+        self.pattern = re.compile(trie_pattern(words)) if words else None
+    
+    def find(self, text):
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(text.upper())
+        return self.canonical[match.group()] if match else None
+
+
+def active_vendor():
+    """Vendor picked by the QUESTION_TYPE_VENDOR environment variable"""
+    return os.environ.get('QUESTION_TYPE_VENDOR') or DEFAULT_VENDOR
+
+
+def load_question_types(vendor=None, path=QUESTION_TYPES_FILE):
+    """Type list of a vendor from the JSON config"""
+    vendor = vendor or active_vendor()
+    with open(path, 'r', encoding='utf-8') as f:
+        vendors = json.load(f)
+    if vendor not in vendors:
+        raise ValueError(f"No '{vendor}' question types in {path}")
+    return vendors[vendor]
+
+
+# Part of the pipeline fingerprint: another vendor gives other output
+QUESTION_TYPE_VENDOR = active_vendor()
+VALID_QUESTION_TYPES = load_question_types(QUESTION_TYPE_VENDOR)
+QUESTION_TYPE_MATCHER = QuestionTypeMatcher(VALID_QUESTION_TYPES)
+
+
+def extract_valid_question_type(text):
+    """
+    Text se valid question type extract karta hai.
+    Agar valid type nahi mila to None return karta hai.
+    """
+    return QUESTION_TYPE_MATCHER.find(text)
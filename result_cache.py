@@ -0,0 +1,150 @@
+"""
+Content-addressed cache of processed documents.
+
+Key = sha256(input file bytes) + pipeline fingerprint (hash of the source
+files that produce the output). Same file dobara upload ho to pipeline
+chalaye baghair cached result mil jata hai; code badalne par fingerprint
+badal jata hai aur purane entries khud hi miss ho jati hain.
+
+Entries are <key>.bin (processed file) + <key>.json (result fields for the
+'complete' event). Least recently used entries (by .bin mtime) are evicted
+once the cache grows past max_bytes.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path):
+    """sha256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_fingerprint(*source_files, settings=()):
+    """
+    Short hash of the files that define a processing pipeline, plus
+    settings (strings) that change its output, e.g. the question type vendor
+    """
+    digest = hashlib.sha256()
+    for source_file in source_files:
+        with open(source_file, 'rb') as f:
+            digest.update(f.read())
+    for setting in settings:
+        digest.update(b'\0' + setting.encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Persistent processed-file cache with a size cap and LRU eviction.
+    Safe to share between processes: entries are written atomically and
+    eviction ignores files another process already removed.
+    """
+    
+    def __init__(self, directory, max_bytes, fingerprint):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def key_for_file(self, file_path):
+        """Cache key of an input file"""
+        return self.key_for_digest(file_sha256(file_path))
+    
+    def key_for_digest(self, digest):
+        """Cache key of an input whose sha256 hex digest is already known"""
+        return f"{digest}-{self.fingerprint}"
+    
+    def entry_paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.bin', base + '.json'
+    
+    def lookup(self, key, output_path):
+        """
+        On a hit, copy the cached result to output_path and return its
+        result fields (dict); return None on a miss.
+        """
+        data_path, meta_path = self.entry_paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            shutil.copyfile(data_path, output_path)
+            # Mark as recently used
+            os.utime(data_path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        
+        with self.lock:
+            self.hits += 1
+        return result
+    
+    def store(self, key, result_path, result):
+        """Add a processed file with its result fields, then evict"""
+        data_path, meta_path = self.entry_paths(key)
+        temp_suffix = f".{uuid.uuid4().hex}.tmp"
+        
+        shutil.copyfile(result_path, data_path + temp_suffix)
+        with open(meta_path + temp_suffix, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        # Data first: a .json without its .bin is just a miss
+        os.replace(data_path + temp_suffix, data_path)
+        os.replace(meta_path + temp_suffix, meta_path)
+        
+        self.evict()
+    
+    def entries(self):
+        """(mtime, size, data path) of every entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.bin'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def evict(self):
+        """Remove least recently used entries until under max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        
+        for _, size, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            for path in (data_path, data_path[:-len('.bin')] + '.json'):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+    
+    def stats(self):
+        """Hit/miss counters and current size"""
+        entries = self.entries()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 2) if lookups else 0.0,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,113 @@
+"""
+Declarative text rewrite rules ("Combined Text Operations" step).
+
+Rules text_rules.json mein hain (har pipeline ka apna rule set) aur ek
+combined scanner mein compile hote hain: har paragraph par sirf ek regex
+search chalti hai - jin paragraphs par koi rule lagta hi nahi (zyada tar)
+woh wahin chhoot jate hain, chahe rules kitne bhi hon. Match hone par
+rules apni tarteeb se ek ke baad ek lagte hain, har rule pichle rule ke
+output par.
+
+Rule fields:
+    name        - label (error messages)
+    find        - literal text to replace, or
+    pattern     - regex to replace (replace may use \\1 etc.)
+    replace     - replacement (default "")
+    flags       - e.g. ["IGNORECASE", "DOTALL"] for pattern / when
+    when        - regex that decides if the rule runs (default: find/pattern itself)
+    when_all    - literal strings that must all be present for the rule to run
+    strip       - strip the whole text after the rule ran
+"""
+import json
+import os
+import re
+
+TEXT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.json')
+
+# Rule flag names -> scoped inline flag letters
+RULE_FLAGS = {
+    'IGNORECASE': 'i',
+    'DOTALL': 's',
+    'MULTILINE': 'm'
+}
+
+
+def scoped(source, flags):
+    """Regex group with the rule's flags applied only inside it"""
+    letters = ''.join(RULE_FLAGS[flag] for flag in flags)
+    return f"(?{letters}:{source})" if letters else f"(?:{source})"
+
+
+class TextRule:
+    """One compiled rewrite rule"""
+    
+    __slots__ = ('name', 'find', 'pattern', 'replace', 'trigger', 'strip')
+    
+    def __init__(self, spec):
+        self.name = spec.get('name', '?')
+        flags = spec.get('flags', [])
+        unknown = [flag for flag in flags if flag not in RULE_FLAGS]
+        if unknown:
+            raise ValueError(f"Text rule '{self.name}': unknown flags {unknown}")
+        if ('find' in spec) == ('pattern' in spec):
+            raise ValueError(f"Text rule '{self.name}' needs exactly one of 'find' or 'pattern'")
+        
+        self.find = spec.get('find')
+        self.pattern = re.compile(scoped(spec['pattern'], flags)) if 'pattern' in spec else None
+        self.replace = spec.get('replace', '')
+        self.strip = spec.get('strip', False)
+        
+        # Trigger as regex source, so all rules can share one scanner
+        if 'when' in spec:
+            self.trigger = scoped(spec['when'], flags)
+        elif 'when_all' in spec:
+            self.trigger = r"\A" + ''.join(f"(?=[\\s\\S]*{re.escape(text)})" for text in spec['when_all'])
+        elif self.find is not None:
+            self.trigger = re.escape(self.find)
+        else:
+            self.trigger = self.pattern.pattern
+    
+    def apply(self, text):
+        if self.find is not None:
+            text = text.replace(self.find, self.replace)
+        else:
+            text = self.pattern.sub(self.replace, text)
+        return text.strip() if self.strip else text
+
+
+class TextRules:
+    """An ordered rule set compiled into a single scanner"""
+    
+    def __init__(self, specs):
+        self.rules = [TextRule(spec) for spec in specs]
+        self.triggers = [re.compile(rule.trigger) for rule in self.rules]
+        # Never matches when there are no rules
+        self.scanner = re.compile('|'.join(f"(?:{rule.trigger})" for rule in self.rules) or r"(?!)")
+    
+    def matches(self, text):
+        """True if at least one rule would change/run on text"""
+        return self.scanner.search(text) is not None
+    
+    def apply(self, text):
+        """
+        Run the rules on text
+        Returns: (new_text, modified) - modified means at least one rule ran
+        """
+        if self.scanner.search(text) is None:
+            return text, False
+        
+        modified = False
+        for rule, trigger in zip(self.rules, self.triggers):
+            if trigger.search(text):
+                text = rule.apply(text)
+                modified = True
+        return text, modified
+
+
+def load_text_rules(rule_set, path=TEXT_RULES_FILE):
+    """Compiled rules of one rule set ('odt', 'docx') from the JSON config"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if rule_set not in config:
+        raise ValueError(f"No '{rule_set}' rule set in {path}")
+    return TextRules(config[rule_set])
@@ -0,0 +1,198 @@
+"""
+Multipart uploads spooled straight to their final file.
+
+Werkzeug normally buffers every file part (memory or a temp file) and the
+route then copies it again with file.save(). SpoolingRequest har file part
+ko pehli byte se hi spool folder ki apni file mein likhta hai - yehi file
+baad mein worker ko di jati hai, koi doosri copy nahi banti. Likhte waqt
+hi sha256 (result cache key) banta hai aur pehle bytes check hote hain:
+jo payload ZIP (ODT/DOCX) nahi woh pehle kilobytes mein hi reject ho jata
+hai, poora 200MB aane ka intezar nahi hota. Upload poori hone par zip ki
+central directory app.config['ZIP_LIMITS'] par check hoti hai (zip bomb
+sizes/ratio) - kuch decompress kiye bagair, job banne se pehle.
+"""
+import hashlib
+import os
+import struct
+import tempfile
+import zipfile
+from flask import Request, current_app
+from zip_guard import ZipLimitError
+
+ZIP_LOCAL_HEADER = b'PK\x03\x04'
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+ZIP_STORED = 0
+ODT_MIMETYPE = 'application/vnd.oasis.opendocument.text'
+# Bytes of an upload kept for the early checks
+SNIFF_SIZE = 4096
+
+# Upload extensions that may be spooled
+SPOOL_EXTENSIONS = ('.odt', '.docx', '.zip')
+
+
+class UploadRejected(Exception):
+    """Upload payload failed the early checks (message is user-facing)"""
+    pass
+
+
+def check_upload_head(head, extension, complete):
+    """
+    Early check of the first bytes of an upload
+    Every accepted type is a ZIP; for ODT the leading 'mimetype' member
+    (stored uncompressed, by spec) must also be the ODT mimetype.
+    Returns: True once the head is accepted, False if more bytes are needed
+    Raises: UploadRejected
+    """
+    if len(head) < len(ZIP_LOCAL_HEADER):
+        if complete:
+            raise UploadRejected("File is not a valid ZIP archive")
+        return False
+    if head[:len(ZIP_LOCAL_HEADER)] != ZIP_LOCAL_HEADER:
+        raise UploadRejected("File is not a valid ZIP archive")
+    if extension != '.odt':
+        return True
+    
+    if len(head) < ZIP_LOCAL_HEADER_SIZE:
+        return complete
+    flags, method = struct.unpack_from('<HH', head, 6)
+    size, = struct.unpack_from('<I', head, 18)
+    name_length, extra_length = struct.unpack_from('<HH', head, 26)
+    
+    name_end = ZIP_LOCAL_HEADER_SIZE + name_length
+    if len(head) < name_end:
+        return complete
+    # Anything unusual is left to the full validation in the worker
+    if head[ZIP_LOCAL_HEADER_SIZE:name_end] != b'mimetype' or method != ZIP_STORED or flags & ZIP_FLAG_DATA_DESCRIPTOR:
+        return True
+    
+    data_start = name_end + extra_length
+    data_end = min(data_start + size, SNIFF_SIZE)
+    if len(head) < data_end:
+        return complete
+    mimetype = head[data_start:data_end].decode('utf-8', 'ignore').strip()
+    if mimetype != ODT_MIMETYPE:
+        raise UploadRejected(f"Invalid mimetype: '{mimetype}' (expected: '{ODT_MIMETYPE}')")
+    return True
+
+
+class UploadSpool:
+    """
+    Spool file of one multipart file part (the stream of its FileStorage)
+    path: final location of the upload; sha256: hex digest of all bytes
+    zip_limits (ZipLimits or None): checked once the upload is complete
+    """
+    
+    def __init__(self, directory, filename, zip_limits=None):
+        self.extension = os.path.splitext(filename or '')[1].lower()
+        self.zip_limits = zip_limits
+        fd, self.path = tempfile.mkstemp(suffix=self.extension, dir=directory)
+        self.file = os.fdopen(fd, 'w+b')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.accepted = False
+        # Claimed spools belong to a job; the rest are removed with the request
+        self.claimed = False
+    
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+    
+    def write(self, data):
+        if not self.accepted:
+            self.head = (self.head + data)[:SNIFF_SIZE]
+            self.check(complete=len(self.head) >= SNIFF_SIZE)
+        self.file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        return len(data)
+    
+    def check(self, complete):
+        try:
+            self.accepted = check_upload_head(self.head, self.extension, complete)
+        except UploadRejected:
+            self.discard()
+            raise
+    
+    def finish(self):
+        """Upload fully received: run the checks that were waiting for bytes"""
+        if not self.accepted:
+            self.check(complete=True)
+        self.file.flush()
+        
+        if self.zip_limits is not None:
+            try:
+                self.zip_limits.check_file(self.path)
+            except (OSError, zipfile.BadZipFile):
+                self.discard()
+                raise UploadRejected("File is not a valid ZIP archive")
+            except ZipLimitError as e:
+                self.discard()
+                raise UploadRejected(str(e))
+    
+    def discard(self):
+        self.file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+    
+    # File-like interface used by Werkzeug/FileStorage
+    def read(self, *args):
+        return self.file.read(*args)
+    
+    def readline(self, *args):
+        return self.file.readline(*args)
+    
+    def seek(self, *args):
+        return self.file.seek(*args)
+    
+    def tell(self):
+        return self.file.tell()
+    
+    def close(self):
+        self.file.close()
+
+
+class SpoolingRequest(Request):
+    """
+    Request class whose file parts go to UploadSpool files in
+    app.config['UPLOAD_SPOOL_FOLDER'] (system temp folder if unset),
+    checked against app.config['ZIP_LIMITS'] (if set)
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spools = []
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        extension = os.path.splitext(filename or '')[1].lower()
+        # Empty filename = no file selected; the route reports that
+        if filename and extension not in SPOOL_EXTENSIONS:
+            raise UploadRejected("Only ODT and DOCX files (or a ZIP of them) are supported")
+        
+        directory = current_app.config.get('UPLOAD_SPOOL_FOLDER') or tempfile.gettempdir()
+        spool = UploadSpool(directory, filename, current_app.config.get('ZIP_LIMITS'))
+        self.spools.append(spool)
+        return spool
+    
+    def close(self):
+        super().close()
+        for spool in self.spools:
+            if not spool.claimed:
+                spool.discard()
+
+
+def claim_spool(file):
+    """
+    Take over the spool of an uploaded FileStorage for a job: the spool
+    file stays on disk after the request (caller removes it)
+    Returns: UploadSpool
+    Raises: UploadRejected
+    """
+    spool = file.stream
+    spool.finish()
+    spool.claimed = True
+    spool.close()
+    return spool
@@ -0,0 +1,214 @@
+"""
+Bounded process pool for document jobs.
+
+lxml/python-docx ka kaam GIL ke neeche chalta hai, is liye har job ek
+alag worker process mein chalti hai. Pool mein jitne workers + pending
+slots hain usse zyada jobs accept nahi hoti (PoolFullError) - server
+overload hone ke bajaye 503 de deta hai.
+
+Worker processes apne status events ek multiprocessing queue par bhejte
+hain; parent ka pump thread unhe job ke JobChannel tak pohanchata hai.
+"""
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Control messages sent by workers next to normal status events
+JOB_STARTED = '__job_started__'
+JOB_FINISHED = '__job_finished__'
+# Put on a retired event queue by the parent to end its pump thread
+STOP_PUMP = '__stop_pump__'
+
+# Event queue of the current worker process (set by the pool initializer)
+worker_event_queue = None
+
+
+class PoolFullError(Exception):
+    """Raised when no more jobs can be admitted"""
+
+
+def init_worker(event_queue):
+    """Worker process initializer"""
+    global worker_event_queue
+    worker_event_queue = event_queue
+
+
+def run_job(task_id, job_id, job_function, args):
+    """
+    Runs inside a worker process: job_function(*args, send_status_update)
+    with events routed back to the job's channel. Returns what
+    job_function returns (None if it raised).
+    """
+    def send_status_update(update):
+        worker_event_queue.put((job_id, update))
+    
+    worker_event_queue.put((task_id, JOB_STARTED))
+    try:
+        return job_function(*args, send_status_update)
+    except Exception as e:
+        send_status_update({
+            'type': 'error',
+            'message': str(e)
+        })
+    finally:
+        worker_event_queue.put((task_id, JOB_FINISHED))
+
+
+class DocumentWorkerPool:
+    """
+    ProcessPoolExecutor with admission control.
+    
+    At most max_workers jobs run at a time and at most max_pending more
+    wait in the queue. Worker processes are started on first use.
+    """
+    
+    def __init__(self, channels, max_workers=None, max_pending=None, start_method='spawn'):
+        self.channels = channels
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = self.max_workers * 2 if max_pending is None else max_pending
+        self.context = multiprocessing.get_context(start_method)
+        self.executor = None
+        self.event_queue = None
+        self.lock = threading.Lock()
+        # Jobs admitted and not finished yet (queued + running)
+        self.active = 0
+        # Task IDs currently running in a worker (one job may have several
+        # tasks, e.g. a batch upload)
+        self.running = set()
+        self.completed = 0
+        self.rejected = 0
+    
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_pending
+    
+    def is_full(self):
+        with self.lock:
+            return self.active >= self.capacity
+    
+    def reject(self):
+        """Count a job turned away before submit() (e.g. by is_full())"""
+        with self.lock:
+            self.rejected += 1
+    
+    def submit(self, job_id, job_function, *args, report_crash=True):
+        """
+        Queue job_function(*args, send_status_update) for job_id.
+        job_function must be a module-level (picklable) function.
+        Raises PoolFullError if the pending queue is full.
+        Returns a Future of job_function's return value.
+        report_crash=False: a crashed worker is only visible through the
+        Future (caller reports it), no 'error' event is sent.
+        """
+        task_id = uuid.uuid4().hex
+        
+        with self.lock:
+            if self.active >= self.capacity:
+                self.rejected += 1
+                raise PoolFullError(f"{self.active} jobs already queued or running")
+            self.active += 1
+            
+            if self.executor is None:
+                self.start()
+            executor = self.executor
+        
+        try:
+            try:
+                future = executor.submit(run_job, task_id, job_id, job_function, args)
+            except BrokenProcessPool:
+                # A worker died earlier - replace the pool and retry once
+                with self.lock:
+                    if self.executor is executor:
+                        self.start()
+                    executor = self.executor
+                future = executor.submit(run_job, task_id, job_id, job_function, args)
+        except Exception:
+            with self.lock:
+                self.active -= 1
+            raise
+        
+        future.add_done_callback(lambda future: self.job_done(task_id, job_id, future, report_crash))
+        return future
+    
+    def start(self):
+        """Create the executor and the event pump (lock held)"""
+        # Replacing a broken pool: retire its executor and pump thread
+        self.retire(self.executor, self.event_queue, wait=False)
+        self.event_queue = self.context.Queue()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self.context,
+            initializer=init_worker,
+            initargs=(self.event_queue,)
+        )
+        pump = threading.Thread(target=self.pump_events, args=(self.event_queue,))
+        pump.daemon = True
+        pump.start()
+    
+    def pump_events(self, event_queue):
+        """Forward worker events to job channels (runs in a daemon thread)"""
+        while True:
+            key, update = event_queue.get()
+            
+            if update == STOP_PUMP:
+                break
+            elif update == JOB_STARTED:
+                with self.lock:
+                    self.running.add(key)
+            elif update == JOB_FINISHED:
+                with self.lock:
+                    self.running.discard(key)
+            else:
+                channel = self.channels.get(key)
+                if channel is not None:
+                    channel.publish(update)
+    
+    def job_done(self, task_id, job_id, future, report_crash=True):
+        """Future callback: free the admission slot"""
+        with self.lock:
+            self.active -= 1
+            self.completed += 1
+        
+        error = future.exception()
+        if error is not None:
+            # Worker crashed - run_job never got to report it
+            with self.lock:
+                self.running.discard(task_id)
+            channel = self.channels.get(job_id)
+            if report_crash and channel is not None and not channel.finished:
+                channel.publish({
+                    'type': 'error',
+                    'message': f"Worker process failed: {str(error)}"
+                })
+    
+    def stats(self):
+        """Queue depth and worker utilization"""
+        with self.lock:
+            busy = len(self.running)
+            return {
+                'workers': self.max_workers,
+                'busy_workers': busy,
+                'utilization': round(busy / self.max_workers, 2),
+                'queue_depth': max(self.active - busy, 0),
+                'max_pending': self.max_pending,
+                'active_jobs': self.active,
+                'completed_jobs': self.completed,
+                'rejected_jobs': self.rejected
+            }
+    
+    @staticmethod
+    def retire(executor, event_queue, wait=True):
+        """Shut an executor down and end the pump thread of its event queue"""
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        if event_queue is not None:
+            event_queue.put((None, STOP_PUMP))
+    
+    def shutdown(self, wait=True):
+        with self.lock:
+            executor, event_queue = self.executor, self.event_queue
+            self.executor = self.event_queue = None
+        self.retire(executor, event_queue, wait)
@@ -0,0 +1,173 @@
+"""
+Zip bomb protection for uploaded packages (ODT, DOCX and batch zips).
+
+Zip ki central directory (file ke aakhir mein) har member ka naam,
+compressed size aur uncompressed size batati hai. Yahan sirf wahi parhi
+jati hai: member count, declared sizes aur compression ratio ki limits
+kuch bhi decompress kiye bagair microseconds mein check ho jati hain.
+Member count end record se central directory parse hone se pehle hi
+check hota hai, taake lakhon entries wali directory memory mein na aaye.
+End record (22 bytes + 64KB tak comment, Zip64 mein ek aur record) yahin
+struct se parha jata hai - zipfile ke private helpers par bharosa nahi.
+
+zipfile kisi member ko central directory ke file_size se zyada
+decompress nahi karta (wahan ruk kar CRC check hota hai). Is liye jo
+package yahan pass ho, us ka har streaming read bhi in limits ke andar
+rehta hai - jhoota local header ya data descriptor zyada data nahi
+nikal sakta.
+"""
+import os
+import struct
+import zipfile
+
+# Members per package
+ZIP_MAX_MEMBERS = 10000
+# Largest uncompressed member, and all members together
+ZIP_MAX_MEMBER_SIZE = 512 * 1024 * 1024
+ZIP_MAX_TOTAL_SIZE = 2 * 1024 * 1024 * 1024
+# Highest uncompressed/compressed ratio (ODT/DOCX XML packs 20-40x); smaller
+# members than ZIP_RATIO_MIN_SIZE can't do harm and aren't checked
+ZIP_MAX_RATIO = 100
+ZIP_RATIO_MIN_SIZE = 1024 * 1024
+
+# End of central directory record: signature, disk numbers, entry counts,
+# directory size/offset, comment length (followed by up to 64KB comment)
+END_RECORD = struct.Struct('<4s4H2LH')
+END_RECORD_SIGNATURE = b'PK\x05\x06'
+MAX_COMMENT_SIZE = 0xFFFF
+# Zip64: a locator right before the end record points to the Zip64 end
+# record, which has the real counts when the 16-bit ones are 0xFFFF
+ZIP64_LOCATOR = struct.Struct('<4sLQL')
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_END_RECORD = struct.Struct('<4sQ2H2L4Q')
+ZIP64_END_RECORD_SIGNATURE = b'PK\x06\x06'
+
+
+class ZipLimitError(Exception):
+    """Package breaks a member/size/ratio limit (message is user-facing)"""
+    pass
+
+
+def format_size(size):
+    """Bytes as a short MB/KB string for error messages"""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.0f}MB"
+    return f"{size / 1024:.0f}KB"
+
+
+def read_member_count(fp):
+    """
+    Member count from the end of central directory record (Zip64 aware),
+    without reading the directory itself
+    Raises: zipfile.BadZipFile
+    """
+    fp.seek(0, os.SEEK_END)
+    file_size = fp.tell()
+    tail_size = min(file_size, END_RECORD.size + MAX_COMMENT_SIZE)
+    fp.seek(file_size - tail_size)
+    tail = fp.read(tail_size)
+    
+    # The comment may contain the signature too: the real record is the
+    # one whose comment ends the file (else the last complete one)
+    position = found = -1
+    while True:
+        position = tail.rfind(END_RECORD_SIGNATURE, 0, position if position >= 0 else len(tail))
+        if position < 0:
+            break
+        if position + END_RECORD.size > len(tail):
+            continue
+        if found < 0:
+            found = position
+        if position + END_RECORD.size + END_RECORD.unpack_from(tail, position)[-1] == len(tail):
+            found = position
+            break
+    if found < 0:
+        raise zipfile.BadZipFile("File is not a zip file")
+    position = found
+    members = END_RECORD.unpack_from(tail, position)[4]
+    if members != 0xFFFF:
+        return members
+    
+    # Zip64 package: the locator sits right before the end record
+    locator_offset = file_size - tail_size + position - ZIP64_LOCATOR.size
+    if locator_offset < 0:
+        return members
+    fp.seek(locator_offset)
+    locator = fp.read(ZIP64_LOCATOR.size)
+    if len(locator) < ZIP64_LOCATOR.size or not locator.startswith(ZIP64_LOCATOR_SIGNATURE):
+        return members
+    fp.seek(ZIP64_LOCATOR.unpack(locator)[2])
+    record = fp.read(ZIP64_END_RECORD.size)
+    if len(record) < ZIP64_END_RECORD.size or not record.startswith(ZIP64_END_RECORD_SIGNATURE):
+        raise zipfile.BadZipFile("Corrupt Zip64 end of central directory record")
+    return ZIP64_END_RECORD.unpack(record)[7]
+
+
+class ZipLimits:
+    """
+    Limits of one kind of upload, checked from the central directory only.
+    open() returns the checked ZipFile; every later read stays inside them.
+    """
+    
+    def __init__(self, max_members=ZIP_MAX_MEMBERS, max_member_size=ZIP_MAX_MEMBER_SIZE,
+                 max_total_size=ZIP_MAX_TOTAL_SIZE, max_ratio=ZIP_MAX_RATIO,
+                 ratio_min_size=ZIP_RATIO_MIN_SIZE):
+        self.max_members = max_members
+        self.max_member_size = max_member_size
+        self.max_total_size = max_total_size
+        self.max_ratio = max_ratio
+        self.ratio_min_size = ratio_min_size
+    
+    def open(self, file_path):
+        """
+        Open a zip whose central directory is within the limits
+        Raises: zipfile.BadZipFile (not a zip), ZipLimitError, OSError
+        """
+        with open(file_path, 'rb') as fp:
+            members = read_member_count(fp)
+        if members > self.max_members:
+            raise ZipLimitError(f"Archive has {members} members (limit: {self.max_members})")
+        
+        zip_file = zipfile.ZipFile(file_path, 'r')
+        try:
+            self.check(zip_file)
+        except ZipLimitError:
+            zip_file.close()
+            raise
+        return zip_file
+    
+    def check(self, zip_file):
+        """
+        Declared sizes and compression ratios of all members
+        Raises: ZipLimitError
+        """
+        infos = zip_file.infolist()
+        if len(infos) > self.max_members:
+            raise ZipLimitError(f"Archive has {len(infos)} members (limit: {self.max_members})")
+        
+        total_size = 0
+        for info in infos:
+            if info.file_size > self.max_member_size:
+                raise ZipLimitError(f"'{info.filename}' is {format_size(info.file_size)} uncompressed "
+                                    f"(limit: {format_size(self.max_member_size)})")
+            if info.file_size > self.ratio_min_size and info.file_size > info.compress_size * self.max_ratio:
+                ratio = info.file_size / max(info.compress_size, 1)
+                raise ZipLimitError(f"'{info.filename}' expands {ratio:.0f}x when decompressed "
+                                    f"(limit: {self.max_ratio}x) - possible zip bomb")
+            # Members sharing their data (overlapping entries) count every time
+            total_size += info.file_size
+        
+        if total_size > self.max_total_size:
+            raise ZipLimitError(f"Archive is {format_size(total_size)} uncompressed "
+                                f"(limit: {format_size(self.max_total_size)}) - possible zip bomb")
+    
+    def check_file(self, file_path):
+        """
+        Tier 1 check of a received upload (nothing is decompressed)
+        Raises: zipfile.BadZipFile, ZipLimitError, OSError
+        """
+        self.open(file_path).close()
+
+
+# Defaults for callers without their own configuration (cli.py)
+ZIP_LIMITS = ZipLimits()
@@ -0,0 +1,133 @@
+"""
+Zip repackaging without temp directories.
+
+ODT/DOCX files are zip archives. To change one member (e.g. content.xml)
+we don't need to extract and recompress everything - every other member's
+compressed bytes are copied verbatim, with original order and compression.
+"""
+import struct
+import zipfile
+
+# Local file header: signature ... filename length, extra field length
+LOCAL_HEADER_STRUCT = struct.Struct('<4s5H3L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+# General purpose flag bit 3: sizes/CRC are in a data descriptor after the data
+DATA_DESCRIPTOR_FLAG = 0x08
+# Zip64 extended information extra field (re-created by zipfile when needed)
+ZIP64_EXTRA_ID = 0x0001
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def strip_zip64_extra(extra):
+    """Remove zip64 extra field records - zipfile writes its own"""
+    kept = b''
+    i = 0
+    while i + 4 <= len(extra):
+        header_id, size = struct.unpack('<2H', extra[i:i + 4])
+        if header_id != ZIP64_EXTRA_ID:
+            kept += extra[i:i + 4 + size]
+        i += 4 + size
+    return kept
+
+
+def copy_zip_info(info):
+    """New ZipInfo with the same name, date, compression and attributes"""
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.comment = info.comment
+    new_info.extra = strip_zip64_extra(info.extra)
+    new_info.create_system = info.create_system
+    new_info.create_version = info.create_version
+    new_info.extract_version = info.extract_version
+    new_info.internal_attr = info.internal_attr
+    new_info.external_attr = info.external_attr
+    new_info.flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+    return new_info
+
+
+def copy_raw_member(zin, zout, info):
+    """
+    Copy one member's compressed bytes from zin to zout without
+    decompressing. Sizes and CRC come from the central directory, so
+    the new local header never needs a data descriptor.
+    """
+    source = zin.fp
+    source.seek(info.header_offset)
+    header = source.read(LOCAL_HEADER_STRUCT.size)
+    fields = LOCAL_HEADER_STRUCT.unpack(header)
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+    source.seek(fields[9] + fields[10], 1)
+    
+    new_info = copy_zip_info(info)
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    
+    # Same bookkeeping zipfile does when closing a member opened with mode='w'
+    output = zout.fp
+    new_info.header_offset = output.tell()
+    output.write(new_info.FileHeader())
+    
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        output.write(chunk)
+        remaining -= len(chunk)
+    
+    zout.start_dir = output.tell()
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+
+
+def repack_zip(input_file, output_file, replacements, compresslevel=None):
+    """
+    Write output_file as a copy of input_file where members named in
+    replacements are rewritten and all others are raw-copied.
+    
+    replacements: {member name: writer(dest)} - writer gets a writable
+    file object for the new member data. Replaced members keep their
+    position and compression type.
+    compresslevel: deflate level of the rewritten members (None = zlib
+    default; copied members keep their compressed bytes anyway)
+    
+    input_file may be a path or an already open zipfile.ZipFile (which
+    is left open). 'mimetype' (ODF packages) is always written first and
+    uncompressed.
+    """
+    if isinstance(input_file, zipfile.ZipFile):
+        zin = input_file
+    else:
+        zin = zipfile.ZipFile(input_file, 'r')
+    
+    try:
+        write_members(zin, output_file, replacements, compresslevel)
+    finally:
+        if zin is not input_file:
+            zin.close()
+
+
+def write_members(zin, output_file, replacements, compresslevel=None):
+    """repack_zip() body for an open input zip"""
+    with zipfile.ZipFile(output_file, 'w') as zout:
+        members = zin.infolist()
+        mimetype = [info for info in members if info.filename == 'mimetype']
+        members = mimetype + [info for info in members if info.filename != 'mimetype']
+        
+        for info in members:
+            if info.filename == 'mimetype' and info.compress_type != zipfile.ZIP_STORED:
+                # Misplaced/compressed mimetype: tiny, so just re-store it
+                new_info = copy_zip_info(info)
+                new_info.compress_type = zipfile.ZIP_STORED
+                zout.writestr(new_info, zin.read(info))
+            elif info.filename in replacements:
+                new_info = copy_zip_info(info)
+                # zout.open() takes the level from the ZipInfo only
+                new_info._compresslevel = compresslevel
+                # Large rewritten members may exceed the zip64 limit
+                with zout.open(new_info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT // 2) as dest:
+                    replacements[info.filename](dest)
+            else:
+                copy_raw_member(zin, zout, info)